@@ -3,11 +3,13 @@ from flask import Flask, send_from_directory
 from backend.routes.predict import predict_bp
 from backend.routes.feedback import feedback_bp
 from backend.routes.admin import admin_bp
+from backend.services.ml_service import ml_service
+from backend.config import MODEL_WARMUP
 from flask_cors import CORS
 
 def create_app():
     app = Flask(__name__, static_folder=None)
-    CORS(app)
+    CORS(app, expose_headers=["X-Next-Cursor"])
 
     @app.route('/')
     def index():
@@ -18,9 +20,12 @@ def create_app():
         return send_from_directory('frontend', path)
 
     app.register_blueprint(predict_bp, url_prefix="/api")
-    app.register_blueprint(feedback_bp, url_prefix="/api")
+    app.register_blueprint(feedback_bp, url_prefix="/api/feedback")
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
 
+    if MODEL_WARMUP:
+        ml_service.warm_up()
+
     return app
 
 app = create_app()
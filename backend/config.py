@@ -0,0 +1,93 @@
+"""
+Backend configuration.
+Paths and serving knobs live here so components can be swapped without touching
+the services themselves. Every value can be overridden through the environment.
+"""
+import os
+
+# ======================
+# MODEL ARTIFACTS
+# ======================
+MODEL_PATH = os.environ.get("MODEL_PATH", "ml/model/rf_model.joblib")
+FEATURES_PATH = os.environ.get("FEATURES_PATH", "ml/data/processed/features.json")
+# Synonym map used in preprocessing; user input is resolved through it too
+SYNONYMS_PATH = os.environ.get("SYNONYMS_PATH", "ml/preprocess/cleaners/synonyms_map.json")
+
+# Flat-array forest written by scripts/compile_model.py. Used instead of the
+# joblib model whenever it was compiled from the current MODEL_PATH.
+COMPILED_MODEL_PATH = os.environ.get("COMPILED_MODEL_PATH", "ml/model/rf_model.forest")
+USE_COMPILED_MODEL = os.environ.get("USE_COMPILED_MODEL", "1") == "1"
+
+# The model is loaded lazily on first use. With warm-up on, create_app() starts
+# that load in a background thread so neither import nor startup waits for it.
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+
+# User symptoms that are not feature names are resolved through the synonym map
+# and, with fuzzy matching on, the closest feature name or synonym by trigram
+# similarity (accepted at FUZZY_MATCH_MIN_SCORE and above, 0..1, and only when
+# no other feature scores within FUZZY_MATCH_MIN_MARGIN). A wrong match adds a
+# symptom the user does not have, so keep both strict.
+FUZZY_MATCHING = os.environ.get("FUZZY_MATCHING", "1") == "1"
+FUZZY_MATCH_MIN_SCORE = float(os.environ.get("FUZZY_MATCH_MIN_SCORE", "0.8"))
+FUZZY_MATCH_MIN_MARGIN = float(os.environ.get("FUZZY_MATCH_MIN_MARGIN", "0.1"))
+
+# Number of ranked conditions returned per prediction (at least 1)
+PREDICT_TOP_K = max(1, int(os.environ.get("PREDICT_TOP_K", "3")))
+
+# ======================
+# PREDICTION MICRO-BATCHING
+# ======================
+# Concurrent /api/predict calls arriving within PREDICT_BATCH_MAX_WAIT_MS of each
+# other are run as one predict_proba call of up to PREDICT_BATCH_MAX_SIZE rows.
+# A max size of 1 disables batching.
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get("PREDICT_BATCH_MAX_SIZE", "32"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get("PREDICT_BATCH_MAX_WAIT_MS", "2"))
+
+# ======================
+# BATCH PREDICTION API
+# ======================
+# /api/predict/batch accepts up to PREDICT_BATCH_API_MAX_ITEMS symptom sets;
+# streamed (NDJSON) responses are computed PREDICT_BATCH_API_CHUNK_SIZE at a time.
+PREDICT_BATCH_API_MAX_ITEMS = int(os.environ.get("PREDICT_BATCH_API_MAX_ITEMS", "10000"))
+PREDICT_BATCH_API_CHUNK_SIZE = int(os.environ.get("PREDICT_BATCH_API_CHUNK_SIZE", "256"))
+
+# ======================
+# PREDICTION CACHE
+# ======================
+# Results are cached per (model version, matched feature set). A size of 0
+# disables the cache; a TTL of 0 keeps entries until they are evicted.
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", "1024"))
+PREDICT_CACHE_TTL_SECONDS = float(os.environ.get("PREDICT_CACHE_TTL_SECONDS", "3600"))
+
+# ======================
+# WRITE-BEHIND LOGGING
+# ======================
+# Prediction logs and feedback are queued and written in
+# batched transactions by a background thread. A queue size of 0 writes inline.
+# Policy when the queue is full: "sync" (write inline), "block" (wait up to
+# WRITE_BEHIND_BLOCK_TIMEOUT_MS, then drop) or "drop".
+WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_POLICY = os.environ.get("WRITE_BEHIND_POLICY", "sync")
+WRITE_BEHIND_BLOCK_TIMEOUT_MS = float(os.environ.get("WRITE_BEHIND_BLOCK_TIMEOUT_MS", "100"))
+
+# ======================
+# SYMPTOM TRENDS
+# ======================
+# Symptom counts are aggregated in memory and upserted every
+# SYMPTOM_TREND_FLUSH_SECONDS, or sooner once SYMPTOM_TREND_MAX_PENDING distinct
+# (hour, symptom) keys are waiting. An interval of 0 writes on every prediction.
+SYMPTOM_TREND_FLUSH_SECONDS = float(os.environ.get("SYMPTOM_TREND_FLUSH_SECONDS", "5"))
+SYMPTOM_TREND_MAX_PENDING = int(os.environ.get("SYMPTOM_TREND_MAX_PENDING", "10000"))
+
+# ======================
+# BACKGROUND JOBS
+# ======================
+# Admin pipeline operations (retrain, preprocess, sync-data, save-model) run as
+# jobs on JOB_WORKERS background threads, at most one per job type at a time.
+# Each job's output goes to JOB_LOG_DIR/<id>.log; a cancel request is noticed
+# within JOB_CANCEL_POLL_SECONDS.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_LOG_DIR = os.environ.get("JOB_LOG_DIR", "logs/jobs")
+JOB_LOG_TAIL_LINES = int(os.environ.get("JOB_LOG_TAIL_LINES", "50"))
+JOB_CANCEL_POLL_SECONDS = float(os.environ.get("JOB_CANCEL_POLL_SECONDS", "1"))
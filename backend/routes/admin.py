@@ -4,15 +4,25 @@ from flask import send_file
 import zipfile
 import io
 import subprocess
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
+from backend.services.ml_service import ml_service
+from backend.services.symptom_trends import trend_aggregator
+from backend.services.jobs import job_runner, JobConflict
+from backend.config import JOB_LOG_TAIL_LINES
 from database.queries import (
     register_admin_dataset,
     get_admin_datasets,
     get_models,
     get_prediction_logs,
+    get_prediction_counts,
+    get_prediction_summary,
     get_symptom_trends,
-    create_prediction_attempt
+    get_symptom_trend_buckets,
+    create_prediction_attempt,
+    get_job,
+    get_jobs
 )
+from database.migrations import parse_json_text
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -56,15 +66,15 @@ def list_datasets():
 def list_models():
     return jsonify(get_models())
 
-def run_python_script(script_name):
+def run_python_script(script_name, args=()):
     script_path = os.path.join(SCRIPTS_DIR, script_name)
 
     env = os.environ.copy()
     env["FLASK_RUN_FROM_CLI"] = "false"  # Prevent Flask reload on script changes
 
     result = subprocess.run(
-        [sys.executable, script_path],
-        cwd=BASE_DIR,
+        [sys.executable, script_path, *args],
+        cwd=PROJECT_ROOT,
         capture_output=True,
         text=True,
         env=env
@@ -74,42 +84,77 @@ def run_python_script(script_name):
     return result
 
 
+def limit_arg(default, maximum):
+    """?limit= clamped to 1..maximum (SQLite reads a negative LIMIT as no limit)."""
+    return max(1, min(request.args.get("limit", default, type=int), maximum))
+
+
+def start_job(job_type, args=()):
+    """Queue a background job: 202 with its id, or 409 while one of the type is active."""
+    try:
+        job = job_runner.submit(job_type, args)
+    except JobConflict as e:
+        return jsonify({"error": str(e), "job_id": e.job["id"], "status": e.job["status"]}), 409
+
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": url_for("admin.job_status", job_id=job["id"])
+    }), 202
+
+
 # ======================
 # SAVE MODEL
 # ======================
 @admin_bp.route("/save-model", methods=["POST"])
 def save_model():
-    result = run_python_script("export_model.py")
-
-    if result.returncode != 0:
-        return jsonify({
-            "error": "Export script failed",
-            "details": result.stderr
-        }), 500
-
-    return jsonify({
-        "message": "Model saved successfully",
-        "output": result.stdout
-    })
+    # the model is reloaded when the job succeeds
+    return start_job("save-model")
 
 
 # ======================
 # RETRAIN MODEL
 # ======================
+# Optional JSON body fields -> ml/train.py flags. Values are validated here
+# so a typo fails with a 400 instead of a failed retrain.
+RETRAIN_PARAMS = {
+    "n_estimators": lambda v: isinstance(v, int) and v > 0,
+    "max_depth": lambda v: v is None or (isinstance(v, int) and v >= 0),
+    "max_samples": lambda v: v is None or (isinstance(v, float) and 0 < v <= 1)
+                             or (isinstance(v, int) and v > 0),
+    "n_jobs": lambda v: isinstance(v, int) and v != 0,
+}
+
+
+def retrain_args(body):
+    """Request body -> command line arguments for retrain.py (ValueError on bad input)."""
+    if not isinstance(body, dict):
+        raise ValueError("body must be a JSON object")
+    args = []
+    for name, value in body.items():
+        if name == "warm_start":
+            if not isinstance(value, bool):
+                raise ValueError("warm_start must be true or false")
+            if value:
+                args.append("--warm_start")
+            continue
+        if name not in RETRAIN_PARAMS:
+            raise ValueError(f"Unknown retrain parameter: {name}")
+        if isinstance(value, bool) or not RETRAIN_PARAMS[name](value):
+            raise ValueError(f"Invalid value for {name}: {value!r}")
+        args += [f"--{name}", "none" if value is None else str(value)]
+    return args
+
+
 @admin_bp.route("/retrain", methods=["POST"])
 def retrain():
-    result = run_python_script("retrain.py")
+    """Optional body: {"n_estimators", "max_depth", "max_samples", "n_jobs", "warm_start"}"""
+    try:
+        args = retrain_args(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if result.returncode != 0:
-        return jsonify({
-            "error": "Retrain script failed",
-            "details": result.stderr
-        }), 500
-
-    return jsonify({
-        "message": "Retraining complete",
-        "output": result.stdout
-    })
+    return start_job("retrain", args)
 
 
 # ======================
@@ -117,28 +162,59 @@ def retrain():
 # ======================
 @admin_bp.route("/sync-data", methods=["POST"])
 def sync_data():
-    result = run_python_script("sync_data.py")
-
-    if result.returncode != 0:
-        return jsonify({
-            "error": "Sync script failed",
-            "details": result.stderr
-        }), 500
-
-    return jsonify({
-        "message": "Datasets synced successfully",
-        "output": result.stdout
-    })
+    return start_job("sync-data")
 
 
 @admin_bp.route("/preprocess", methods=["POST"])
 def preprocess():
-    result = run_python_script("preprocess_raw.py")
+    return start_job("preprocess")
 
-    if result.returncode != 0:
-        return jsonify({"error": "Preprocess failed", "details": result.stderr}), 500
 
-    return jsonify({"message": "Preprocessing complete", "output": result.stdout})
+# ======================
+# BACKGROUND JOBS
+# ======================
+@admin_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    """Newest first. ?type=retrain&status=running&limit=50"""
+    return jsonify(get_jobs(
+        limit=limit_arg(50, LOG_PAGE_MAX),
+        job_type=request.args.get("type"),
+        status=request.args.get("status")
+    ))
+
+
+@admin_bp.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status, progress (0..1), last message and the last ?tail= log lines."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+
+    job["log_tail"] = job_runner.log_tail(job_id, request.args.get("tail", JOB_LOG_TAIL_LINES, type=int))
+    return jsonify(job)
+
+
+@admin_bp.route("/jobs/<int:job_id>/log", methods=["GET"])
+def job_log(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+
+    path = job_runner.log_path(job_id)
+    if not os.path.exists(path):
+        return "", 200, {"Content-Type": "text/plain; charset=utf-8"}
+    return send_file(path, mimetype="text/plain")
+
+
+@admin_bp.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job, requested = job_runner.cancel(job_id)
+    if job is None:
+        return jsonify({"error": "job not found"}), 404
+    if not requested:
+        return jsonify({"error": f"job already {job['status']}", "status": job["status"]}), 409
+
+    return jsonify({"job_id": job_id, "status": job["status"], "cancel_requested": True}), 202
 
 
 @admin_bp.route("/revert-model", methods=["POST"])
@@ -152,6 +228,7 @@ def revert_model():
             "stderr": result.stderr
         }), 500
 
+    ml_service.reload()
 
     return jsonify({"message": "Model reverted", "output": result.stdout})
 
@@ -179,17 +256,109 @@ def download_model():
 # ======================
 # PREDICTION LOGS
 # ======================
+LOG_COLUMNS = ("id", "symptoms", "predictions", "top_prediction", "top_confidence", "symptom_count", "created_at")
+LOG_PAGE_MAX = 500
+
+
+def _log_filters():
+    # since/until accept anything SQLite datetime() parses, e.g. 2025-01-31T12:00
+    return {
+        "since": request.args.get("since"),
+        "until": request.args.get("until"),
+        "condition": request.args.get("condition"),
+        "in_top_k": request.args.get("in_top_k") in ("1", "true"),
+    }
+
+
 @admin_bp.route("/logs", methods=["GET"])
 def logs():
-    return jsonify(get_prediction_logs())
+    """
+    Newest first. ?limit=50&before=<id>&since=&until=&condition=&in_top_k=1
+    The id to pass as ?before= for the next page is sent in X-Next-Cursor.
+    """
+    limit = limit_arg(50, LOG_PAGE_MAX)
+    before_id = request.args.get("before", type=int)
+
+    rows = get_prediction_logs(limit=limit, before_id=before_id, **_log_filters())
+    entries = []
+    for row in rows:
+        entry = dict(zip(LOG_COLUMNS, row))
+        entry["symptoms"] = parse_json_text(entry["symptoms"])
+        entry["predictions"] = parse_json_text(entry["predictions"])
+        entries.append(entry)
+
+    response = jsonify(entries)
+    if len(rows) == limit and rows:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
+    return response
+
+
+@admin_bp.route("/logs/summary", methods=["GET"])
+def logs_summary():
+    filters = _log_filters()
+    return jsonify(get_prediction_summary(since=filters["since"], until=filters["until"]))
+
+
+@admin_bp.route("/logs/counts", methods=["GET"])
+def logs_counts():
+    """Completed predictions per condition per ?bucket=hour|day (default day)."""
+    bucket = request.args.get("bucket", "day")
+    try:
+        rows = get_prediction_counts(bucket=bucket, **_log_filters())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify([
+        {"bucket": b, "condition": cond, "count": n, "avg_confidence": avg}
+        for b, cond, n, avg in rows
+    ])
 
 
 # ======================
 # SYMPTOM TRENDS
 # ======================
+TREND_LIMIT_MAX = 100000
+
+
 @admin_bp.route("/symptom-trends", methods=["GET"])
 def symptom_trends():
-    return jsonify(get_symptom_trends())
+    # write out counts still held in memory so the dashboard sees live traffic
+    trend_aggregator.flush()
+    return jsonify(get_symptom_trends(limit_arg(20, TREND_LIMIT_MAX)))
+
+
+@admin_bp.route("/symptom-trends/buckets", methods=["GET"])
+def symptom_trend_buckets():
+    """?bucket=hour|day&since=&until=&symptom= -> [{bucket, symptom, count}]"""
+    trend_aggregator.flush()
+    try:
+        rows = get_symptom_trend_buckets(
+            bucket=request.args.get("bucket", "hour"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            symptom=request.args.get("symptom"),
+            limit=limit_arg(1000, 10000)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify([{"bucket": b, "symptom": symptom, "count": n} for b, symptom, n in rows])
+
+
+# ======================
+# ACTIVE MODEL
+# ======================
+@admin_bp.route("/model-status", methods=["GET"])
+def model_status():
+    return jsonify(ml_service.status())
+
+
+# ======================
+# PREDICTION CACHE
+# ======================
+@admin_bp.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    return jsonify(ml_service.cache_stats())
 
 
 # ======================
@@ -1,9 +1,14 @@
+import json
 from flask import Blueprint, request, jsonify
-from database.queries import log_feedback
+from backend.services.write_behind import log_writer
 from backend.routes.admin import admin_stats
 
 feedback_bp = Blueprint("feedback", __name__)
 
+# user_feedback.feedback CHECK constraint; checked here because the row is
+# written in the background, where a rejected insert can no longer fail the request
+FEEDBACK_VALUES = ("accurate", "inaccurate", "uncertain")
+
 @feedback_bp.route("", methods=["POST"])
 def receive_feedback():
     data = request.get_json() or {}
@@ -14,9 +19,12 @@ def receive_feedback():
 
     if not predicted:
         return jsonify({"error": "Missing predicted condition"}), 400
+    if feedback not in FEEDBACK_VALUES:
+        return jsonify({"error": f"feedback must be one of: {', '.join(FEEDBACK_VALUES)}"}), 400
 
-    # Save feedback in database
-    log_feedback(symptoms=str(symptoms), predicted=predicted, feedback=feedback)
+    # Save feedback in database (written in the background); symptoms stored
+    # as JSON text, like the prediction logs
+    log_writer.submit("feedback", (json.dumps(symptoms), predicted, None, feedback))
 
     # If accurate → increment successful checks
     if feedback == "accurate":
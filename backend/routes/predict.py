@@ -1,38 +1,64 @@
-from flask import Blueprint, request, jsonify
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from backend.services.ml_service import ml_service
-from database.queries import update_prediction_result, log_prediction
+from backend.services.write_behind import log_writer
+from backend.services.symptom_trends import trend_aggregator
+from backend.config import PREDICT_BATCH_API_MAX_ITEMS, PREDICT_BATCH_API_CHUNK_SIZE
+from ml.utils import ensure_list
 
 predict_bp = Blueprint("predict", __name__)
 
+
+def format_predictions(predictions):
+    # Format predictions for frontend (convert 0.85 → 85)
+    return [
+        {
+            "condition": p["condition"],
+            "confidence": round(p["probability"] * 100, 2)
+        }
+        for p in predictions
+    ]
+
+
+def _valid_item(symptoms):
+    """A symptom string ("fever, cough") or a list of symptom strings."""
+    return isinstance(symptoms, str) or (
+        isinstance(symptoms, list) and all(isinstance(s, str) for s in symptoms)
+    )
+
+
 @predict_bp.route("/predict", methods=["POST"])
 def predict():
     data = request.get_json() or {}
-    symptoms = data.get("symptoms", [])
+    symptoms = data.get("symptoms")
+    if symptoms is not None and not _valid_item(symptoms):
+        return jsonify({
+            "success": False,
+            "error": "symptoms must be a symptom string or a list of symptom strings"
+        }), 400
+    symptoms = ensure_list(symptoms)
     check_id = data.get("check_id")
 
     try:
         # Run prediction with the real model
         predictions = ml_service.predict(symptoms)
+        formatted = format_predictions(predictions)
+        matches = ml_service.match_symptoms(symptoms)
 
-        # Format predictions for frontend (convert 0.85 → 85)
-        formatted = [
-            {
-                "condition": p["condition"],
-                "confidence": round(p["probability"] * 100, 2)
-            }
-            for p in predictions
-        ]
-
-        # Log prediction (if check-id available)
+        # Log prediction (if check-id available); written in the background
         if check_id:
             top_pred = formatted[0]["condition"]
-            update_prediction_result(check_id, formatted, top_pred)
+            log_writer.submit("prediction_result", (check_id, formatted, top_pred))
         else:
             # fallback
-            log_prediction(str(symptoms), str(formatted), formatted[0]["condition"])
+            log_writer.submit("prediction", (symptoms, formatted, formatted[0]["condition"]))
+
+        trend_aggregator.record([symptoms])
 
         return jsonify({
             "predictions": formatted,
+            "matched_symptoms": matches["matched"],
+            "unmatched_symptoms": matches["unmatched"],
             "success": True
         })
 
@@ -41,3 +67,88 @@ def predict():
             "success": False,
             "error": str(e)
         }), 500
+
+
+# ======================
+# BATCH PREDICTION
+# ======================
+def _predict_chunk(batch):
+    """
+    One predict_proba for the chunk, one bulk log insert, one trend update.
+    Returns (formatted predictions, symptom matches) per item.
+    """
+    results = [format_predictions(p) for p in ml_service.predict_many(batch)]
+    matches = [ml_service.match_symptoms(symptoms) for symptoms in batch]
+
+    log_writer.submit_many("prediction", [
+        (symptoms, formatted, formatted[0]["condition"])
+        for symptoms, formatted in zip(batch, results)
+    ])
+    trend_aggregator.record(batch)
+    return list(zip(results, matches))
+
+
+def _result(formatted, matches):
+    return {
+        "predictions": formatted,
+        "matched_symptoms": matches["matched"],
+        "unmatched_symptoms": matches["unmatched"]
+    }
+
+
+@predict_bp.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Body: {"batch": [["fever", "cough"], "headache, nausea", ...]}
+    Returns {"results": [{"predictions": [...], "matched_symptoms": [...],
+    "unmatched_symptoms": [...]}, ...]} in input order, or one
+    JSON object per line (application/x-ndjson) with ?stream=1.
+    """
+    data = request.get_json() or {}
+    batch = data.get("batch")
+
+    if not isinstance(batch, list) or not batch:
+        return jsonify({"success": False, "error": "batch must be a non-empty list of symptom lists"}), 400
+    if len(batch) > PREDICT_BATCH_API_MAX_ITEMS:
+        return jsonify({
+            "success": False,
+            "error": f"batch is limited to {PREDICT_BATCH_API_MAX_ITEMS} items"
+        }), 413
+
+    invalid = next((i for i, symptoms in enumerate(batch) if not _valid_item(symptoms)), None)
+    if invalid is not None:
+        return jsonify({
+            "success": False,
+            "error": f"batch[{invalid}] must be a symptom string or a list of symptom strings",
+            "index": invalid
+        }), 400
+
+    batch = [ensure_list(symptoms) for symptoms in batch]
+
+    if request.args.get("stream") in ("1", "true"):
+        def generate():
+            for start in range(0, len(batch), PREDICT_BATCH_API_CHUNK_SIZE):
+                chunk = batch[start:start + PREDICT_BATCH_API_CHUNK_SIZE]
+                try:
+                    results = _predict_chunk(chunk)
+                except Exception as e:
+                    yield json.dumps({"success": False, "error": str(e)}) + "\n"
+                    return
+                for i, (formatted, matches) in enumerate(results, start):
+                    yield json.dumps({"index": i, **_result(formatted, matches)}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    try:
+        results = _predict_chunk(batch)
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 500
+
+    return jsonify({
+        "results": [_result(formatted, matches) for formatted, matches in results],
+        "count": len(results),
+        "success": True
+    })
@@ -0,0 +1,273 @@
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import uuid
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from database.queries import (
+    create_job,
+    get_job,
+    get_active_job,
+    update_job,
+    request_job_cancel,
+    fail_interrupted_jobs
+)
+from backend.config import JOB_WORKERS, JOB_LOG_DIR, JOB_CANCEL_POLL_SECONDS
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# command: arguments after the interpreter (the job's params["args"] are appended)
+# stages: output lines marking progress; reload_model: reload ml_service on success
+JobType = namedtuple("JobType", ["command", "stages", "reload_model"])
+
+JOB_TYPES = {
+    # a single child process each: the scripts run ml/pipeline_runner.py's stages in-process
+    "retrain": JobType(
+        ["scripts/retrain.py"],
+        ("=== Training ===", "=== Evaluation ===", "=== Compiling Serving Model ===", "=== Exporting Versioned Model ==="),
+        True
+    ),
+    "preprocess": JobType(["scripts/preprocess_raw.py"], (), False),
+    "sync-data": JobType(["scripts/sync_data.py"], (), False),
+    "save-model": JobType(["scripts/export_model.py"], (), True),
+}
+
+
+class JobConflict(Exception):
+    """A job of the same type is already queued or running."""
+
+    def __init__(self, job):
+        super().__init__(f"A {job['type']} job is already {job['status']} (id {job['id']})")
+        self.job = job
+
+
+def _process_start_time(pid):
+    """Start time of a process in clock ticks since boot, from /proc (Linux); None if unknown."""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # field 2 (the command name) may hold spaces; starttime is field 22
+    return stat.rsplit(b")", 1)[1].split()[19].decode()
+
+
+_owner = (None, None)
+
+
+def owner_token():
+    """
+    Identifies this server process in jobs.owner: "<pid>:<start time>". A pid
+    alone is not enough, e.g. a restarted container's server is pid 1 again.
+    Without /proc a random id stands in for the start time.
+    """
+    global _owner
+    pid = os.getpid()
+    # computed per pid: forked workers must not inherit their parent's token
+    if _owner[0] != pid:
+        started = _process_start_time(pid)
+        _owner = (pid, f"{pid}:{started if started is not None else uuid.uuid4().hex}")
+    return _owner[1]
+
+
+def _owner_alive(owner):
+    if owner == owner_token():
+        return True
+    pid, _, started = owner.partition(":")
+    if not pid.isdigit():
+        return False
+    pid = int(pid)
+    if os.path.isdir("/proc"):
+        return _process_start_time(pid) == started
+    if os.name != "posix":
+        # os.kill(pid, 0) would terminate the process on Windows
+        return False
+    # no start times to compare: a live pid counts as the owner
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobRunner:
+    """
+    Runs long admin operations off the request path.
+
+    submit() records the job in the jobs table and returns at once; one of
+    max_workers background threads then runs the job's script in a child
+    interpreter, streaming its output to log_dir/<id>.log and advancing
+    progress whenever a stage marker line is printed. The jobs table allows
+    one queued/running job per type, which also holds across server processes.
+    cancel() flags the job; a queued job is skipped, a running one has its
+    process group terminated.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, log_dir=JOB_LOG_DIR, job_types=None,
+                 cancel_poll_seconds=JOB_CANCEL_POLL_SECONDS):
+        self.max_workers = max(1, int(max_workers))
+        self.log_dir = log_dir if os.path.isabs(log_dir) else os.path.join(PROJECT_ROOT, log_dir)
+        self.job_types = job_types if job_types is not None else dict(JOB_TYPES)
+        self.cancel_poll_seconds = cancel_poll_seconds
+
+        self._executor = None
+        self._lock = threading.Lock()
+        self._procs = {}
+
+    def _ensure_executor(self):
+        if self._executor is not None:
+            return self._executor
+        with self._lock:
+            if self._executor is None:
+                # jobs left queued/running by a server that is gone would hold their type's lock
+                interrupted = fail_interrupted_jobs(_owner_alive)
+                if interrupted:
+                    print(f"[WARNING] Marked interrupted jobs as failed: {interrupted}")
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        return self._executor
+
+    def submit(self, job_type, args=()):
+        """Queue a job; returns its row. Raises JobConflict if one of this type is active."""
+        if job_type not in self.job_types:
+            raise ValueError(f"Unknown job type: {job_type}")
+        executor = self._ensure_executor()
+
+        try:
+            job_id = create_job(job_type, {"args": list(args)}, pid=os.getpid(), owner=owner_token())
+        except sqlite3.IntegrityError:
+            active = get_active_job(job_type)
+            if active is None:
+                # finished in the meantime
+                return self.submit(job_type, args)
+            raise JobConflict(active)
+
+        update_job(job_id, log_path=self.log_path(job_id))
+        executor.submit(self._run, job_id)
+        return get_job(job_id)
+
+    def cancel(self, job_id):
+        """
+        Returns (job row or None if it does not exist, whether cancellation was
+        requested); finished jobs are left alone.
+        """
+        if not request_job_cancel(job_id):
+            return get_job(job_id), False
+        with self._lock:
+            proc = self._procs.get(job_id)
+        if proc is not None:
+            self._terminate(proc)
+        # (the job may already show as cancelled)
+        return get_job(job_id), True
+
+    def log_path(self, job_id):
+        return os.path.join(self.log_dir, f"{job_id}.log")
+
+    def log_tail(self, job_id, lines):
+        try:
+            with open(self.log_path(job_id), "r", encoding="utf-8", errors="replace") as f:
+                return [line.rstrip("\n") for line in deque(f, maxlen=max(0, lines))]
+        except FileNotFoundError:
+            return []
+
+    def _run(self, job_id):
+        job = get_job(job_id)
+        if job is None:
+            return
+        if job["cancel_requested"]:
+            update_job(job_id, status="cancelled", message="Cancelled before it started")
+            return
+
+        job_type = self.job_types[job["type"]]
+        update_job(job_id, status="running", message="Started")
+        try:
+            returncode, last_line = self._execute(job_id, job_type, job["params"].get("args", []))
+        except Exception as e:
+            update_job(job_id, status="failed", error=str(e))
+            return
+
+        if get_job(job_id)["cancel_requested"]:
+            update_job(job_id, status="cancelled", message="Cancelled")
+        elif returncode != 0:
+            update_job(job_id, status="failed", error=f"exit code {returncode}: {last_line}")
+        else:
+            update_job(job_id, status="succeeded", progress=1.0, message=last_line or "Done")
+            if job_type.reload_model:
+                from backend.services.ml_service import ml_service
+                ml_service.reload()
+
+    def _execute(self, job_id, job_type, args):
+        os.makedirs(self.log_dir, exist_ok=True)
+        env = os.environ.copy()
+        env["FLASK_RUN_FROM_CLI"] = "false"  # Prevent Flask reload on script changes
+        env["PYTHONUNBUFFERED"] = "1"        # progress lines arrive as they are printed
+
+        proc = subprocess.Popen(
+            [sys.executable, *job_type.command, *args],
+            cwd=PROJECT_ROOT,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            # own process group, so cancel also stops the scripts it starts
+            start_new_session=os.name == "posix"
+        )
+        with self._lock:
+            self._procs[job_id] = proc
+        watcher = threading.Thread(target=self._watch_cancel, args=(job_id, proc), daemon=True)
+        watcher.start()
+
+        last_line = ""
+        stages = job_type.stages
+        try:
+            with open(self.log_path(job_id), "w", encoding="utf-8") as log:
+                for line in proc.stdout:
+                    log.write(line)
+                    log.flush()
+                    line = line.strip()
+                    if not line:
+                        continue
+                    last_line = line
+                    if line in stages:
+                        update_job(job_id, progress=stages.index(line) / len(stages),
+                                   message=line.strip("= "))
+            return proc.wait(), last_line
+        finally:
+            with self._lock:
+                self._procs.pop(job_id, None)
+
+    def _watch_cancel(self, job_id, proc):
+        """Notices cancel requests made through another server process."""
+        while proc.poll() is None:
+            try:
+                job = get_job(job_id)
+            except sqlite3.Error:
+                job = None
+            if job is not None and job["cancel_requested"]:
+                self._terminate(proc)
+                return
+            try:
+                proc.wait(timeout=self.cancel_poll_seconds)
+            except subprocess.TimeoutExpired:
+                pass
+
+    @staticmethod
+    def _terminate(proc):
+        if proc.poll() is not None:
+            return
+        try:
+            if os.name == "posix":
+                os.killpg(proc.pid, signal.SIGTERM)
+            else:
+                proc.terminate()
+        except ProcessLookupError:
+            pass
+
+
+# Global Singleton (threads start with the first job)
+job_runner = JobRunner()
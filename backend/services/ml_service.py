@@ -1,44 +1,403 @@
 import joblib
 import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
 from ml.preprocess.merger.vector_builder import VectorBuilder
+from ml.preprocess.cleaners.symptom_cleaner import SynonymIndex
+from ml.flat_forest import FlatForest
+from ml.symptom_matcher import SymptomMatcher
+from ml.utils import file_sha256, top_k
 from database.db import get_connection
+from backend.services.prediction_cache import PredictionCache
+from backend.config import (
+    MODEL_PATH,
+    FEATURES_PATH,
+    SYNONYMS_PATH,
+    FUZZY_MATCHING,
+    FUZZY_MATCH_MIN_SCORE,
+    FUZZY_MATCH_MIN_MARGIN,
+    COMPILED_MODEL_PATH,
+    USE_COMPILED_MODEL,
+    PREDICT_TOP_K,
+    PREDICT_BATCH_MAX_SIZE,
+    PREDICT_BATCH_MAX_WAIT_MS,
+    PREDICT_CACHE_SIZE,
+    PREDICT_CACHE_TTL_SECONDS
+)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    handler: callable taking a list of items and returning a list of results
+             in the same order.
+    Callers block in submit() until their result is ready. A background worker
+    collects items until max_batch_size is reached or max_wait_ms has passed
+    since the first item of the batch arrived, then runs handler once and fans
+    the results back out.
+    """
+
+    def __init__(self, handler, max_batch_size=32, max_wait_ms=2.0):
+        self.handler = handler
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+
+    @property
+    def enabled(self):
+        return self.max_batch_size > 1
+
+    def submit(self, item):
+        if not self.enabled:
+            return self.handler([item])[0]
+
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future.result()
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": (self.items / self.batches) if self.batches else 0.0
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="predict-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # window closed: still take whatever is already waiting
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+
+        try:
+            results = self.handler(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class LoadedModel:
+    """One immutable snapshot of everything a prediction needs."""
+
+    def __init__(self, model, classes, version, features, compiled, synonyms=None,
+                 fuzzy=FUZZY_MATCHING, min_score=FUZZY_MATCH_MIN_SCORE,
+                 min_margin=FUZZY_MATCH_MIN_MARGIN):
+        self.model = model
+        self.classes = classes
+        # decoded once so requests only index into it
+        self.class_names = np.array([str(c) for c in classes], dtype=object)
+        self.version = version
+        self.features = features
+        self.matcher = SymptomMatcher(features, synonyms, min_score=min_score, fuzzy=fuzzy,
+                                      min_margin=min_margin)
+        self.vector_builder = VectorBuilder(features, synonyms=synonyms, matcher=self.matcher)
+        self.compiled = compiled
 
-MODEL_PATH = "ml/model/rf_model.joblib"
-FEATURES_PATH = "ml/data/processed/features.json"
 
 class MLService:
-    def __init__(self):
-        print("Loading model and features...")
-        model_obj = joblib.load(MODEL_PATH)
+    """
+    Loads the model lazily on first use and can hot-swap it at runtime.
+
+    reload() builds a new LoadedModel off the request path and then replaces
+    the current one with a single reference assignment, so in-flight requests
+    finish on the model they started with and none of them waits for the load.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, features_path=FEATURES_PATH,
+                 synonyms_path=SYNONYMS_PATH,
+                 fuzzy_matching=FUZZY_MATCHING, fuzzy_min_score=FUZZY_MATCH_MIN_SCORE,
+                 fuzzy_min_margin=FUZZY_MATCH_MIN_MARGIN,
+                 compiled_path=COMPILED_MODEL_PATH, use_compiled=USE_COMPILED_MODEL,
+                 batch_max_size=PREDICT_BATCH_MAX_SIZE,
+                 batch_max_wait_ms=PREDICT_BATCH_MAX_WAIT_MS,
+                 cache_size=PREDICT_CACHE_SIZE,
+                 cache_ttl_seconds=PREDICT_CACHE_TTL_SECONDS,
+                 top_k=PREDICT_TOP_K):
+        self.model_path = model_path
+        self.features_path = features_path
+        self.synonyms_path = synonyms_path
+        self.fuzzy_matching = fuzzy_matching
+        self.fuzzy_min_score = fuzzy_min_score
+        self.fuzzy_min_margin = fuzzy_min_margin
+        self.compiled_path = compiled_path
+        self.use_compiled = use_compiled
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
+        self.top_k = top_k
+
+        self._loaded = None
+        self._load_lock = threading.Lock()      # first (lazy) load
+        self._swap_lock = threading.Lock()      # serializes background reloads
+        self._reloading_lock = threading.Lock()
+        self._reloading = 0
+        self.last_reload_error = None
 
-        self.model = model_obj["model"]
-        self.label_encoder = model_obj["label_encoder"]
+        self.batcher = MicroBatcher(
+            self._predict_submitted,
+            max_batch_size=batch_max_size,
+            max_wait_ms=batch_max_wait_ms
+        )
+        self.cache = PredictionCache(max_size=cache_size, ttl_seconds=cache_ttl_seconds)
 
-        with open(FEATURES_PATH, "r") as f:
+    # ======================
+    # LOADING
+    # ======================
+    def _load(self):
+        print("Loading model and features...")
+        version = file_sha256(self.model_path)[:12]
+        model, classes, compiled = self._load_model(self.model_path, self.compiled_path, self.use_compiled)
+
+        with open(self.features_path, "r") as f:
             feature_index = json.load(f)
-        
-        self.features = feature_index  
-        self.vector_builder = VectorBuilder(feature_index)
+
+        synonyms = None
+        if self.synonyms_path and os.path.exists(self.synonyms_path):
+            with open(self.synonyms_path, "r", encoding="utf-8") as f:
+                synonyms = SynonymIndex(json.load(f))
+
         print("ML service ready.")
+        return LoadedModel(model, classes, version, feature_index, compiled, synonyms,
+                           fuzzy=self.fuzzy_matching, min_score=self.fuzzy_min_score,
+                           min_margin=self.fuzzy_min_margin)
+
+    @staticmethod
+    def _load_model(model_path, compiled_path, use_compiled):
+        """
+        Returns (predictor, class_names, compiled). Prefers the memory-mapped flat
+        forest when it was compiled from the current model file, else unpickles joblib.
+        """
+        if use_compiled and os.path.exists(os.path.join(compiled_path, "meta.json")):
+            forest = FlatForest.load(compiled_path)
+            if forest.meta.get("source_sha256") == file_sha256(model_path):
+                print("Using compiled model at", compiled_path)
+                return forest, forest.classes_, True
+            print("Compiled model is stale; run scripts/compile_model.py. Using", model_path)
 
+        model_obj = joblib.load(model_path)
+        return model_obj["model"], model_obj["label_encoder"].classes_, False
+
+    def _ensure_loaded(self):
+        loaded = self._loaded
+        if loaded is not None:
+            return loaded
+        with self._load_lock:
+            if self._loaded is None:
+                self._loaded = self._load()
+            return self._loaded
+
+    @property
+    def is_loaded(self):
+        return self._loaded is not None
+
+    def warm_up(self):
+        """Start loading in the background so the first request does not pay for it."""
+        if self.is_loaded:
+            return None
+        thread = threading.Thread(target=self._warm_up, name="ml-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _warm_up(self):
+        try:
+            self._ensure_loaded()
+        except Exception as e:
+            # surfaces again (and is reported) on the first prediction
+            print(f"[WARNING] Model warm-up failed: {e}")
+
+    def reload(self, wait=False):
+        """
+        Load the current artifacts in the background and swap them in.
+        The previous model keeps serving until the new one is ready; if loading
+        fails it stays active and the error is kept in last_reload_error.
+        """
+        with self._reloading_lock:
+            self._reloading += 1
+        thread = threading.Thread(target=self._reload, name="ml-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+    def _reload(self):
+        try:
+            with self._swap_lock:
+                loaded = self._load()
+                self._loaded = loaded
+                self.cache.clear()
+                self.last_reload_error = None
+        except Exception as e:
+            self.last_reload_error = str(e)
+            print(f"[ERROR] Model reload failed, keeping current model: {e}")
+        finally:
+            with self._reloading_lock:
+                self._reloading -= 1
+
+    def status(self):
+        loaded = self._loaded
+        return {
+            "loaded": loaded is not None,
+            "reloading": self._reloading > 0,
+            "model_version": loaded.version if loaded else None,
+            "compiled": loaded.compiled if loaded else None,
+            "last_reload_error": self.last_reload_error
+        }
+
+    # Attributes of the active model, loaded on first access
+    @property
+    def model(self):
+        return self._ensure_loaded().model
+
+    @property
+    def classes(self):
+        return self._ensure_loaded().classes
+
+    @property
+    def features(self):
+        return self._ensure_loaded().features
+
+    @property
+    def vector_builder(self):
+        return self._ensure_loaded().vector_builder
+
+    @property
+    def model_version(self):
+        return self._ensure_loaded().version
+
+    # ======================
+    # PREDICTION
+    # ======================
     def predict(self, symptoms_list):
         """
         symptoms_list: ["fever", "cough"]
+        Results are cached per matched feature set and model version; on a miss,
+        concurrent callers are coalesced into a single predict_batch call.
         """
-        vector = self.vector_builder.build_vector(symptoms_list).reshape(1, -1)
-        proba = self.model.predict_proba(vector)[0]
+        loaded = self._ensure_loaded()
+        key = (loaded.version, loaded.vector_builder.indices(symptoms_list))
+        cached = self.cache.get(key)
+        if cached is None:
+            # the snapshot travels with the item: a reload meanwhile must not
+            # put the new model's result under this version's key
+            cached = self.batcher.submit((loaded, symptoms_list))
+            self.cache.put(key, cached)
+
+        return [dict(p) for p in cached]
+
+    def predict_many(self, batch):
+        """
+        batch: [["fever", "cough"], ["headache"], ...]
+        Cache hits are answered directly; all misses go through a single
+        predict_batch call (no micro-batching wait).
+        """
+        loaded = self._ensure_loaded()
+        keys = [(loaded.version, loaded.vector_builder.indices(s)) for s in batch]
+        results = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            computed = self.predict_batch([batch[i] for i in missing], loaded)
+            for i, r in zip(missing, computed):
+                self.cache.put(keys[i], r)
+                results[i] = r
+
+        return [[dict(p) for p in r] for r in results]
+
+    def match_symptoms(self, symptoms_list):
+        """
+        Which user symptoms map onto a model feature:
+        {"matched": [{"input", "symptom", "score", "method"}, ...], "unmatched": [...]}
+        """
+        matched, unmatched = self._ensure_loaded().matcher.match_all(symptoms_list)
+        return {"matched": matched, "unmatched": unmatched}
+
+    def invalidate_cache(self):
+        """Drop cached predictions, e.g. after the active model changed."""
+        self.cache.clear()
+
+    def cache_stats(self):
+        stats = self.cache.stats()
+        stats["model_version"] = self._loaded.version if self._loaded else None
+        return stats
+
+    def _predict_submitted(self, items):
+        """MicroBatcher handler: items are (LoadedModel, symptoms); one predict_batch per snapshot."""
+        results = [None] * len(items)
+        groups = {}
+        for i, (loaded, _) in enumerate(items):
+            groups.setdefault(id(loaded), (loaded, []))[1].append(i)
+        for loaded, positions in groups.values():
+            computed = self.predict_batch([items[i][1] for i in positions], loaded)
+            for i, r in zip(positions, computed):
+                results[i] = r
+        return results
+
+    def predict_batch(self, batch, loaded=None):
+        """
+        batch: [["fever", "cough"], ["headache"], ...]
+        Runs one predict_proba over the whole batch; returns one top-k list per item.
+        loaded: the LoadedModel to use (default: the active one).
+        """
+        if not batch:
+            return []
+
+        loaded = loaded or self._ensure_loaded()
+        X = loaded.vector_builder.build_matrix(batch)
+        proba = loaded.model.predict_proba(X)
 
-        # top 3
-        top3_idx = proba.argsort()[::-1][:3]
-        conditions = self.label_encoder.inverse_transform(top3_idx)
+        idx, scores = top_k(proba, self.top_k)
+        conditions = loaded.class_names[idx].tolist()
 
         return [
-            {
-                "condition": cond,
-                "probability": float(proba[i])
-            }
-            for i, cond in zip(top3_idx, conditions)
+            [
+                {"condition": cond, "probability": prob}
+                for cond, prob in zip(cond_row, prob_row)
+            ]
+            for cond_row, prob_row in zip(conditions, scores.tolist())
         ]
 
-# Global Singleton
+# Global Singleton (the model itself is loaded on first use)
 ml_service = MLService()
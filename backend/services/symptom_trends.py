@@ -0,0 +1,131 @@
+import atexit
+import threading
+import time
+from collections import Counter
+from database.queries import TIME_BUCKETS, apply_symptom_deltas
+from backend.config import SYMPTOM_TREND_FLUSH_SECONDS, SYMPTOM_TREND_MAX_PENDING
+
+
+class SymptomTrendAggregator:
+    """
+    Counts symptoms in memory and flushes the deltas periodically.
+
+    record() only bumps an in-process Counter keyed by (hour bucket, symptom),
+    so a prediction costs no database write. Every flush_seconds (or as soon as
+    max_pending distinct keys have piled up) the deltas are written with one
+    upsert batch per trend table. If a flush fails its deltas are merged back
+    and retried on the next one.
+    A flush interval of 0 disables aggregation and every record() writes inline.
+    """
+
+    def __init__(self, flush_seconds=SYMPTOM_TREND_FLUSH_SECONDS,
+                 max_pending=SYMPTOM_TREND_MAX_PENDING, writer=apply_symptom_deltas):
+        self.flush_seconds = max(0.0, float(flush_seconds))
+        self.max_pending = max(1, int(max_pending))
+        self.writer = writer
+
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._stopping = False
+
+        self.recorded = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    @property
+    def enabled(self):
+        return self.flush_seconds > 0
+
+    @staticmethod
+    def _normalize(symptom):
+        return str(symptom).strip().lower()
+
+    def record(self, symptom_lists):
+        """symptom_lists: one list of symptoms per prediction."""
+        hour = time.strftime(TIME_BUCKETS["hour"], time.gmtime())
+        counts = Counter(
+            (hour, symptom)
+            for symptoms in symptom_lists
+            for symptom in map(self._normalize, symptoms)
+            if symptom
+        )
+        if not counts:
+            return
+
+        if not self.enabled or self._stopping:
+            self.writer(counts)
+            with self._lock:
+                self.recorded += sum(counts.values())
+            return
+
+        self._ensure_worker()
+        with self._lock:
+            self._pending.update(counts)
+            self.recorded += sum(counts.values())
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything recorded so far. Returns the number of deltas written."""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._pending = self._pending, Counter()
+            if not deltas:
+                return 0
+
+            try:
+                self.writer(deltas)
+            except Exception as e:
+                print(f"[WARNING] Symptom trend flush of {len(deltas)} deltas failed, will retry: {e}")
+                with self._lock:
+                    self._pending.update(deltas)
+                    self.failed_flushes += 1
+                return 0
+
+            with self._lock:
+                self.flushes += 1
+            return len(deltas)
+
+    def stop(self):
+        """Stop the flusher and write what is left (registered with atexit)."""
+        self._stopping = True
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            worker.join(timeout=10)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "flush_seconds": self.flush_seconds,
+                "pending": len(self._pending),
+                "recorded": self.recorded,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="symptom-trends", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+
+# Global Singleton
+trend_aggregator = SymptomTrendAggregator()
+atexit.register(trend_aggregator.stop)
@@ -0,0 +1,208 @@
+import atexit
+import queue
+import threading
+from database.db import transaction
+from database.queries import (
+    log_predictions,
+    update_prediction_results,
+    log_feedback_rows
+)
+from backend.config import (
+    WRITE_BEHIND_QUEUE_SIZE,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_POLICY,
+    WRITE_BEHIND_BLOCK_TIMEOUT_MS
+)
+
+# kind -> bulk writer taking the list of queued items of that kind
+WRITERS = {
+    "prediction": log_predictions,                   # (symptoms, predictions, top_pred)
+    "prediction_result": update_prediction_results,  # (check_id, predictions, top_pred)
+    "feedback": log_feedback_rows,                   # (symptoms, predicted, correct, feedback)
+}
+
+POLICIES = ("sync", "block", "drop")
+
+
+class WriteBehindWriter:
+    """
+    Moves database writes off the request path.
+
+    submit() puts (kind, item) on a bounded queue and returns immediately;
+    submit_many() queues a whole list of items of one kind as a single entry.
+    A background thread drains entries until it has about batch_size items and
+    writes them in one transaction, one executemany per kind. If that
+    transaction fails, items are retried one by one so a bad row cannot take
+    its batch down.
+
+    When the queue is full the backpressure policy decides:
+        sync  - the caller writes its own item inline (nothing is lost)
+        block - wait up to block_timeout_ms for space, then drop
+        drop  - drop immediately
+    A queue size of 0 disables the queue and every write happens inline.
+    """
+
+    def __init__(self, max_queue=WRITE_BEHIND_QUEUE_SIZE, batch_size=WRITE_BEHIND_BATCH_SIZE,
+                 policy=WRITE_BEHIND_POLICY, block_timeout_ms=WRITE_BEHIND_BLOCK_TIMEOUT_MS,
+                 writers=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown write-behind policy: {policy} (expected one of {POLICIES})")
+
+        self.max_queue = max(0, int(max_queue))
+        self.batch_size = max(1, int(batch_size))
+        self.policy = policy
+        self.block_timeout = block_timeout_ms / 1000.0
+        self.writers = writers or WRITERS
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._worker = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self._stopping = False
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.inline = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self.max_queue > 0
+
+    def submit(self, kind, item):
+        self.submit_many(kind, [item])
+
+    def submit_many(self, kind, items):
+        if kind not in self.writers:
+            raise ValueError(f"Unknown write kind: {kind}")
+        items = list(items)
+        if not items:
+            return
+
+        if not self.enabled or self._stopping:
+            self._write_inline(kind, items)
+            return
+
+        self._ensure_worker()
+        with self._lock:
+            self._pending += 1
+        try:
+            if self.policy == "block":
+                self._queue.put((kind, items), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((kind, items))
+            return
+        except queue.Full:
+            self._task_done(1)
+
+        if self.policy == "sync":
+            self._write_inline(kind, items)
+        else:
+            with self._lock:
+                self.dropped += len(items)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far is written. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def stop(self, timeout=10):
+        """Flush outstanding writes and stop the worker (registered with atexit)."""
+        self._stopping = True
+        flushed = self.flush(timeout=timeout)
+        worker = self._worker
+        if worker is not None and worker.is_alive():
+            self._queue.put(None)
+            worker.join(timeout=timeout)
+        return flushed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "queued": self._pending,
+                "max_queue": self.max_queue,
+                "written": self.written,
+                "batches": self.batches,
+                "inline": self.inline,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="write-behind", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            size = len(first[1])
+            while size < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._write_batch(batch)
+                    return
+                batch.append(entry)
+                size += len(entry[1])
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        grouped = {}
+        for kind, items in batch:
+            grouped.setdefault(kind, []).extend(items)
+        size = sum(len(items) for items in grouped.values())
+
+        try:
+            with transaction():
+                for kind, items in grouped.items():
+                    self.writers[kind](items)
+            with self._lock:
+                self.written += size
+                self.batches += 1
+        except Exception as e:
+            print(f"[WARNING] Write-behind batch of {size} failed, retrying per row: {e}")
+            for kind, items in grouped.items():
+                for item in items:
+                    try:
+                        self.writers[kind]([item])
+                        with self._lock:
+                            self.written += 1
+                    except Exception as row_error:
+                        print(f"[ERROR] Dropping {kind} write: {row_error}")
+                        with self._lock:
+                            self.failed += 1
+        finally:
+            self._task_done(len(batch))
+
+    def _write_inline(self, kind, items):
+        self.writers[kind](items)
+        with self._lock:
+            self.inline += len(items)
+            self.written += len(items)
+
+    def _task_done(self, n):
+        with self._idle:
+            self._pending -= n
+            if self._pending == 0:
+                self._idle.notify_all()
+
+
+# Global Singleton
+log_writer = WriteBehindWriter()
+atexit.register(log_writer.stop)
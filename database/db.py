@@ -1,16 +1,209 @@
 import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from .migrations import migrate
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(PROJECT_ROOT, "database/dev.sqlite")
 
-def get_connection():
+# Pragmas applied once when a connection is opened (overridable via environment)
+DB_PRAGMAS = {
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": os.environ.get("DB_CACHE_SIZE", "-16000"),      # negative = KiB
+    "mmap_size": os.environ.get("DB_MMAP_SIZE", "268435456"),
+}
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "15"))
+# idle connections older than this are pinged before being handed out again
+DB_POOL_HEALTHCHECK_SECONDS = float(os.environ.get("DB_POOL_HEALTHCHECK_SECONDS", "30"))
+# per-connection prepared statement cache (sqlite3 reuses compiled statements)
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "128"))
+
+
+def _open_connection(db_path=DB_PATH, pragmas=None):
     conn = sqlite3.connect(
-        DB_PATH,
+        db_path,
         timeout=15,
         isolation_level=None,     # autocommit
-        check_same_thread=False   # required for Flask
+        check_same_thread=False,  # required for Flask
+        cached_statements=DB_STATEMENT_CACHE_SIZE
     )
-    conn.execute("PRAGMA journal_mode=WAL;")
+    for name, value in (DB_PRAGMAS if pragmas is None else pragmas).items():
+        conn.execute(f"PRAGMA {name}={value};")
     return conn
 
+
+def get_connection():
+    """Fresh, unpooled connection. The caller is responsible for closing it."""
+    return _open_connection()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections.
+
+    A thread keeps the connection it acquired until its outermost release, so
+    nested helpers share one connection. Released connections go back on an
+    idle stack and are reused by any thread; at most max_size are open at once.
+    """
+
+    def __init__(self, db_path=DB_PATH, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_seconds=DB_POOL_HEALTHCHECK_SECONDS, pragmas=None):
+        self.db_path = db_path
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.healthcheck_seconds = healthcheck_seconds
+        self.pragmas = pragmas
+
+        self._idle = []            # [(conn, released_at)]
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self.pid = os.getpid()
+
+    def acquire(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        conn = self._checkout()
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        if getattr(self._local, "conn", None) is not conn:
+            raise RuntimeError("Releasing a connection this thread does not hold")
+
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"Timed out waiting for one of {self.max_size} pooled connections"
+                    )
+                self._cond.wait(remaining)
+
+        if conn is None:
+            return self._connect()
+
+        if time.monotonic() - released_at > self.healthcheck_seconds and not self._healthy(conn):
+            self._discard(conn)
+            with self._cond:
+                self._open += 1
+            return self._connect()
+        return conn
+
+    def _connect(self):
+        try:
+            return _open_connection(self.db_path, self.pragmas)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+    @staticmethod
+    def _healthy(conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close idle connections; ones currently in use stay open."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {"open": self._open, "idle": len(self._idle), "max_size": self.max_size}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    # a forked child must not share its parent's SQLite handles
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                pool = ConnectionPool()
+                conn = pool.acquire()
+                try:
+                    migrate(conn)
+                finally:
+                    pool.release(conn)
+                _pool = pool
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the duration of a with-block."""
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    """
+    Pooled connection inside BEGIN ... COMMIT (rolled back on error).
+    Query helpers called within the block share this connection, so their
+    statements land in the same transaction.
+    """
+    with connection() as conn:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
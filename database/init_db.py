@@ -1,5 +1,6 @@
 import sqlite3
 from pathlib import Path
+from migrations import migrate
 
 DB_PATH = "database/dev.sqlite"
 SCHEMA_PATH = "database/schema.sql"
@@ -18,6 +19,10 @@ def init_db(seed=False):
     # Load schema
     print("Applying database schema...")
     run_sql_file(cursor, SCHEMA_PATH)
+    conn.commit()
+
+    # Bring existing databases up to the current schema
+    migrate(conn)
 
     # # Optionally load seed data
     # if seed and Path(SEED_PATH).exists():
@@ -0,0 +1,200 @@
+import ast
+import json
+
+# ====================================
+# SCHEMA MIGRATIONS
+# ====================================
+# Each migration runs once per database; the last applied version is kept in
+# PRAGMA user_version. Migrations must also be safe on a database created from
+# an up-to-date schema.sql (columns/indexes that already exist are skipped).
+
+
+def parse_json_text(value):
+    """
+    Legacy rows hold str() of Python lists ("['fever']"); newer rows hold JSON.
+    Returns the decoded value, or the original string if it is neither.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return value
+
+
+def to_json_text(value):
+    """JSON text for a Python value or a (legacy or JSON) string."""
+    return json.dumps(parse_json_text(value))
+
+
+def symptom_count(symptoms):
+    symptoms = parse_json_text(symptoms)
+    if isinstance(symptoms, str):
+        return len([s for s in symptoms.replace(';', ',').split(',') if s.strip()])
+    if isinstance(symptoms, (list, tuple)):
+        return len(symptoms)
+    return 0
+
+
+def top_confidence(predictions):
+    predictions = parse_json_text(predictions)
+    if isinstance(predictions, list) and predictions and isinstance(predictions[0], dict):
+        value = predictions[0].get("confidence", predictions[0].get("probability"))
+        return float(value) if isinstance(value, (int, float)) else None
+    return None
+
+
+def _table_exists(conn, table):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_column(conn, table, column, decl):
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _structured_prediction_logs(conn):
+    """JSON symptoms/predictions, symptom_count + top_confidence columns, indexes."""
+    if not _table_exists(conn, "prediction_logs"):
+        return
+
+    _add_column(conn, "prediction_logs", "symptom_count", "INTEGER DEFAULT 0")
+    _add_column(conn, "prediction_logs", "top_confidence", "REAL")
+
+    rows = conn.execute("SELECT id, symptoms, predictions FROM prediction_logs").fetchall()
+    conn.executemany("""
+        UPDATE prediction_logs
+        SET symptoms = ?, predictions = ?, symptom_count = ?, top_confidence = ?
+        WHERE id = ?
+    """, [
+        (to_json_text(symptoms), to_json_text(predictions),
+         symptom_count(symptoms), top_confidence(predictions), row_id)
+        for row_id, symptoms, predictions in rows
+    ])
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prediction_logs_created_at
+        ON prediction_logs (created_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_prediction_logs_top_prediction
+        ON prediction_logs (top_prediction, created_at)
+    """)
+
+
+def _symptom_trend_upserts(conn):
+    """Unique symptom_trends.symptom (duplicates merged) + hourly/daily bucket tables."""
+    if _table_exists(conn, "symptom_trends"):
+        conn.execute("""
+            CREATE TEMP TABLE merged_trends AS
+            SELECT MIN(id) AS id, symptom, SUM(count) AS count
+            FROM symptom_trends
+            GROUP BY symptom
+        """)
+        conn.execute("DELETE FROM symptom_trends")
+        conn.execute("INSERT INTO symptom_trends (id, symptom, count) SELECT id, symptom, count FROM merged_trends")
+        conn.execute("DROP TABLE merged_trends")
+        conn.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_symptom_trends_symptom
+            ON symptom_trends (symptom)
+        """)
+
+    for table in ("symptom_trends_hourly", "symptom_trends_daily"):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                symptom TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, symptom)
+            )
+        """)
+
+
+JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued'
+            CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+        params TEXT,
+        progress REAL NOT NULL DEFAULT 0,
+        message TEXT,
+        error TEXT,
+        log_path TEXT,
+        pid INTEGER,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        started_at DATETIME,
+        finished_at DATETIME
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_type
+        ON jobs (type) WHERE status IN ('queued', 'running');
+"""
+
+
+def _jobs_table(conn):
+    """Background admin jobs; at most one queued/running job per type."""
+    for statement in JOBS_SCHEMA.split(";"):
+        if statement.strip():
+            conn.execute(statement)
+
+
+def _model_registry_columns(conn):
+    """models.sha256 / size_bytes / metrics / data_fingerprint for the content-addressed registry."""
+    if not _table_exists(conn, "models"):
+        return
+
+    _add_column(conn, "models", "sha256", "TEXT")
+    _add_column(conn, "models", "size_bytes", "INTEGER")
+    _add_column(conn, "models", "metrics", "TEXT")
+    _add_column(conn, "models", "data_fingerprint", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_models_sha256 ON models (sha256)")
+
+
+def _job_owner_column(conn):
+    """jobs.owner: pid + start time of the server process that queued the job."""
+    if _table_exists(conn, "jobs"):
+        _add_column(conn, "jobs", "owner", "TEXT")
+
+
+MIGRATIONS = [
+    (1, "structured prediction_logs", _structured_prediction_logs),
+    (2, "symptom trend upserts and buckets", _symptom_trend_upserts),
+    (3, "background jobs", _jobs_table),
+    (4, "model registry columns", _model_registry_columns),
+    (5, "job owner tokens", _job_owner_column),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn):
+    """Apply pending migrations on an autocommit connection. Returns the schema version."""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current >= SCHEMA_VERSION:
+        return current
+
+    # take the write lock first so concurrent processes migrate only once
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, name, apply in MIGRATIONS:
+            if version > current:
+                print(f"Applying database migration {version}: {name}")
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                current = version
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return current
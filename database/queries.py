@@ -1,34 +1,37 @@
-from .db import get_connection
+from .db import connection, transaction
+from .migrations import to_json_text, symptom_count, top_confidence
+from collections import Counter
 import json
+import time
+
+# strftime() formats for the aggregation buckets
+TIME_BUCKETS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d",
+}
 
 # ====================================
 # MODEL METADATA
 # ====================================
 
 def save_model_metadata(version, path, acc, top3):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             INSERT INTO models (version, path, accuracy, top3_accuracy)
             VALUES (?, ?, ?, ?)
         """, (version, path, acc, top3))
-        conn.commit()
-    finally:
-        conn.close()
 
 
 def get_models():
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
-            SELECT id, version, path, accuracy, top3_accuracy, created_at
+            SELECT id, version, path, accuracy, top3_accuracy, created_at,
+                   sha256, size_bytes, metrics, data_fingerprint
             FROM models ORDER BY id DESC
         """)
         rows = c.fetchall()
-    finally:
-        conn.close()
     return rows
 
 
@@ -36,20 +39,58 @@ def get_models():
 # MODEL MANAGEMENT
 # ====================================
 
-def register_model_version(version, path, accuracy=None, top3_accuracy=None):
+MODEL_COLUMNS = ("id", "version", "path", "accuracy", "top3_accuracy", "created_at",
+                 "sha256", "size_bytes", "metrics", "data_fingerprint")
+
+
+def _model_dict(row):
+    if row is None:
+        return None
+    model = dict(zip(MODEL_COLUMNS, row))
+    model["metrics"] = json.loads(model["metrics"]) if model["metrics"] else {}
+    return model
+
+
+def register_model_version(version, path, accuracy=None, top3_accuracy=None, sha256=None,
+                           size_bytes=None, metrics=None, data_fingerprint=None, created_at=None):
     """
-    Register a saved model in the database.
+    Register a saved model in the database. Returns its id.
+    created_at defaults to now (older models imported into the registry keep their own time).
     """
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
-            INSERT INTO models (version, path, accuracy, top3_accuracy)
-            VALUES (?, ?, ?, ?)
-        """, (version, path, accuracy, top3_accuracy))
-        conn.commit()
-    finally:
-        conn.close()
+            INSERT INTO models (version, path, accuracy, top3_accuracy,
+                                sha256, size_bytes, metrics, data_fingerprint, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """, (version, path, accuracy, top3_accuracy, sha256, size_bytes,
+              json.dumps(metrics) if metrics is not None else None, data_fingerprint, created_at))
+        return c.lastrowid
+
+
+def get_model_versions():
+    """Registry-managed models (those with a content hash), newest first, as dicts."""
+    with connection() as conn:
+        rows = conn.execute(f"""
+            SELECT {', '.join(MODEL_COLUMNS)} FROM models
+            WHERE sha256 IS NOT NULL ORDER BY created_at DESC, id DESC
+        """).fetchall()
+    return [_model_dict(row) for row in rows]
+
+
+def get_model_by_sha256(sha256):
+    """Newest model registered with this content hash, or None."""
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(MODEL_COLUMNS)} FROM models WHERE sha256 = ? ORDER BY id DESC LIMIT 1",
+            (sha256,)
+        ).fetchone()
+    return _model_dict(row)
+
+
+def delete_models(model_ids):
+    with connection() as conn:
+        conn.executemany("DELETE FROM models WHERE id = ?", [(model_id,) for model_id in model_ids])
 
 
 
@@ -58,21 +99,29 @@ def register_model_version(version, path, accuracy=None, top3_accuracy=None):
 # ====================================
 
 def save_feedback(symptoms, predicted, correct, feedback):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             INSERT INTO user_feedback (user_symptoms, predicted_condition, correct_condition, feedback)
             VALUES (?, ?, ?, ?)
         """, (symptoms, predicted, correct, feedback))
-        conn.commit()
-    finally:
-        conn.close()
+
+
+def log_feedback(symptoms, predicted, feedback, correct=None):
+    log_feedback_rows([(symptoms, predicted, correct, feedback)])
+
+
+def log_feedback_rows(rows):
+    """rows: iterable of (symptoms, predicted, correct, feedback)"""
+    with connection() as conn:
+        conn.executemany("""
+            INSERT INTO user_feedback (user_symptoms, predicted_condition, correct_condition, feedback)
+            VALUES (?, ?, ?, ?)
+        """, rows)
 
 
 def get_feedback(limit=100):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             SELECT user_symptoms, predicted_condition, correct_condition, feedback, created_at
@@ -81,8 +130,6 @@ def get_feedback(limit=100):
             LIMIT ?
         """, (limit,))
         rows = c.fetchall()
-    finally:
-        conn.close()
     return rows
 
 
@@ -91,54 +138,148 @@ def get_feedback(limit=100):
 # ====================================
 
 def log_prediction(symptoms, predictions, top_pred):
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO prediction_logs (symptoms, predictions, top_prediction)
-            VALUES (?, ?, ?)
-        """, (symptoms, predictions, top_pred))
-        conn.commit()
-    finally:
-        conn.close()
-
+    log_predictions([(symptoms, predictions, top_pred)])
+
+
+def _prediction_log_row(symptoms, predictions, top_pred):
+    return (to_json_text(symptoms), to_json_text(predictions), top_pred,
+            symptom_count(symptoms), top_confidence(predictions))
+
+
+def log_predictions(rows):
+    """rows: iterable of (symptoms, predictions, top_pred); symptoms/predictions stored as JSON"""
+    with connection() as conn:
+        conn.executemany("""
+            INSERT INTO prediction_logs (symptoms, predictions, top_prediction, symptom_count, top_confidence)
+            VALUES (?, ?, ?, ?, ?)
+        """, [_prediction_log_row(*row) for row in rows])
+
+
+def _log_filters(since=None, until=None, condition=None, in_top_k=False):
+    """WHERE clauses + params shared by the log listing and aggregation queries."""
+    clauses, params = [], []
+    if since:
+        clauses.append("created_at >= datetime(?)")
+        params.append(since)
+    if until:
+        clauses.append("created_at < datetime(?)")
+        params.append(until)
+    if condition:
+        if in_top_k:
+            # any of the stored top-k predictions, not only the first one
+            clauses.append("""EXISTS (
+                SELECT 1 FROM json_each(prediction_logs.predictions)
+                WHERE json_extract(json_each.value, '$.condition') = ?
+            )""")
+        else:
+            clauses.append("top_prediction = ?")
+        params.append(condition)
+    return clauses, params
+
+
+def get_prediction_logs(limit=50, before_id=None, since=None, until=None,
+                        condition=None, in_top_k=False):
+    """
+    Newest first, keyset-paginated: pass the smallest id of the previous page
+    as before_id to get the next one.
+    Rows: (id, symptoms, predictions, top_prediction, top_confidence, symptom_count, created_at)
+    """
+    clauses, params = _log_filters(since, until, condition, in_top_k)
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
 
-def get_prediction_logs(limit=50):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
-        c.execute("""
-            SELECT symptoms, predictions, top_prediction, created_at
+        c.execute(f"""
+            SELECT id, symptoms, predictions, top_prediction, top_confidence, symptom_count, created_at
             FROM prediction_logs
+            {where}
             ORDER BY id DESC
             LIMIT ?
-        """, (limit,))
+        """, (*params, limit))
         rows = c.fetchall()
-    finally:
-        conn.close()
     return rows
 
 
+def get_prediction_counts(bucket="day", since=None, until=None, condition=None, in_top_k=False):
+    """
+    Completed predictions per time bucket and top condition, counted in SQL.
+    Rows: (bucket, top_prediction, count, avg_top_confidence)
+    """
+    if bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket} (expected one of {sorted(TIME_BUCKETS)})")
+
+    clauses, params = _log_filters(since, until, condition, in_top_k)
+    clauses.append("top_prediction != ''")
+
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT strftime('{TIME_BUCKETS[bucket]}', created_at) AS bucket,
+                   top_prediction,
+                   COUNT(*),
+                   AVG(top_confidence)
+            FROM prediction_logs
+            WHERE {" AND ".join(clauses)}
+            GROUP BY bucket, top_prediction
+            ORDER BY bucket, COUNT(*) DESC
+        """, params)
+        rows = c.fetchall()
+    return rows
+
+
+def get_prediction_summary(since=None, until=None, top_n=10):
+    """Totals for the admin dashboard: {total, successful, avg_symptom_count, top_conditions}."""
+    clauses, params = _log_filters(since, until)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    completed = " AND ".join(clauses + ["top_prediction != ''"])
+
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT COUNT(*),
+                   SUM(CASE WHEN top_prediction != '' THEN 1 ELSE 0 END),
+                   AVG(symptom_count)
+            FROM prediction_logs
+            {where}
+        """, params)
+        total, successful, avg_symptoms = c.fetchone()
+
+        c.execute(f"""
+            SELECT top_prediction, COUNT(*)
+            FROM prediction_logs
+            WHERE {completed}
+            GROUP BY top_prediction
+            ORDER BY COUNT(*) DESC
+            LIMIT ?
+        """, (*params, top_n))
+        top_conditions = c.fetchall()
+
+    return {
+        "total": total,
+        "successful": successful or 0,
+        "avg_symptom_count": avg_symptoms,
+        "top_conditions": [{"condition": cond, "count": n} for cond, n in top_conditions]
+    }
+
+
 # ====================================
 # ADMIN DATASETS
 # ====================================
 
 def register_admin_dataset(filename, status="pending"):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             INSERT INTO admin_uploaded_datasets (filename, status)
             VALUES (?, ?)
         """, (filename, status))
-        conn.commit()
-    finally:
-        conn.close()
 
 
 def get_admin_datasets():
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             SELECT id, filename, status, uploaded_at
@@ -146,8 +287,6 @@ def get_admin_datasets():
             ORDER BY id DESC
         """)
         rows = c.fetchall()
-    finally:
-        conn.close()
     return rows
 
 
@@ -155,26 +294,47 @@ def get_admin_datasets():
 # SYMPTOM TRENDS (analytics)
 # ====================================
 
-def increment_symptom_counts(symptoms_list):
-    conn = get_connection()
-    try:
-        c = conn.cursor()
+TREND_TABLES = {
+    "hour": "symptom_trends_hourly",
+    "day": "symptom_trends_daily",
+}
+
 
-        for symptom in symptoms_list:
-            c.execute("""
-                UPDATE symptom_trends
-                SET count = count + 1
-                WHERE symptom = ?
-            """, (symptom,))
+def increment_symptom_counts(symptoms_list, bucket_time=None):
+    """Add one occurrence per item of symptoms_list (now, or in bucket_time's hour)."""
+    hour = time.strftime(TIME_BUCKETS["hour"], time.gmtime(bucket_time))
+    apply_symptom_deltas(Counter((hour, symptom) for symptom in symptoms_list))
 
-        conn.commit()
-    finally:
-        conn.close()
+
+def apply_symptom_deltas(deltas):
+    """
+    deltas: {(hour_bucket, symptom): n}, hour_bucket formatted as TIME_BUCKETS["hour"].
+    One upsert batch each for the all-time, hourly and daily tables, in one
+    transaction: a failed flush leaves no table updated, so retrying the same
+    deltas cannot count them twice. Symptoms seen for the first time get
+    their row created.
+    """
+    totals, daily = Counter(), Counter()
+    for (hour, symptom), n in deltas.items():
+        totals[symptom] += n
+        daily[(hour[:10], symptom)] += n
+    if not totals:
+        return
+
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT INTO symptom_trends (symptom, count) VALUES (?, ?)
+            ON CONFLICT (symptom) DO UPDATE SET count = count + excluded.count
+        """, list(totals.items()))
+        for table, counts in ((TREND_TABLES["hour"], deltas), (TREND_TABLES["day"], daily)):
+            conn.executemany(f"""
+                INSERT INTO {table} (bucket, symptom, count) VALUES (?, ?, ?)
+                ON CONFLICT (bucket, symptom) DO UPDATE SET count = count + excluded.count
+            """, [(bucket, symptom, n) for (bucket, symptom), n in counts.items()])
 
 
 def get_symptom_trends(limit=20):
-    conn = get_connection()
-    try:
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
             SELECT symptom, count
@@ -183,8 +343,39 @@ def get_symptom_trends(limit=20):
             LIMIT ?
         """, (limit,))
         rows = c.fetchall()
-    finally:
-        conn.close()
+    return rows
+
+
+def get_symptom_trend_buckets(bucket="hour", since=None, until=None, symptom=None, limit=1000):
+    """
+    Rows: (bucket, symptom, count), newest bucket first.
+    since/until are compared against the bucket label, e.g. "2025-01-31" or "2025-01-31 12:00:00".
+    """
+    if bucket not in TREND_TABLES:
+        raise ValueError(f"Unknown bucket: {bucket} (expected one of {sorted(TREND_TABLES)})")
+
+    clauses, params = [], []
+    if since:
+        clauses.append("bucket >= ?")
+        params.append(since)
+    if until:
+        clauses.append("bucket < ?")
+        params.append(until)
+    if symptom:
+        clauses.append("symptom = ?")
+        params.append(symptom)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT bucket, symptom, count
+            FROM {TREND_TABLES[bucket]}
+            {where}
+            ORDER BY bucket DESC, count DESC
+            LIMIT ?
+        """, (*params, limit))
+        rows = c.fetchall()
     return rows
 
 
@@ -194,17 +385,13 @@ def create_prediction_attempt(symptoms):
     Insert a placeholder row into prediction_logs to represent an attempt.
     Returns the inserted row id (check_id).
     """
-    conn = get_connection()
-    try: 
+    with connection() as conn:
         c = conn.cursor()
         c.execute("""
-            INSERT INTO prediction_logs (symptoms, predictions, top_prediction)
-            VALUES (?, ?, ?)
-        """, (str(symptoms), '[]', ''))  # use empty predictions/top_prediction as placeholder
-        conn.commit()
+            INSERT INTO prediction_logs (symptoms, predictions, top_prediction, symptom_count)
+            VALUES (?, ?, ?, ?)
+        """, (to_json_text(symptoms), '[]', '', symptom_count(symptoms)))  # empty predictions/top_prediction as placeholder
         inserted_id = c.lastrowid
-    finally:
-        conn.close()
     return inserted_id
 
 def update_prediction_result(check_id, predictions, top_pred):
@@ -212,15 +399,132 @@ def update_prediction_result(check_id, predictions, top_pred):
     Update the prediction_logs row created earlier with actual predictions.
     predictions: Python list/dict -> we will store as JSON string
     """
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        preds_json = json.dumps(predictions)
-        c.execute("""
+    update_prediction_results([(check_id, predictions, top_pred)])
+
+
+def update_prediction_results(rows):
+    """rows: iterable of (check_id, predictions, top_pred); predictions stored as JSON"""
+    with connection() as conn:
+        conn.executemany("""
             UPDATE prediction_logs
-            SET predictions = ?, top_prediction = ?
+            SET predictions = ?, top_prediction = ?, top_confidence = ?
+            WHERE id = ?
+        """, [
+            (to_json_text(predictions), top_pred, top_confidence(predictions), check_id)
+            for check_id, predictions, top_pred in rows
+        ])
+
+
+# ====================================
+# BACKGROUND JOBS
+# ====================================
+
+JOB_COLUMNS = ("id", "type", "status", "params", "progress", "message", "error", "log_path",
+               "pid", "owner", "cancel_requested", "created_at", "started_at", "finished_at")
+JOB_ACTIVE = ("queued", "running")
+# columns update_job() may set
+JOB_UPDATABLE = ("status", "progress", "message", "error", "log_path", "pid")
+
+
+def _job_dict(row):
+    if row is None:
+        return None
+    job = dict(zip(JOB_COLUMNS, row))
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def create_job(job_type, params=None, pid=None, owner=None):
+    """
+    Queue a job owned by a server process (owner token, see
+    backend/services/jobs.py) and return its id. Raises
+    sqlite3.IntegrityError while another job of the same type is queued or
+    running (see get_active_job()).
+    """
+    with connection() as conn:
+        c = conn.execute(
+            "INSERT INTO jobs (type, params, pid, owner) VALUES (?, ?, ?, ?)",
+            (job_type, json.dumps(params or {}), pid, owner)
+        )
+        return c.lastrowid
+
+
+def get_job(job_id):
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    return _job_dict(row)
+
+
+def get_active_job(job_type):
+    with connection() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE type = ? AND status IN (?, ?)",
+            (job_type, *JOB_ACTIVE)
+        ).fetchone()
+    return _job_dict(row)
+
+
+def get_jobs(limit=50, job_type=None, status=None):
+    clauses, params = [], []
+    if job_type:
+        clauses.append("type = ?")
+        params.append(job_type)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    with connection() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit)
+        ).fetchall()
+    return [_job_dict(row) for row in rows]
+
+
+def update_job(job_id, **fields):
+    unknown = set(fields) - set(JOB_UPDATABLE)
+    if unknown:
+        raise ValueError(f"Cannot update job columns: {sorted(unknown)}")
+
+    sets = [f"{name} = ?" for name in fields]
+    status = fields.get("status")
+    if status == "running":
+        sets.append("started_at = CURRENT_TIMESTAMP")
+    elif status is not None and status not in JOB_ACTIVE:
+        sets.append("finished_at = CURRENT_TIMESTAMP")
+
+    with connection() as conn:
+        conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE id = ?", (*fields.values(), job_id))
+
+
+def request_job_cancel(job_id):
+    """Flag an active job for cancellation. Returns False if it already finished."""
+    with connection() as conn:
+        c = conn.execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN (?, ?)",
+            (job_id, *JOB_ACTIVE)
+        )
+        return c.rowcount > 0
+
+
+def fail_interrupted_jobs(is_alive):
+    """
+    Mark active jobs whose owning process (is_alive(jobs.owner) is false) is
+    gone as failed, so a crashed server does not hold the per-type lock
+    forever. Returns their ids.
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT id, owner FROM jobs WHERE status IN (?, ?)", JOB_ACTIVE
+        ).fetchall()
+        dead = [job_id for job_id, owner in rows if owner is None or not is_alive(owner)]
+        conn.executemany("""
+            UPDATE jobs SET status = 'failed', error = 'interrupted (server stopped)',
+                finished_at = CURRENT_TIMESTAMP
             WHERE id = ?
-        """, (preds_json, top_pred, check_id))
-        conn.commit()
-    finally:
-        conn.close()
\ No newline at end of file
+        """, [(job_id,) for job_id in dead])
+    return dead
@@ -5,8 +5,17 @@ CREATE TABLE IF NOT EXISTS models (
     path TEXT NOT NULL,
     accuracy REAL,
     top3_accuracy REAL,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    -- content-addressed registry (ml/model_registry.py): artifact hash + size,
+    -- evaluation / CV scores as JSON and the hash of the data it was trained on
+    sha256 TEXT,
+    size_bytes INTEGER,
+    metrics TEXT,
+    data_fingerprint TEXT
 );
+-- idx_models_sha256 is created by migration 4 (database/migrations.py), which
+-- init_db runs after this file: on an existing models table the sha256 column
+-- only exists once that migration has added it.
 
 -- FEATURES TABLE
 CREATE TABLE IF NOT EXISTS features (
@@ -39,8 +48,13 @@ CREATE TABLE IF NOT EXISTS prediction_logs (
     symptoms TEXT NOT NULL,
     predictions TEXT NOT NULL,
     top_prediction TEXT NOT NULL,
-    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    symptom_count INTEGER DEFAULT 0,
+    top_confidence REAL
 );
+-- symptoms / predictions hold JSON text (queryable with json_each / json_extract)
+CREATE INDEX IF NOT EXISTS idx_prediction_logs_created_at ON prediction_logs (created_at);
+CREATE INDEX IF NOT EXISTS idx_prediction_logs_top_prediction ON prediction_logs (top_prediction, created_at);
 
 -- SYMPTOM TRENDS
 CREATE TABLE IF NOT EXISTS symptom_trends (
@@ -48,3 +62,40 @@ CREATE TABLE IF NOT EXISTS symptom_trends (
     symptom TEXT NOT NULL,
     count INTEGER DEFAULT 0
 );
+-- idx_symptom_trends_symptom (unique) is created by migration 2, after it has
+-- merged the duplicate rows an existing table may hold.
+
+-- SYMPTOM TRENDS PER TIME BUCKET (bucket = 'YYYY-MM-DD HH:00:00' / 'YYYY-MM-DD', UTC)
+CREATE TABLE IF NOT EXISTS symptom_trends_hourly (
+    bucket TEXT NOT NULL,
+    symptom TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, symptom)
+);
+
+CREATE TABLE IF NOT EXISTS symptom_trends_daily (
+    bucket TEXT NOT NULL,
+    symptom TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, symptom)
+);
+
+-- BACKGROUND ADMIN JOBS (retrain, preprocess, ...); one queued/running job per type
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+    params TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    log_path TEXT,
+    pid INTEGER,
+    owner TEXT,  -- "<pid>:<process start time>" of the server that queued it
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_type ON jobs (type) WHERE status IN ('queued', 'running');
@@ -31,10 +31,10 @@
   /* ---------- LOAD STATS ---------- */
   async function loadStats() {
     try {
-      const logsResp = await fetch('http://127.0.0.1:5000/api/admin/logs');
-      const logs = logsResp.ok ? await logsResp.json() : [];
-      const total = Array.isArray(logs) ? logs.length : 0;
-      const successful = Array.isArray(logs) ? logs.filter(l => l.predictions && l.predictions !== '[]').length : 0;
+      const summaryResp = await fetch('http://127.0.0.1:5000/api/admin/logs/summary');
+      const summary = summaryResp.ok ? await summaryResp.json() : {};
+      const total = summary.total ?? 0;
+      const successful = summary.successful ?? 0;
 
       totalChecksEl.textContent = fmt(total);
       successfulChecksEl.textContent = fmt(successful);
@@ -159,6 +159,19 @@
   // }
 
 
+  /* ---------- BACKGROUND JOBS ---------- */
+  // Admin operations answer 202 with a job id; poll it until it finishes.
+  async function waitForJob(jobId, onProgress) {
+    while (true) {
+      const resp = await fetch(`http://127.0.0.1:5000/api/admin/jobs/${jobId}?tail=1`);
+      const job = await resp.json();
+      if (!resp.ok) throw new Error(job.error || resp.status);
+      if (onProgress) onProgress(job);
+      if (job.status !== 'queued' && job.status !== 'running') return job;
+      await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+  }
+
   /* ---------- RETRAIN ---------- */
   async function retrain() {
     if (!confirm('This will retrain the ML model with the master dataset. Continue?')) return;
@@ -166,8 +179,21 @@
     try {
       const resp = await fetch('http://127.0.0.1:5000/api/admin/retrain', { method: 'POST' });
       const data = await resp.json();
-      if(resp.ok) setStatus("Retrain triggered. Check logs for progress.", actionStatus);
-      else setStatus("Retrain failed: " + (data.error || ""), actionStatus);
+      if (!resp.ok) {
+        setStatus("Retrain failed: " + (data.error || ""), actionStatus);
+        return;
+      }
+      const job = await waitForJob(data.job_id, (job) => {
+        setProgress(Math.round(job.progress * 100));
+        setStatus("Retraining: " + (job.message || job.status), actionStatus);
+      });
+      if (job.status === 'succeeded') {
+        setStatus("Retraining complete.", actionStatus);
+        await loadStats();
+      } else {
+        setStatus("Retrain " + job.status + ": " + (job.error || ""), actionStatus);
+        setProgress(0);
+      }
     } catch(err) {
       console.error('retrain error', err);
       setStatus("Retrain failed: " + err.message, actionStatus);
@@ -218,14 +244,16 @@
       });
 
       const data = await resp.json();
+      const job = resp.ok ? await waitForJob(data.job_id) : null;
 
-      if (resp.ok) {
+      if (job && job.status === 'succeeded') {
         setProgress(100);
         setStatus("Preprocessing successful.", syncStatus);
         setStatus("Preprocessing complete. Master dataset ready.", actionStatus);
       } else {
-        setStatus("Preprocess failed: " + (data.error || "", actionStatus));
-        setStatus("Preprocess failed: " + (data.error || "", actionStatus));
+        const error = job ? job.status + ": " + (job.error || "") : (data.error || "");
+        setStatus("Preprocess failed: " + error, syncStatus);
+        setStatus("Preprocess failed: " + error, actionStatus);
         setProgress(0);
       }
 
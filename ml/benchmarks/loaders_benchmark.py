@@ -0,0 +1,198 @@
+"""Benchmark: vectorized loaders vs the original iterrows() implementations.
+
+Writes synthetic binary-matrix (text and all-numeric), symptom-list and
+free-text CSVs of each size, checks that both implementations return
+identical frames and prints timings.
+
+Run as: python ml/benchmarks/loaders_benchmark.py --sizes 10000,100000,1000000
+(the legacy loaders take minutes at 1M rows; --legacy_max_rows caps them)
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.preprocess.cleaners.normalize_text import normalize_text
+from ml.preprocess.loaders.loader_binary_matrix import BinaryMatrixLoader
+from ml.preprocess.loaders.loader_symptom_list import SymptomListLoader
+from ml.preprocess.loaders.loader_textual_description import TextualDescriptionLoader
+
+
+# ---------------------
+# Reference (row-by-row) implementations
+# ---------------------
+def legacy_binary_matrix(path):
+    df = pd.read_csv(path)
+    cols = df.columns.tolist()
+    disease_col = None
+    for c in cols:
+        if c.lower() in ('disease', 'disease_name', 'diagnosis'):
+            disease_col = c
+            break
+    if disease_col is None:
+        disease_col = cols[0]
+    symptom_cols = [c for c in cols if c != disease_col]
+
+    records = []
+    for _, row in df.iterrows():
+        disease = str(row[disease_col]).strip()
+        symptoms = [s for s in symptom_cols if str(row[s]) not in ('0', '0.0', 'False', 'false', '')]
+        records.append({'disease': disease, 'symptoms': symptoms})
+    return pd.DataFrame(records)
+
+
+def legacy_numeric_matrix(path):
+    """
+    legacy_binary_matrix() minus its one intended difference: iterrows() read
+    int disease codes as floats ('7.0') when a symptom column was float.
+    """
+    df = legacy_binary_matrix(path)
+    if len(df):
+        df['disease'] = df['disease'].str.removesuffix('.0')
+    return df
+
+
+def legacy_symptom_list(path):
+    df = pd.read_csv(path)
+    cols = {c.lower(): c for c in df.columns}
+    disease_col = cols.get('disease') or cols.get('disease_name') or list(df.columns)[0]
+    symptoms_col = None
+    for key in ['symptoms', 'symptom', 'symptom_list', 'symptom(s)', 'description']:
+        if key in cols:
+            symptoms_col = cols[key]
+            break
+    if symptoms_col is None:
+        symptoms_col = list(df.columns)[1] if len(df.columns) > 1 else None
+
+    records = []
+    for _, row in df.iterrows():
+        disease = str(row[disease_col]).strip()
+        raw = ''
+        if symptoms_col:
+            raw = str(row[symptoms_col])
+        parts = [s.strip() for s in str(raw).replace(';', ',').replace('/', ',').split(',') if s.strip()]
+        records.append({'disease': disease, 'symptoms': parts})
+    return pd.DataFrame(records)
+
+
+def legacy_textual_description(path):
+    df = pd.read_csv(path)
+    cols = {c.lower(): c for c in df.columns}
+    disease_col = cols.get('disease') or cols.get('diagnosis') or list(df.columns)[0]
+    desc_col = None
+    for key in ['description', 'symptoms', 'clinical_notes', 'text']:
+        if key in cols:
+            desc_col = cols[key]
+            break
+    if desc_col is None:
+        desc_col = list(df.columns)[1] if len(df.columns) > 1 else None
+
+    records = []
+    for _, row in df.iterrows():
+        disease = str(row[disease_col]).strip()
+        raw = ''
+        if desc_col:
+            raw = str(row[desc_col])
+        text = normalize_text(raw)
+        tokens = [t.strip() for t in text.replace(';', '.').split('.') if t.strip()]
+        records.append({'disease': disease, 'symptoms': tokens})
+    return pd.DataFrame(records)
+
+
+# ---------------------
+# Synthetic datasets
+# ---------------------
+SYMPTOMS = [f"symptom_{i}" for i in range(200)]
+DISEASES = [f"Disease {i}" for i in range(300)]
+
+
+def write_binary_matrix(path, n_rows, n_symptoms=50, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame((rng.random((n_rows, n_symptoms)) < 0.1).astype(np.int8),
+                      columns=SYMPTOMS[:n_symptoms])
+    df.insert(0, 'Disease', rng.choice(DISEASES, n_rows))
+    df.to_csv(path, index=False)
+
+
+def write_numeric_matrix(path, n_rows, n_symptoms=50, seed=0):
+    """All-numeric frame: int disease codes, 0/1 symptom columns, one of them float (it has gaps)."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame((rng.random((n_rows, n_symptoms)) < 0.1).astype(np.int8),
+                      columns=SYMPTOMS[:n_symptoms])
+    df[SYMPTOMS[0]] = np.where(rng.random(n_rows) < 0.2, np.nan, df[SYMPTOMS[0]])
+    df.insert(0, 'Disease', rng.integers(0, len(DISEASES), n_rows))
+    df.to_csv(path, index=False)
+
+
+def write_symptom_list(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    seps = np.array([', ', ';', ' / ', ',, '])
+    lengths = rng.integers(0, 8, n_rows)
+    picks = rng.choice(SYMPTOMS, int(lengths.sum()))
+    sep = seps[rng.integers(0, len(seps), n_rows)]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    symptoms = [sep[i].join(picks[bounds[i]:bounds[i + 1]]) for i in range(n_rows)]
+    pd.DataFrame({'Disease': rng.choice(DISEASES, n_rows), 'Symptoms': symptoms}).to_csv(path, index=False)
+
+
+def write_textual_description(path, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(0, 5, n_rows)
+    picks = rng.choice(SYMPTOMS, int(lengths.sum()))
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    text = [
+        "Patient reports  " + ". Also ".join(p.upper() for p in picks[bounds[i]:bounds[i + 1]]) + "; otherwise fine!"
+        for i in range(n_rows)
+    ]
+    pd.DataFrame({'Disease': rng.choice(DISEASES, n_rows), 'Description': text}).to_csv(path, index=False)
+
+
+CASES = [
+    ("binary_matrix", write_binary_matrix, legacy_binary_matrix, BinaryMatrixLoader),
+    ("binary_matrix_numeric", write_numeric_matrix, legacy_numeric_matrix, BinaryMatrixLoader),
+    ("symptom_list", write_symptom_list, legacy_symptom_list, SymptomListLoader),
+    ("textual_description", write_textual_description, legacy_textual_description, TextualDescriptionLoader),
+]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(sizes, legacy_max_rows=None):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in sizes:
+            for name, write, legacy, loader_cls in CASES:
+                path = os.path.join(tmp, f"{name}_{n_rows}.csv")
+                write(path, n_rows)
+
+                new_df, new_s = timed(loader_cls().load, path)
+                row = {'loader': name, 'rows': n_rows, 'vectorized_s': round(new_s, 3)}
+
+                if legacy_max_rows is None or n_rows <= legacy_max_rows:
+                    old_df, old_s = timed(legacy, path)
+                    pd.testing.assert_frame_equal(new_df, old_df)
+                    row.update(legacy_s=round(old_s, 3), speedup=round(old_s / new_s, 1))
+
+                print(row)
+                results.append(row)
+                os.remove(path)
+    return results
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--sizes', default='10000,100000,1000000')
+    p.add_argument('--legacy_max_rows', type=int, default=None)
+    args = p.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.legacy_max_rows)
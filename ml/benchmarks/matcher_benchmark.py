@@ -0,0 +1,77 @@
+"""Benchmark: SymptomMatcher lookup latency on the real feature index.
+
+Resolves misspelt, reworded and unknown variants of the features.json names
+(uncached, so every lookup goes through the trigram index) and reports the
+per-lookup latency and how the inputs were matched.
+
+Run as: python ml/benchmarks/matcher_benchmark.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.preprocess.cleaners.symptom_cleaner import SynonymIndex
+from ml.symptom_matcher import SymptomMatcher
+
+
+def variants(names, n, seed=0):
+    """Inputs derived from feature names: a dropped or doubled letter, a suffix, or noise."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for name in rng.choice(names, n):
+        i = int(rng.integers(0, len(name)))
+        kind = int(rng.integers(0, 4))
+        if kind == 0:
+            out.append(name[:i] + name[i + 1:])
+        elif kind == 1:
+            out.append(name[:i] + name[i] + name[i:])
+        elif kind == 2:
+            out.append(name.title() + 's')
+        else:
+            out.append(''.join(rng.choice(list('bcdfgkqvwxz'), 6)))
+    return out
+
+
+def run(features_path, synonyms_path, lookups):
+    with open(features_path, 'r') as f:
+        features = json.load(f)
+    synonyms = None
+    if os.path.exists(synonyms_path):
+        with open(synonyms_path, 'r', encoding='utf-8') as f:
+            synonyms = SynonymIndex(json.load(f))
+
+    start = time.perf_counter()
+    matcher = SymptomMatcher(features, synonyms, cache_size=0)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    inputs = variants(list(features), lookups)
+    start = time.perf_counter()
+    matches = [matcher.match(s) for s in inputs]
+    per_lookup_us = (time.perf_counter() - start) / len(inputs) * 1e6
+
+    result = {
+        'features': len(features),
+        'terms': len(matcher),
+        'build_ms': round(build_ms, 1),
+        'us_per_lookup': round(per_lookup_us, 1),
+        'methods': dict(Counter(m.method if m else 'unmatched' for m in matches))
+    }
+    print(result)
+    return result
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--features', default=os.path.join(PROJECT_ROOT, 'ml/data/processed/features.json'))
+    p.add_argument('--synonyms', default=os.path.join(PROJECT_ROOT, 'ml/preprocess/cleaners/synonyms_map.json'))
+    p.add_argument('--lookups', type=int, default=20000)
+    args = p.parse_args()
+    run(args.features, args.synonyms, args.lookups)
@@ -0,0 +1,107 @@
+"""Benchmark: vectorized DatasetMerger.merge vs the original row-by-row merge.
+
+Builds staged frames (disease, symptom lists with synonyms, messy case and
+duplicate rows) of each size, checks both merges keep the same rows and
+prints wall time and peak traced memory (tracemalloc).
+
+Run as: python ml/benchmarks/merger_benchmark.py --sizes 10000,100000,1000000
+(the legacy merge takes minutes at 1M rows; --legacy_max_rows caps it)
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.preprocess.cleaners.disease_cleaner import clean_disease
+from ml.preprocess.merger.dataset_merger import DatasetMerger
+from ml.benchmarks.synonyms_benchmark import legacy_clean_symptom
+
+SYNONYMS = {f"symptom {i}": [f"syn {i}"] for i in range(0, 60, 4)}
+
+
+def legacy_merge(staged_list, synonyms):
+    """The original merge: iterrows, list of dicts, row-wise apply for the signature."""
+    rows = []
+    all_symptoms = set()
+    for source_name, df in staged_list:
+        for _, r in df.iterrows():
+            disease = clean_disease(r['disease'])
+            symptoms = r.get('symptoms') or []
+            if isinstance(symptoms, str):
+                symptoms = [s.strip() for s in symptoms.split(',') if s.strip()]
+            cleaned = []
+            for s in symptoms:
+                cs = legacy_clean_symptom(s, synonyms)
+                if cs:
+                    cleaned.append(cs)
+                    all_symptoms.add(cs)
+            rows.append({'disease': disease, 'symptoms': list(set(cleaned)), 'source': source_name})
+
+    master_df = pd.DataFrame(rows)
+    master_df['sig'] = master_df.apply(lambda r: r['disease'] + '|' + '|'.join(sorted(r['symptoms'])), axis=1)
+    master_df = master_df.drop_duplicates('sig').drop(columns=['sig'])
+    feature_index = {s: i for i, s in enumerate(sorted(all_symptoms))}
+    return master_df, feature_index
+
+
+def staged_frames(n_rows, n_sources=4, seed=0):
+    rng = np.random.default_rng(seed)
+    # few distinct diseases and a small vocabulary, so a good share of rows are duplicates
+    diseases = np.array([f"Disease {i}" for i in range(40)], dtype=object)
+    vocab = np.array([f"Symptom {i}" for i in range(60)] + [f" syn {i}" for i in range(0, 60, 4)], dtype=object)
+    lengths = rng.integers(1, 4, n_rows)
+    flat = vocab[rng.integers(0, len(vocab), lengths.sum())]
+    lists = np.split(flat, np.cumsum(lengths)[:-1])
+    frame = pd.DataFrame({
+        'disease': diseases[rng.integers(0, len(diseases), n_rows)],
+        'symptoms': [list(l) for l in lists]
+    })
+    bounds = np.linspace(0, n_rows, n_sources + 1).astype(int)
+    return [(f"source_{i}.csv", frame.iloc[start:end].reset_index(drop=True))
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2 ** 20
+
+
+def canonical(master_df):
+    return sorted(zip(master_df['disease'], (tuple(sorted(s)) for s in master_df['symptoms']), master_df['source']))
+
+
+def run(sizes, legacy_max_rows):
+    results = []
+    for n_rows in sizes:
+        staged = staged_frames(n_rows)
+        merger = DatasetMerger(SYNONYMS)
+        (master, features), seconds, peak_mb = measure(lambda: merger.merge(staged))
+        row = {'rows': n_rows, 'kept': len(master), 'merge_s': round(seconds, 2), 'merge_peak_mb': round(peak_mb, 1)}
+
+        if n_rows <= legacy_max_rows:
+            (legacy, legacy_features), seconds, peak_mb = measure(lambda: legacy_merge(staged, SYNONYMS))
+            assert canonical(legacy) == canonical(master) and legacy_features == features
+            row.update(legacy_s=round(seconds, 2), legacy_peak_mb=round(peak_mb, 1))
+        print(row, merger.source_stats)
+        results.append(row)
+    return results
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--sizes', default='10000,100000,1000000')
+    p.add_argument('--legacy_max_rows', type=int, default=100000)
+    args = p.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.legacy_max_rows)
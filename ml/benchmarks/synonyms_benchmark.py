@@ -0,0 +1,88 @@
+"""Benchmark: SynonymIndex lookups vs the original linear-scan clean_symptom.
+
+Builds synthetic synonym maps (default 100 / 5k / 50k canonical entries with
+three synonyms each) and resolves a stream of symptoms that mixes canonical
+names, synonyms and unknown terms. The linear scan is timed on a sample only
+(--legacy_lookups), since it is O(map size) per symptom.
+
+Run as: python ml/benchmarks/synonyms_benchmark.py --sizes 100,5000,50000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.preprocess.cleaners.normalize_text import normalize_text
+from ml.preprocess.cleaners.symptom_cleaner import SynonymIndex
+
+
+def legacy_clean_symptom(s, synonyms):
+    s = normalize_text(s)
+    for canonical, syns in synonyms.items():
+        if s == canonical or s in syns:
+            return canonical
+    return s
+
+
+def synthetic_synonyms(n_entries):
+    return {
+        f"symptom {i}": [f"syn {i} a", f"syn {i} b", f"syn {i} c"]
+        for i in range(n_entries)
+    }
+
+
+def synthetic_symptoms(n_entries, n_lookups, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, n_entries, n_lookups)
+    kinds = rng.integers(0, 3, n_lookups)
+    # raw-looking input: mixed case and stray whitespace, like uploaded datasets
+    return [
+        (f"Symptom {i}", f" SYN {i} b", f"unknown {i}")[k]
+        for i, k in zip(ids.tolist(), kinds.tolist())
+    ]
+
+
+def per_lookup_us(fn, symptoms):
+    start = time.perf_counter()
+    for s in symptoms:
+        fn(s)
+    return (time.perf_counter() - start) / len(symptoms) * 1e6
+
+
+def run(sizes, lookups, legacy_lookups):
+    results = []
+    for n_entries in sizes:
+        synonyms = synthetic_synonyms(n_entries)
+        symptoms = synthetic_symptoms(n_entries, lookups)
+
+        start = time.perf_counter()
+        index = SynonymIndex(synonyms)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        sample = symptoms[:legacy_lookups]
+        assert [index.resolve(s) for s in sample] == [legacy_clean_symptom(s, synonyms) for s in sample]
+
+        row = {
+            'entries': n_entries,
+            'index_build_ms': round(build_ms, 1),
+            'index_us_per_lookup': round(per_lookup_us(index.resolve, symptoms), 3),
+            'legacy_us_per_lookup': round(per_lookup_us(lambda s: legacy_clean_symptom(s, synonyms), sample), 1),
+        }
+        row['speedup'] = round(row['legacy_us_per_lookup'] / row['index_us_per_lookup'], 1)
+        print(row)
+        results.append(row)
+    return results
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--sizes', default='100,5000,50000')
+    p.add_argument('--lookups', type=int, default=200000)
+    p.add_argument('--legacy_lookups', type=int, default=500)
+    args = p.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.lookups, args.legacy_lookups)
@@ -1,40 +1,40 @@
 import json
 import argparse
-import pandas as pd
 import joblib
-from sklearn.metrics import accuracy_score
-from preprocess.merger.vector_builder import VectorBuilder
-from preprocess.merger.feature_indexer import FeatureIndexer
+from preprocess.merger.master_matrix import load_dataset
+from utils import top_k
 import numpy as np
 
+def top_k_accuracies(clf, X, y_true, ks=(1, 3)):
+    """{k: top-k accuracy} for every k in ks, from a single predict_proba."""
+    # proba columns follow clf.classes_, so map the winning columns back to labels
+    idx, _ = top_k(clf.predict_proba(X), max(ks))
+    hits = np.asarray(clf.classes_)[idx] == np.asarray(y_true)[:, np.newaxis]
+    return {k: float(hits[:, :k].any(axis=1).mean()) for k in ks}
+
 def top_k_accuracy(clf, X, y_true, k=3):
-    proba = clf.predict_proba(X)
-    topk = np.argsort(proba, axis=1)[:, ::-1][:, :k]
-    correct = 0
-    for i, row in enumerate(topk):
-        if y_true[i] in row:
-            correct += 1
-    return correct / len(y_true)
+    return top_k_accuracies(clf, X, y_true, (k,))[k]
 
-def evaluate(master_csv, features_json, model_path):
-    df = pd.read_csv(master_csv)
-    features = FeatureIndexer.load(features_json)
-    vb = VectorBuilder(features)
-    X, y = vb.dataset_to_matrix(df)
+def evaluate(master_csv, features_json, model_path, dataset=None, model_obj=None):
+    """Scores the model on the dataset and writes <model>.eval.json; returns the scores.
+    dataset / model_obj: already loaded by the caller (see pipeline_runner.py)."""
+    X, labels, classes = dataset if dataset is not None else load_dataset(master_csv, features_json)
 
     # load model
-    obj = joblib.load(model_path)
+    obj = model_obj if model_obj is not None else joblib.load(model_path)
     clf = obj['model']
     le = obj['label_encoder']
-    y_enc = le.transform(y)
+    # dataset label codes -> the model's encoding (unknown diseases raise, as before)
+    y_enc = le.transform(classes)[labels]
 
-    acc = accuracy_score(y_enc, clf.predict(X))
-    top3 = top_k_accuracy(clf, X, y_enc, k=3)
+    # top-1 (plain accuracy) and top-3 from one predict_proba pass
+    scores = top_k_accuracies(clf, X, y_enc, ks=(1, 3))
 
-    res = {'accuracy': float(acc), 'top3_accuracy': float(top3)}
+    res = {'accuracy': scores[1], 'top3_accuracy': scores[3]}
     print(json.dumps(res, indent=2))
     with open(model_path + '.eval.json', 'w', encoding='utf-8') as f:
         json.dump(res, f, ensure_ascii=False, indent=2)
+    return res
 
 if __name__ == '__main__':
     p = argparse.ArgumentParser()
@@ -0,0 +1,217 @@
+"""Flat-array RandomForest evaluator.
+
+Flattens a fitted RandomForestClassifier into contiguous NumPy arrays
+(feature, threshold, left, right + leaf values) that can be memory-mapped
+at serve time and evaluated for all trees at once, without going through
+sklearn's per-estimator traversal.
+
+Layout (one .npy file per array inside the compiled directory):
+    roots         (n_trees,)       index of each tree's root node
+    feature       (n_nodes,)       split feature (0 for leaves)
+    threshold     (n_nodes,)       split threshold (0 for leaves)
+    left, right   (n_nodes,)       child nodes; leaves point to themselves
+Leaf class probabilities (already divided by n_trees) are stored either
+sparse, which suits pure leaves:
+    value_indptr  (n_nodes + 1,)   CSR pointers into value_class / value_prob
+    value_class   (n_values,)      class index of each non-zero leaf entry
+    value_prob    (n_values,)      probability of that entry
+or dense, when most leaf entries are non-zero anyway:
+    leaf_index    (n_nodes,)       row of leaf_values for each leaf node
+    leaf_values   (n_leaves, n_classes)
+plus meta.json with shapes, layout, class names and the source model hash.
+"""
+import json
+import os
+import numpy as np
+import scipy.sparse as sp
+
+FORMAT_VERSION = 1
+TREE_ARRAYS = ('roots', 'feature', 'threshold', 'left', 'right')
+LEAF_ARRAYS = {
+    'sparse': ('value_indptr', 'value_class', 'value_prob'),
+    'dense': ('leaf_index', 'leaf_values'),
+}
+# leaves are stored dense once more than this fraction of their entries is non-zero
+DENSE_LEAF_THRESHOLD = 0.25
+
+
+def compile_forest(model_obj, out_dir, source_sha256=None):
+    """Flatten {'model': RandomForestClassifier, 'label_encoder': LabelEncoder} into out_dir."""
+    clf = model_obj['model']
+    le = model_obj['label_encoder']
+    if getattr(clf, 'n_outputs_', 1) != 1:
+        raise ValueError('Only single-output forests can be compiled')
+
+    n_classes = int(clf.n_classes_)
+    n_trees = len(clf.estimators_)
+
+    roots, feature, threshold, left, right = [], [], [], [], []
+    value_node, value_class, value_prob = [], [], []
+    offset = 0
+    max_depth = 0
+
+    for est in clf.estimators_:
+        t = est.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+        own = np.arange(n) + offset
+
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(np.where(is_leaf, 0.0, t.threshold))
+        left.append(np.where(is_leaf, own, t.children_left + offset))
+        right.append(np.where(is_leaf, own, t.children_right + offset))
+
+        # per-leaf class distribution, normalized like DecisionTreeClassifier.predict_proba
+        values = t.value[:, 0, :n_classes].astype(np.float64)
+        values[~is_leaf] = 0.0
+        norm = values.sum(axis=1, keepdims=True)
+        norm[norm == 0] = 1.0
+        values = values / norm / n_trees
+
+        nz_node, nz_class = np.nonzero(values)
+        value_node.append(nz_node + offset)
+        value_class.append(nz_class)
+        value_prob.append(values[nz_node, nz_class])
+
+        offset += n
+        max_depth = max(max_depth, int(t.max_depth))
+
+    arrays = {
+        'roots': np.asarray(roots, dtype=np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+    }
+
+    split = arrays['left'] != np.arange(offset)
+    n_leaves = int(offset - split.sum())
+    value_node = np.concatenate(value_node)
+    value_class = np.concatenate(value_class).astype(np.int32)
+    value_prob = np.concatenate(value_prob).astype(np.float64)
+
+    if len(value_prob) > DENSE_LEAF_THRESHOLD * n_leaves * n_classes:
+        layout = 'dense'
+        leaf_index = np.zeros(offset, dtype=np.int32)
+        leaf_index[~split] = np.arange(n_leaves)
+        leaf_values = np.zeros((n_leaves, n_classes), dtype=np.float64)
+        leaf_values[leaf_index[value_node], value_class] = value_prob
+        arrays['leaf_index'] = leaf_index
+        arrays['leaf_values'] = leaf_values
+    else:
+        layout = 'sparse'
+        counts = np.bincount(value_node, minlength=offset)
+        arrays['value_indptr'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        arrays['value_class'] = value_class
+        arrays['value_prob'] = value_prob
+
+    split_thresholds = arrays['threshold'][split]
+    # sklearn splits a 0/1 feature at the midpoint 0.5; when every split is
+    # there the evaluator tests the raw flag instead of comparing thresholds.
+    # (Any threshold in (0, 1) is not enough: continuous features in [0, 1]
+    # split there too.)
+    binary = bool(np.all(split_thresholds == 0.5))
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, name + '.npy'), np.ascontiguousarray(arr))
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'n_features': int(clf.n_features_in_),
+        'n_classes': n_classes,
+        'n_trees': n_trees,
+        'n_nodes': int(offset),
+        'max_depth': max_depth,
+        'binary': binary,
+        'leaf_layout': layout,
+        'classes': [str(c) for c in le.classes_],
+        'source_sha256': source_sha256,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class FlatForest:
+    """Vectorized evaluator over the arrays written by compile_forest."""
+
+    def __init__(self, arrays, meta):
+        self.leaf_layout = meta['leaf_layout']
+        for name in TREE_ARRAYS + LEAF_ARRAYS[self.leaf_layout]:
+            # plain ndarray views over the (possibly memory-mapped) buffers;
+            # np.memmap's subclass hooks make fancy indexing several times slower
+            setattr(self, name, arrays[name].view(np.ndarray))
+        self.meta = meta
+        self.n_features = meta['n_features']
+        self.n_classes = meta['n_classes']
+        self.n_trees = meta['n_trees']
+        self.max_depth = meta['max_depth']
+        self.binary = meta['binary']
+        self.classes_ = np.asarray(meta['classes'], dtype=object)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f'Unsupported compiled forest format: {meta.get("format_version")}')
+        arrays = {
+            name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+            for name in TREE_ARRAYS + LEAF_ARRAYS[meta['leaf_layout']]
+        }
+        return cls(arrays, meta)
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (n_rows, n_trees)."""
+        X = X.toarray() if sp.issparse(X) else np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f'X has {X.shape[1]} features, forest expects {self.n_features}')
+
+        if self.binary:
+            X = X != 0
+        else:
+            X = X.astype(np.float32)
+
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+
+        # leaves point to themselves, so max_depth steps settle every tree
+        for _ in range(self.max_depth):
+            f = self.feature[nodes]
+            if self.binary:
+                go_right = X[rows, f]
+            else:
+                go_right = X[rows, f] > self.threshold[nodes]
+            nodes = np.where(go_right, self.right[nodes], self.left[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        if self.leaf_layout == 'dense':
+            # one row at a time keeps the gathered (n_trees, n_classes) block small
+            return np.stack([self.leaf_values[self.leaf_index[row]].sum(axis=0) for row in leaves])
+
+        n_rows = leaves.shape[0]
+
+        start = self.value_indptr[leaves].ravel()
+        lengths = self.value_indptr[leaves + 1].ravel() - start
+        total = int(lengths.sum())
+
+        # flat index of every non-zero leaf entry touched by each row
+        ends = np.cumsum(lengths)
+        pos = np.arange(total) + np.repeat(start - (ends - lengths), lengths)
+        row_ids = np.repeat(np.repeat(np.arange(n_rows), self.n_trees), lengths)
+
+        proba = np.bincount(
+            row_ids * self.n_classes + self.value_class[pos],
+            weights=self.value_prob[pos],
+            minlength=n_rows * self.n_classes
+        )
+        return proba.reshape(n_rows, self.n_classes)
+
+    def predict(self, X):
+        return self.predict_proba(X).argmax(axis=1)
@@ -0,0 +1,273 @@
+"""Content-addressed registry of exported models.
+
+Every exported model is stored once, by the sha256 of its bytes:
+    saved_models/objects/<sha[:2]>/<sha>.joblib
+and registered in the models table with its hash, size, scores (evaluation
+and CV, as JSON) and the fingerprint of the data it was trained on.
+models.path is relative to the project root (like the rows from before the
+registry), so the checkout can move; the registry's rows carry it resolved.
+Exporting bytes that are already registered only moves latest_model.joblib.
+
+latest_model.joblib and the active model (ml/model/rf_model.joblib) are hard
+links to the stored object (a symlink, or a copy as a last resort, where the
+file system has no hard links), so an export costs one copy of the model at
+most and none for a version stored before. Objects are read-only; whatever
+writes the active model must write a new file and rename it over the link
+(train.py does).
+
+gc() keeps the newest MODEL_KEEP_VERSIONS versions plus the active and the
+latest one, deletes the other versions' rows, and removes objects no row
+refers to. It runs after every export.
+
+Run as: python ml/model_registry.py list | gc [--keep N] [--dry_run] | import
+(import moves rf_model_*.joblib copies from before the registry into it)
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+from datetime import datetime, timezone
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from database.queries import (
+    register_model_version,
+    get_model_versions,
+    get_model_by_sha256,
+    delete_models
+)
+from ml.utils import file_sha256
+
+REGISTRY_DIR = os.path.join(PROJECT_ROOT, "ml/model/saved_models")
+ACTIVE_MODEL = os.path.join(PROJECT_ROOT, "ml/model/rf_model.joblib")
+OBJECTS_DIR = "objects"
+LATEST = "latest_model.joblib"
+META = "meta.json"
+# versions kept by gc() besides the active and latest ones (0 = keep all)
+MODEL_KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", "10"))
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def link_file(src, dest):
+    """Point dest at src's bytes: hard link, else symlink, else copy. Replaces dest atomically."""
+    if _same_file(src, dest):
+        # (rename() between two links to one file would do nothing and leave tmp behind)
+        return "unchanged"
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+        method = "hardlink"
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(src), tmp)
+            method = "symlink"
+        except OSError:
+            shutil.copy2(src, tmp)
+            method = "copy"
+    os.replace(tmp, dest)
+    return method
+
+
+def _on_same_drive(a, b):
+    # relpath() cannot cross Windows drives
+    return os.path.splitdrive(os.path.abspath(a))[0].lower() == os.path.splitdrive(os.path.abspath(b))[0].lower()
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def model_metrics(model_path, scores=None):
+    """scores (default: <model>.eval.json) plus the CV scores in the model's metadata."""
+    metrics = dict(scores) if scores is not None else _read_json(model_path + ".eval.json")
+    cv = _read_json(model_path + ".meta.json").get("cv")
+    if cv:
+        metrics["cv"] = cv
+    return metrics
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_DIR, active_path=ACTIVE_MODEL, base_dir=PROJECT_ROOT):
+        """base_dir: what models.path is stored relative to."""
+        self.root = root
+        self.active_path = active_path
+        self.base_dir = base_dir
+
+    def _stored_path(self, path):
+        """models.path for a file: relative to base_dir (with /), absolute if outside it."""
+        path = os.path.abspath(path)
+        if not _on_same_drive(path, self.base_dir):
+            return path
+        rel = os.path.relpath(path, self.base_dir)
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return path
+        return rel.replace(os.sep, "/")
+
+    def _resolved(self, row):
+        """row with path as a usable file path."""
+        if row is not None:
+            # (absolute paths, from outside base_dir, are kept by join())
+            row = dict(row, path=os.path.normpath(os.path.join(self.base_dir, row["path"])))
+        return row
+
+    def _by_sha256(self, sha256):
+        return self._resolved(get_model_by_sha256(sha256))
+
+    def object_path(self, sha256):
+        return os.path.join(self.root, OBJECTS_DIR, sha256[:2], sha256 + ".joblib")
+
+    def store(self, path, sha256=None):
+        """Add a file's bytes to the object store (no-op if present). Returns (sha256, object path)."""
+        sha256 = sha256 or file_sha256(path)
+        dest = self.object_path(sha256)
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            shutil.copy2(path, tmp)
+            if os.name == "posix":
+                os.chmod(tmp, 0o444)
+            os.replace(tmp, dest)
+        return sha256, dest
+
+    def register(self, model_src=None, metrics=None, data_fingerprint=None, version=None):
+        """
+        Store model_src (default: the active model) and record it in the models
+        table; the active model and latest_model.joblib then link to the stored
+        object. Returns the version row (the existing one for known bytes).
+        """
+        model_src = model_src or self.active_path
+        if not os.path.exists(model_src):
+            raise FileNotFoundError(f"Model not found at: {model_src}")
+
+        sha256, obj = self.store(model_src)
+        row = self._by_sha256(sha256)
+        if row is not None:
+            print(f"Model already registered as {row['version']} ({sha256[:12]})")
+        else:
+            metrics = model_metrics(model_src, metrics)
+            if data_fingerprint is None:
+                data_fingerprint = _read_json(model_src + ".meta.json").get("data_fingerprint")
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            version = version or f"rf_model_{timestamp}_{sha256[:8]}.joblib"
+            register_model_version(
+                version=version,
+                path=self._stored_path(obj),
+                accuracy=metrics.get("accuracy"),
+                top3_accuracy=metrics.get("top3_accuracy"),
+                sha256=sha256,
+                size_bytes=os.path.getsize(obj),
+                metrics=metrics,
+                data_fingerprint=data_fingerprint
+            )
+            row = self._by_sha256(sha256)
+
+        # the exported file itself becomes a link, so the bytes exist once
+        if os.path.abspath(model_src) == os.path.abspath(self.active_path):
+            link_file(obj, self.active_path)
+        self._set_latest(row)
+        return row
+
+    def _set_latest(self, row):
+        link_file(row["path"], os.path.join(self.root, LATEST))
+        with open(os.path.join(self.root, META), "w", encoding="utf-8") as f:
+            json.dump({"version": row["version"], "sha256": row["sha256"],
+                       "created_at": row["created_at"]}, f, indent=4)
+
+    def versions(self):
+        return [self._resolved(row) for row in get_model_versions()]
+
+    def active_version(self):
+        """Version row of the active model (by link, else by content hash), or None."""
+        if not os.path.exists(self.active_path):
+            return None
+        versions = self.versions()
+        for row in versions:
+            if _same_file(row["path"], self.active_path):
+                return row
+        return self._by_sha256(file_sha256(self.active_path))
+
+    def activate(self, row):
+        """Make a registered version the active model."""
+        link_file(row["path"], self.active_path)
+        print(f"Active model: {row['version']} ({row['sha256'][:12]})")
+
+    def gc(self, keep=MODEL_KEEP_VERSIONS, dry_run=False):
+        """Apply the retention policy. Returns (deleted versions, deleted object paths)."""
+        versions = self.versions()
+        pinned = {row["id"] for row in versions[:keep]} if keep > 0 else {row["id"] for row in versions}
+        latest_sha256 = _read_json(os.path.join(self.root, META)).get("sha256")
+        active = self.active_version()
+        for row in versions:
+            if row["sha256"] == latest_sha256 or (active is not None and row["id"] == active["id"]):
+                pinned.add(row["id"])
+
+        expired = [row for row in versions if row["id"] not in pinned]
+        referenced = {os.path.abspath(row["path"]) for row in versions if row["id"] in pinned}
+        objects = glob.glob(os.path.join(self.root, OBJECTS_DIR, "*", "*.joblib"))
+        orphans = [p for p in objects if os.path.abspath(p) not in referenced]
+
+        if not dry_run:
+            delete_models([row["id"] for row in expired])
+            for path in orphans:
+                os.remove(path)
+        for row in expired:
+            print(f"{'Would delete' if dry_run else 'Deleted'} version {row['version']}")
+        return [row["version"] for row in expired], orphans
+
+    def import_legacy(self):
+        """Register the flat rf_model_*.joblib copies from before the registry, oldest first, and remove them."""
+        imported = []
+        for path in sorted(glob.glob(os.path.join(self.root, "rf_model_*.joblib")), key=os.path.getmtime):
+            sha256 = file_sha256(path)
+            if get_model_by_sha256(sha256) is None:
+                _, obj = self.store(path, sha256)
+                created_at = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                register_model_version(version=os.path.basename(path), path=self._stored_path(obj), sha256=sha256,
+                                       size_bytes=os.path.getsize(obj), created_at=created_at)
+                imported.append(os.path.basename(path))
+            os.remove(path)
+        versions = self.versions()
+        if versions and not os.path.exists(os.path.join(self.root, LATEST)):
+            self._set_latest(versions[0])
+        return imported
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="registered versions, newest first")
+    gc_parser = sub.add_parser("gc", help="delete versions beyond the retention policy")
+    gc_parser.add_argument("--keep", type=int, default=MODEL_KEEP_VERSIONS)
+    gc_parser.add_argument("--dry_run", action="store_true")
+    sub.add_parser("import", help="move pre-registry rf_model_*.joblib copies into the registry")
+    args = p.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "list":
+        active = registry.active_version()
+        for row in registry.versions():
+            marker = "*" if active and row["id"] == active["id"] else " "
+            print(f"{marker} {row['version']}  {row['sha256'][:12]}  {row['size_bytes']} bytes  "
+                  f"top1 {row['accuracy']}  top3 {row['top3_accuracy']}  data {(row['data_fingerprint'] or '-')[:12]}")
+    elif args.command == "gc":
+        versions, objects = registry.gc(args.keep, args.dry_run)
+        print(f"{len(versions)} versions, {len(objects)} objects {'to delete' if args.dry_run else 'deleted'}")
+    else:
+        imported = registry.import_legacy()
+        print(f"Imported {len(imported)} distinct models")
@@ -0,0 +1,191 @@
+"""In-process ML pipeline: sync -> preprocess -> train -> evaluate -> compile -> export.
+
+Every stage runs in this interpreter, so pandas / sklearn are imported once
+and later stages reuse what earlier ones produced instead of reading it back
+from disk: train keeps the (memory-mapped) dataset for evaluate, and the
+fitted model goes straight to evaluate and compile; export registers the
+model with the evaluation scores. Each stage prints a "=== <label> ===" line
+when it starts (the admin job runner tracks progress by them), and the run
+ends with a per-stage timing table.
+
+The admin scripts (scripts/retrain.py, preprocess_raw.py, sync_data.py) and
+ml/run_train_eval.py are thin wrappers choosing the stages.
+
+Run as: python ml/pipeline_runner.py --stages preprocess,train,evaluate,compile,export
+(plus the training flags of train.py: --n_estimators, --max_depth, ...)
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+import traceback
+from pathlib import Path
+import joblib
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(ML_DIR)
+# ml/ for the pipeline modules (they import each other top-level), the project root for scripts/ + database/
+for _path in (PROJECT_ROOT, ML_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from preprocess.pipeline import main as run_preprocess_pipeline
+from preprocess.merger.master_matrix import load_dataset
+from train import train, add_train_args, train_kwargs
+from evaluate import evaluate
+from flat_forest import compile_forest
+from utils import file_sha256
+
+UPLOADS_DIR = os.path.join(PROJECT_ROOT, "uploads/admin_datasets")
+RAW_DIR = os.path.join(PROJECT_ROOT, "ml/data/raw")
+MASTER = os.path.join(PROJECT_ROOT, "ml/data/processed/master_dataset.csv")
+FEATURES = os.path.join(PROJECT_ROOT, "ml/data/processed/features.json")
+SYNONYMS = os.path.join(PROJECT_ROOT, "ml/preprocess/cleaners/synonyms_map.json")
+MODEL = os.path.join(PROJECT_ROOT, "ml/model/rf_model.joblib")
+# processes cleaning raw chunks in parallel (0 = one per CPU)
+PREPROCESS_WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "1"))
+
+STAGES = ("sync", "preprocess", "train", "evaluate", "compile", "export")
+STAGE_LABELS = {
+    "sync": "Syncing Uploaded Datasets",
+    "preprocess": "Preprocessing",
+    "train": "Training",
+    "evaluate": "Evaluation",
+    "compile": "Compiling Serving Model",
+    "export": "Exporting Versioned Model",
+}
+RETRAIN_STAGES = ("train", "evaluate", "compile", "export")
+
+
+class Pipeline:
+    """Runs stages in order, keeping the dataset, model and scores between them."""
+
+    def __init__(self, master_csv=MASTER, features_json=FEATURES, model_path=MODEL,
+                 raw_dir=RAW_DIR, uploads_dir=UPLOADS_DIR, synonyms_path=SYNONYMS,
+                 preprocess_workers=PREPROCESS_WORKERS, train_params=None):
+        self.master_csv = str(master_csv)
+        self.features_json = str(features_json)
+        self.model_path = str(model_path)
+        self.raw_dir = str(raw_dir)
+        self.uploads_dir = str(uploads_dir)
+        self.synonyms_path = str(synonyms_path)
+        self.preprocess_workers = preprocess_workers
+        self.train_params = train_params or {}
+
+        self.dataset = None     # (X, label codes, class names)
+        self.model_obj = None   # {'model', 'label_encoder'}
+        self.metrics = None     # evaluate() result
+        self.timings = {}
+
+    # ----- stages -----
+    def sync(self):
+        """Copy admin-uploaded CSVs into the raw data folder."""
+        os.makedirs(self.uploads_dir, exist_ok=True)
+        os.makedirs(self.raw_dir, exist_ok=True)
+        for filename in sorted(os.listdir(self.uploads_dir)):
+            if filename.lower().endswith(".csv"):
+                print(f"Importing dataset: {filename}")
+                shutil.copy2(os.path.join(self.uploads_dir, filename), os.path.join(self.raw_dir, filename))
+
+    def preprocess(self):
+        out_dir = os.path.dirname(self.master_csv)
+        run_preprocess_pipeline(raw_dir=self.raw_dir, out_dir=out_dir,
+                                synonyms_path=self.synonyms_path, workers=self.preprocess_workers)
+        # pipeline.main() always writes these names into out_dir
+        self.master_csv = os.path.join(out_dir, "master_dataset.csv")
+        self.features_json = os.path.join(out_dir, "features.json")
+        self.dataset = None
+
+    def _load_dataset(self):
+        if self.dataset is None:
+            if not os.path.exists(self.master_csv):
+                raise FileNotFoundError(
+                    f"No processed dataset at {self.master_csv}; run the preprocess stage first")
+            self.dataset = load_dataset(self.master_csv, self.features_json)
+        return self.dataset
+
+    def train(self):
+        self.model_obj = train(self.master_csv, self.features_json, self.model_path,
+                               dataset=self._load_dataset(), **self.train_params)
+        self.metrics = None
+
+    def _load_model(self):
+        if self.model_obj is None:
+            self.model_obj = joblib.load(self.model_path)
+        return self.model_obj
+
+    def evaluate(self):
+        self.metrics = evaluate(self.master_csv, self.features_json, self.model_path,
+                                dataset=self._load_dataset(), model_obj=self._load_model())
+
+    def compile(self):
+        compiled_dest = str(Path(self.model_path).with_suffix(".forest"))
+        meta = compile_forest(self._load_model(), compiled_dest,
+                              source_sha256=file_sha256(self.model_path))
+        print("Compiled forest saved to", compiled_dest)
+        print(f"Trees: {meta['n_trees']}  Nodes: {meta['n_nodes']}  "
+              f"Max depth: {meta['max_depth']}  Binary splits: {meta['binary']}")
+
+    def export(self):
+        from scripts.export_model import export_model
+        # scores from this run's evaluate stage, else <model>.eval.json
+        export_model(self.model_path, metrics=self.metrics)
+
+    # ----- driver -----
+    def run(self, stages):
+        """Run the named stages in pipeline order; returns {stage: seconds}."""
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}")
+
+        for stage in [s for s in STAGES if s in stages]:
+            print(f"\n=== {STAGE_LABELS[stage]} ===", flush=True)
+            started = time.perf_counter()
+            getattr(self, stage)()
+            self.timings[stage] = round(time.perf_counter() - started, 3)
+            print(f"{STAGE_LABELS[stage]} completed in {self.timings[stage]:.2f}s.", flush=True)
+
+        print("\nStage timings:")
+        for stage, seconds in self.timings.items():
+            print(f"  {stage:<10} {seconds:8.2f}s")
+        print(f"  {'total':<10} {sum(self.timings.values()):8.2f}s")
+        return self.timings
+
+
+def parse_stages(value):
+    stages = tuple(s.strip() for s in value.split(",") if s.strip())
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stages {unknown} (choose from {','.join(STAGES)})")
+    return stages
+
+
+def main(argv=None, default_stages=STAGES):
+    """Command line entry point shared by the wrapper scripts; returns the exit code."""
+    p = argparse.ArgumentParser()
+    p.add_argument("--stages", type=parse_stages, default=default_stages,
+                   help=f"comma separated, any of {','.join(STAGES)}")
+    p.add_argument("--master_csv", default=MASTER)
+    p.add_argument("--features_json", default=FEATURES)
+    p.add_argument("--model", default=MODEL)
+    p.add_argument("--raw_dir", default=RAW_DIR)
+    p.add_argument("--uploads_dir", default=UPLOADS_DIR)
+    p.add_argument("--synonyms", default=SYNONYMS)
+    add_train_args(p)
+    args = p.parse_args(argv)
+
+    pipeline = Pipeline(args.master_csv, args.features_json, args.model, args.raw_dir,
+                        args.uploads_dir, args.synonyms, train_params=train_kwargs(args))
+    try:
+        pipeline.run(args.stages)
+    except Exception:
+        failed = next((s for s in STAGES if s in args.stages and s not in pipeline.timings), None)
+        print(f"❌ {STAGE_LABELS.get(failed, 'Pipeline')} FAILED!")
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
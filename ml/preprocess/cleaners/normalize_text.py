@@ -1,10 +1,34 @@
 import re
+from functools import lru_cache
+import pandas as pd
 
-def normalize_text(text: str) -> str:
-    if not isinstance(text, str):
-        return ''
+WHITESPACE = r"\s+"
+DISALLOWED = r"[^a-z0-9,.;:\/\-\(\) ]+"
+# distinct strings remembered by normalize_text (symptom vocabularies repeat a lot)
+NORMALIZE_CACHE_SIZE = 1 << 16
+
+_WHITESPACE_RE = re.compile(WHITESPACE)
+_DISALLOWED_RE = re.compile(DISALLOWED)
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(text: str) -> str:
     text = text.lower()
     # remove unicode weirdness and extra whitespace
-    text = re.sub(r"\s+", ' ', text)
-    text = re.sub(r"[^a-z0-9,.;:\/\-\(\) ]+", '', text)
+    text = _WHITESPACE_RE.sub(' ', text)
+    text = _DISALLOWED_RE.sub('', text)
     return text.strip()
+
+def normalize_text(text: str) -> str:
+    if not isinstance(text, str):
+        return ''
+    return _normalize(text)
+
+def normalize_text_series(texts: pd.Series) -> pd.Series:
+    """normalize_text over a whole column; non-string cells become ''."""
+    is_str = texts.map(type).eq(str)
+    out = (texts.where(is_str, '').astype(object)
+           .str.lower()
+           .str.replace(WHITESPACE, ' ', regex=True)
+           .str.replace(DISALLOWED, '', regex=True)
+           .str.strip())
+    return out
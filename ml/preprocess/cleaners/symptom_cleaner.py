@@ -1,9 +1,34 @@
 from .normalize_text import normalize_text
 
-def clean_symptom(s: str, synonyms: dict):
-    s = normalize_text(s)
-    # apply synonyms mapping (exact match or simple membership)
-    for canonical, syns in synonyms.items():
-        if s == canonical or s in syns:
-            return canonical
-    return s
+class SynonymIndex:
+    """Reverse synonym map: normalized symptom -> canonical name, built once.
+
+    Resolves like the original linear scan: the first canonical entry (in map
+    order) whose name or synonym list matches wins.
+    """
+    def __init__(self, synonyms: dict):
+        index = {}
+        for canonical, syns in synonyms.items():
+            index.setdefault(canonical, canonical)
+            # a bare string counts as a single synonym
+            for syn in ([syns] if isinstance(syns, str) else syns):
+                index.setdefault(syn, canonical)
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def items(self):
+        """(normalized symptom, canonical name) pairs, canonical names included."""
+        return self._index.items()
+
+    def resolve(self, s: str) -> str:
+        s = normalize_text(s)
+        return self._index.get(s, s)
+
+def clean_symptom(s: str, synonyms):
+    """synonyms: a SynonymIndex, or a raw synonym map (indexed on every call)."""
+    if not isinstance(synonyms, SynonymIndex):
+        synonyms = SynonymIndex(synonyms)
+    # apply synonyms mapping (exact match)
+    return synonyms.resolve(s)
@@ -1,12 +1,58 @@
 """Base loader interface."""
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
 class BaseLoader(ABC):
     def __init__(self, synonyms=None):
         self.synonyms = synonyms or {}
 
-    @abstractmethod
     def load(self, path: str) -> pd.DataFrame:
         """Load raw file and return DataFrame with columns: disease, symptoms (list)"""
+        return self.convert(pd.read_csv(path))
+
+    def iter_chunks(self, path: str, chunksize: int):
+        """Like load(), but reads chunksize raw rows at a time and yields one frame per chunk."""
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            yield self.convert(chunk)
+
+    @abstractmethod
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Raw rows -> DataFrame with columns: disease, symptoms (list)"""
         raise NotImplementedError
+
+
+def as_str(col: pd.Series) -> pd.Series:
+    """
+    str() of every cell, as row-wise code reading this column sees it (missing -> 'nan').
+    Unlike the old df.iterrows() loaders, which upcast a row to float when any
+    column is float, an int column stays int: disease code 3 reads '3', not
+    '3.0', whatever the other columns (or the other chunks of a file) hold.
+    """
+    return col.map(str)
+
+
+def group_lists(row_ids, values, n_rows):
+    """Regroups flat (row_id, value) pairs, sorted by row_id, into one list per row."""
+    counts = np.bincount(np.asarray(row_ids, dtype=np.int64), minlength=n_rows)
+    values = list(values)
+    lists = []
+    start = 0
+    for end in np.cumsum(counts).tolist():
+        lists.append(values[start:end])
+        start = end
+    return lists
+
+
+def split_lists(text: pd.Series, sep: str):
+    """Splits every string on sep, strips the parts and drops empty ones -> one list per row."""
+    parts = text.reset_index(drop=True).str.split(sep, regex=False).explode().str.strip()
+    parts = parts[parts.notna() & (parts != '')]
+    return group_lists(parts.index.to_numpy(), parts.to_numpy(), len(text))
+
+
+def records_frame(disease: pd.Series, symptoms: list) -> pd.DataFrame:
+    """The loader output frame (an empty frame for an empty file, like pd.DataFrame([]))."""
+    if not len(disease):
+        return pd.DataFrame([])
+    return pd.DataFrame({'disease': disease.to_numpy(), 'symptoms': symptoms})
@@ -6,16 +6,27 @@ from .loader_textual_description import TextualDescriptionLoader
 from .base_loader import BaseLoader
 
 class AutoLoader(BaseLoader):
-    def load(self, path: str):
-        df = pd.read_csv(path, nrows=5)
+    def detect(self, path: str) -> BaseLoader:
+        return self._pick(pd.read_csv(path, nrows=5))
+
+    def _pick(self, df: pd.DataFrame) -> BaseLoader:
         cols = [c.lower() for c in df.columns]
         # if many columns and binary-like -> binary loader
         # crude check: if dataframe values contain many 0/1 strings
         flattened = df.astype(str).values.flatten()
         if len(cols) > 5 and any(x in ('0','1') for x in flattened):
-            loader = BinaryMatrixLoader(self.synonyms)
+            return BinaryMatrixLoader(self.synonyms)
         elif 'description' in cols or 'text' in cols or 'clinical_notes' in cols:
-            loader = TextualDescriptionLoader(self.synonyms)
+            return TextualDescriptionLoader(self.synonyms)
         else:
-            loader = SymptomListLoader(self.synonyms)
-        return loader.load(path)
+            return SymptomListLoader(self.synonyms)
+
+    def load(self, path: str):
+        return self.detect(path).load(path)
+
+    def iter_chunks(self, path: str, chunksize: int):
+        return self.detect(path).iter_chunks(path, chunksize)
+
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        # frames without a file behind them are detected from their first rows
+        return self._pick(df.head(5)).convert(df)
@@ -1,10 +1,29 @@
+import numpy as np
 import pandas as pd
-from .base_loader import BaseLoader
+from .base_loader import BaseLoader, as_str, group_lists, records_frame
+
+# cell values (as str()) that mean "symptom absent"
+ABSENT = ('0', '0.0', 'False', 'false', '')
+# rows converted per block; bounds the (rows x symptom columns) mask in memory
+BLOCK_ROWS = 100_000
+
+def presence_mask(col: pd.Series) -> np.ndarray:
+    """True where str(value) is not in ABSENT, computed without per-cell str() for numeric columns."""
+    dtype = col.dtype
+    if isinstance(dtype, np.dtype):
+        values = col.to_numpy()
+        if dtype == bool:
+            return values
+        if np.issubdtype(dtype, np.integer):
+            return values != 0
+        if np.issubdtype(dtype, np.floating):
+            # NaN ('nan') and -0.0 ('-0.0') do not match ABSENT
+            return (values != 0) | np.isnan(values) | np.signbit(values)
+    return ~as_str(col).isin(ABSENT).to_numpy()
 
 class BinaryMatrixLoader(BaseLoader):
     """Loads datasets where each symptom is a column with binary 0/1 values and one disease column."""
-    def load(self, path: str) -> pd.DataFrame:
-        df = pd.read_csv(path)
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
         cols = df.columns.tolist()
         # guess disease column
         disease_col = None
@@ -16,9 +35,17 @@ class BinaryMatrixLoader(BaseLoader):
             disease_col = cols[0]
         symptom_cols = [c for c in cols if c != disease_col]
 
-        records = []
-        for _, row in df.iterrows():
-            disease = str(row[disease_col]).strip()
-            symptoms = [s for s in symptom_cols if str(row[s]) not in ('0', '0.0', 'False', 'false', '')]
-            records.append({'disease': disease, 'symptoms': symptoms})
-        return pd.DataFrame(records)
+        disease = as_str(df[disease_col]).str.strip()
+        names = np.array(symptom_cols, dtype=object)
+
+        symptoms = []
+        for start in range(0, len(df), BLOCK_ROWS):
+            block = df.iloc[start:start + BLOCK_ROWS]
+            mask = np.empty((len(block), len(symptom_cols)), dtype=bool)
+            for j, c in enumerate(symptom_cols):
+                mask[:, j] = presence_mask(block[c])
+            # row-major nonzero keeps each row's symptoms in column order
+            rows, hits = np.nonzero(mask)
+            symptoms.extend(group_lists(rows, names[hits], len(block)))
+
+        return records_frame(disease, symptoms)
@@ -1,10 +1,9 @@
 import pandas as pd
-from .base_loader import BaseLoader
+from .base_loader import BaseLoader, as_str, split_lists, records_frame
 
 class SymptomListLoader(BaseLoader):
     """Loads datasets with columns like 'Disease' and 'Symptoms' where Symptoms is a delimiter-separated list."""
-    def load(self, path: str) -> pd.DataFrame:
-        df = pd.read_csv(path)
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
         # find likely columns
         cols = {c.lower(): c for c in df.columns}
         disease_col = cols.get('disease') or cols.get('disease_name') or list(df.columns)[0]
@@ -18,14 +17,9 @@ class SymptomListLoader(BaseLoader):
             # pick second column
             symptoms_col = list(df.columns)[1] if len(df.columns) > 1 else None
 
-        records = []
-        for _, row in df.iterrows():
-            disease = str(row[disease_col]).strip()
-            raw = ''
-            if symptoms_col:
-                raw = str(row[symptoms_col])
-            # split common delimiters
-            parts = [s.strip() for s in str(raw).replace(';', ',').replace('/', ',').split(',') if s.strip()]
-            records.append({'disease': disease, 'symptoms': parts})
+        disease = as_str(df[disease_col]).str.strip()
+        raw = as_str(df[symptoms_col]) if symptoms_col else pd.Series('', index=df.index)
+        # split common delimiters
+        raw = raw.str.replace(';', ',', regex=False).str.replace('/', ',', regex=False)
 
-        return pd.DataFrame(records)
+        return records_frame(disease, split_lists(raw, ','))
@@ -1,11 +1,10 @@
 import pandas as pd
-from .base_loader import BaseLoader
-from ..cleaners.normalize_text import normalize_text
+from .base_loader import BaseLoader, as_str, split_lists, records_frame
+from ..cleaners.normalize_text import normalize_text_series
 
 class TextualDescriptionLoader(BaseLoader):
     """Loads datasets that have free-text descriptions. Attempts simple sentence splitting to find symptoms."""
-    def load(self, path: str) -> pd.DataFrame:
-        df = pd.read_csv(path)
+    def convert(self, df: pd.DataFrame) -> pd.DataFrame:
         # heuristics to find disease & description columns
         cols = {c.lower(): c for c in df.columns}
         disease_col = cols.get('disease') or cols.get('diagnosis') or list(df.columns)[0]
@@ -17,15 +16,9 @@ class TextualDescriptionLoader(BaseLoader):
         if desc_col is None:
             desc_col = list(df.columns)[1] if len(df.columns) > 1 else None
 
-        records = []
-        for _, row in df.iterrows():
-            disease = str(row[disease_col]).strip()
-            raw = ''
-            if desc_col:
-                raw = str(row[desc_col])
-            # use simple normalization and split on punctuation
-            text = normalize_text(raw)
-            tokens = [t.strip() for t in text.replace(';', '.').split('.') if t.strip()]
-            # assume sentences that contain common symptom keywords are symptoms
-            records.append({'disease': disease, 'symptoms': tokens})
-        return pd.DataFrame(records)
+        disease = as_str(df[disease_col]).str.strip()
+        raw = as_str(df[desc_col]) if desc_col else pd.Series('', index=df.index)
+        # use simple normalization and split on punctuation
+        text = normalize_text_series(raw).str.replace(';', '.', regex=False)
+        # assume sentences that contain common symptom keywords are symptoms
+        return records_frame(disease, split_lists(text, '.'))
@@ -1,35 +1,151 @@
+import hashlib
+import numpy as np
 import pandas as pd
-from ..cleaners.symptom_cleaner import clean_symptom
+from ..cleaners.symptom_cleaner import SynonymIndex
 from ..cleaners.disease_cleaner import clean_disease
+from ..loaders.base_loader import group_lists
+
+MASTER_COLUMNS = ['disease', 'symptoms', 'source']
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(x):
+    """splitmix64 finalizer over uint64 arrays (wraps mod 2**64)."""
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def text_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _text_hashes(values):
+    return np.fromiter((text_hash(v) for v in values), dtype=np.uint64, count=len(values))
+
+def _combine(disease_hashes, symptom_set_hashes, n_symptoms):
+    with np.errstate(over='ignore'):
+        return _mix64(disease_hashes ^ _mix64(symptom_set_hashes + n_symptoms.astype(np.uint64)))
+
+def signature_hash(disease, symptoms) -> int:
+    """64-bit hash of disease + the set of symptoms, the key used for deduplication.
+
+    The symptom part sums mixed per-symptom hashes, so it does not depend on
+    order (same as hashing the sorted list) and can be computed per row with
+    array operations; clean() produces the same values in bulk.
+    """
+    symptoms = list(dict.fromkeys(symptoms))
+    set_hash = int(_mix64(_text_hashes(symptoms)).sum(dtype=np.uint64)) if symptoms else 0
+    sig = _combine(np.array([text_hash(disease)], dtype=np.uint64),
+                   np.array([set_hash], dtype=np.uint64), np.array([len(symptoms)]))
+    return int(sig[0])
+
+def _map_unique(values: pd.Series, fn):
+    """fn applied once per distinct value (missing values included) instead of once per row."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    table = np.array([fn(v) for v in uniques] or [''], dtype=object)
+    return table[codes], codes, len(uniques)
 
 class DatasetMerger:
+    """Cleans staged frames into master rows.
+
+    clean() is stateless, so it can run in worker processes. It explodes the
+    symptom lists, cleans every distinct raw symptom / disease once through
+    the synonym index and hashes each row's (disease, symptom set) into a
+    64-bit signature, all as array operations. add() keeps only the hashes of
+    rows already emitted plus the symptom vocabulary, so streaming callers can
+    write each result out and drop it, and counts rows and duplicates per
+    source (source_stats). merge() does both over every staged frame at once.
+    """
     def __init__(self, synonyms=None):
         self.synonyms = synonyms or {}
+        self.synonym_index = SynonymIndex(self.synonyms)
+        self.reset()
+
+    def reset(self):
+        self._seen = set()
+        self.all_symptoms = set()
+        self.source_stats = {}
+
+    @staticmethod
+    def _symptom_lists(col: pd.Series):
+        # ensure symptoms is list
+        def as_list(v):
+            if isinstance(v, str):
+                return [s.strip() for s in v.split(',') if s.strip()]
+            if isinstance(v, (list, tuple)):
+                return v
+            return []
+        return col.map(as_list)
+
+    def clean(self, df):
+        """Loader output -> DataFrame with columns disease, symptoms (list), sig (uint64)."""
+        n_rows = len(df)
+        if not n_rows:
+            return pd.DataFrame({
+                'disease': pd.Series([], dtype=object),
+                'symptoms': pd.Series([], dtype=object),
+                'sig': np.array([], dtype=np.uint64)
+            })
+
+        diseases, disease_codes, _ = _map_unique(df['disease'].reset_index(drop=True), clean_disease)
+
+        # one (row, raw symptom) pair per element, cleaned through a table of distinct values
+        exploded = self._symptom_lists(df['symptoms'].reset_index(drop=True)).explode()
+        exploded = exploded[exploded.notna()]
+        resolved, _, _ = _map_unique(exploded, self.synonym_index.resolve)
+        pairs = pd.DataFrame({'row': exploded.index.to_numpy(), 'symptom': resolved})
+        # drop empty symptoms; first-occurrence order, so output does not depend on the hash seed
+        pairs = pairs[pairs['symptom'] != ''].drop_duplicates(['row', 'symptom'])
+
+        rows = pairs['row'].to_numpy(dtype=np.int64)
+        symptom_codes, symptom_names = pd.factorize(pairs['symptom'])
+        symptom_hashes = _mix64(_text_hashes(symptom_names))[symptom_codes]
+        set_hashes = np.zeros(n_rows, dtype=np.uint64)
+        np.add.at(set_hashes, rows, symptom_hashes)
+        n_symptoms = np.bincount(rows, minlength=n_rows)
+
+        disease_names = pd.unique(diseases)
+        disease_hashes = dict(zip(disease_names.tolist(), _text_hashes(disease_names).tolist()))
+        row_disease_hashes = np.fromiter((disease_hashes[d] for d in diseases), dtype=np.uint64, count=n_rows)
+
+        return pd.DataFrame({
+            'disease': diseases,
+            'symptoms': group_lists(rows, pairs['symptom'].tolist(), n_rows),
+            'sig': _combine(row_disease_hashes, set_hashes, n_symptoms)
+        })
+
+    def add(self, source_name, cleaned):
+        """Rows of a clean() result whose signature was not seen before (columns: MASTER_COLUMNS)."""
+        sigs = cleaned['sig'].to_numpy(dtype=np.uint64)
+        # deduplicate by disease + symptom set signature, within the chunk and against earlier ones
+        first = ~pd.Series(sigs).duplicated().to_numpy()
+        seen = self._seen
+        unseen = np.fromiter((s not in seen for s in sigs.tolist()), dtype=bool, count=len(sigs))
+        keep = first & unseen
+        seen.update(sigs[keep].tolist())
+
+        self.all_symptoms.update(cleaned['symptoms'].explode().dropna().unique().tolist())
+        stats = self.source_stats.setdefault(source_name, {'rows': 0, 'kept': 0, 'duplicates': 0})
+        stats['rows'] += len(sigs)
+        stats['kept'] += int(keep.sum())
+        stats['duplicates'] += int(len(sigs) - keep.sum())
+
+        out = cleaned.loc[keep, ['disease', 'symptoms']].reset_index(drop=True)
+        out['source'] = source_name
+        return out
+
+    def merge_chunk(self, source_name, df):
+        return self.add(source_name, self.clean(df))
+
+    def feature_index(self):
+        return {s: i for i, s in enumerate(sorted(self.all_symptoms))}
 
     def merge(self, staged_list):
         """staged_list: list of (source_name, df) where df has disease and symptoms(list)"""
-        rows = []
-        all_symptoms = set()
-        for source_name, df in staged_list:
-            for _, r in df.iterrows():
-                disease = clean_disease(r['disease'])
-                # ensure symptoms is list
-                symptoms = r.get('symptoms') or []
-                if isinstance(symptoms, str):
-                    symptoms = [s.strip() for s in symptoms.split(',') if s.strip()]
-                cleaned = []
-                for s in symptoms:
-                    cs = clean_symptom(s, self.synonyms)
-                    if cs:
-                        cleaned.append(cs)
-                        all_symptoms.add(cs)
-                rows.append({'disease': disease, 'symptoms': list(set(cleaned)), 'source': source_name})
-
-        master_df = pd.DataFrame(rows)
-        # deduplicate by disease+sorted symptoms signature
-        master_df['sig'] = master_df.apply(lambda r: r['disease'] + '|' + '|'.join(sorted(r['symptoms'])), axis=1)
-        master_df = master_df.drop_duplicates('sig').drop(columns=['sig'])
+        self.reset()
+        parts = [self.merge_chunk(source_name, df) for source_name, df in staged_list]
+        master_df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=MASTER_COLUMNS)
 
         # build feature index
-        feature_index = {s: i for i, s in enumerate(sorted(all_symptoms))}
-        return master_df, feature_index
+        return master_df, self.feature_index()
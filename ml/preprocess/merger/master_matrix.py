@@ -0,0 +1,217 @@
+"""Binary companion of master_dataset.csv: the vectorized training set.
+
+master_dataset.npz holds the CSR feature matrix (over features.json) and the
+disease labels as integer codes, so training and evaluation load arrays
+instead of parsing stringified symptom lists and vectorizing them again:
+    data, indices, indptr, shape   CSR matrix (uint8 ones, int32 column ids)
+    labels                         (n_rows,) int32 code of each row's disease
+    classes                        (n_classes,) disease names, sorted, so codes
+                                   match LabelEncoder().fit_transform(diseases)
+    meta                           JSON: format + sha256 of the CSV and
+                                   features.json it was written alongside
+The CSV stays the source of truth: the artifact is only used while both hashes
+still match, and the CSV is vectorized otherwise.
+
+load_dataset() keeps the result in a matrix cache next to the CSV
+(matrix_cache/<key>/, key = hash of the CSV + features.json contents) as
+plain .npy files that are memory-mapped on load. Training, evaluation and
+cross-validation runs therefore build the matrix once, later stages open it
+without copying, and concurrent processes share the same pages.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from .vector_builder import VectorBuilder
+from ..partial_cache import content_sha256
+
+MATRIX_FORMAT = 1
+MATRIX_CACHE_DIR = 'matrix_cache'
+# cached matrices kept besides the one in use (older datasets / feature sets)
+MATRIX_CACHE_KEEP = 2
+CACHE_ARRAYS = ('data', 'indices', 'indptr', 'labels')
+
+def matrix_path(master_csv) -> Path:
+    return Path(master_csv).with_suffix('.npz')
+
+class MasterMatrixWriter:
+    """
+    Collects master rows as they are written; save() maps them onto the final
+    feature index. Holds an int32 symptom id per occurrence and an int64 length
+    plus an int32 label per row in memory until then.
+    """
+    def __init__(self):
+        self._symptom_ids = {}
+        self._label_ids = {}
+        self._columns = []
+        self._lengths = []
+        self._labels = []
+
+    def add(self, part):
+        """part: master rows (disease, symptoms as lists)."""
+        symptoms = part['symptoms'].tolist()
+        vocab = self._symptom_ids
+        self._columns.append(np.array(
+            [vocab.setdefault(s, len(vocab)) for row in symptoms for s in row], dtype=np.int32))
+        self._lengths.append(np.fromiter(map(len, symptoms), dtype=np.int64, count=len(symptoms)))
+        labels = self._label_ids
+        self._labels.append(np.array(
+            [labels.setdefault(d, len(labels)) for d in part['disease'].tolist()], dtype=np.int32))
+
+    def save(self, path, feature_index, master_sha256, features_sha256):
+        # local symptom / label ids -> feature columns / sorted class codes
+        column_of = np.zeros(len(self._symptom_ids), dtype=np.int32)
+        for s, local in self._symptom_ids.items():
+            column_of[local] = feature_index[s]
+        classes = sorted(self._label_ids)
+        code_of = np.zeros(len(classes), dtype=np.int32)
+        for code, d in enumerate(classes):
+            code_of[self._label_ids[d]] = code
+
+        lengths = np.concatenate(self._lengths) if self._lengths else np.zeros(0, dtype=np.int64)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        columns = column_of[np.concatenate(self._columns)] if self._columns else np.zeros(0, dtype=np.int32)
+        X = sp.csr_matrix(
+            (np.ones(len(columns), dtype=np.uint8), columns, indptr),
+            shape=(len(lengths), len(feature_index))
+        )
+        X.sort_indices()
+        labels = code_of[np.concatenate(self._labels)] if self._labels else np.zeros(0, dtype=np.int32)
+
+        meta = {
+            'format': MATRIX_FORMAT,
+            'master_sha256': master_sha256,
+            'features_sha256': features_sha256
+        }
+        path = Path(path)
+        tmp = path.with_suffix('.npz.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, data=X.data, indices=X.indices, indptr=X.indptr, shape=np.array(X.shape),
+                     labels=labels, classes=np.array(classes, dtype=str), meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+def load_matrix(path):
+    """(X csr, label codes, class names, meta) from a master_dataset.npz."""
+    with np.load(path, allow_pickle=False) as z:
+        X = sp.csr_matrix((z['data'], z['indices'], z['indptr']), shape=tuple(z['shape']))
+        return X, z['labels'], z['classes'].astype(object), json.loads(str(z['meta']))
+
+class MatrixCache:
+    """Vectorized datasets as memory-mappable .npy files, one directory per key."""
+    HASHES = 'hashes.json'
+
+    def __init__(self, cache_dir):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.dir / self.HASHES, 'r', encoding='utf-8') as f:
+                self._hashes = json.load(f)
+        except (OSError, ValueError):
+            self._hashes = {}
+
+    def file_sha256(self, path):
+        """sha256 of a file; remembered per path while its size and mtime are unchanged."""
+        st = os.stat(path)
+        name = str(Path(path).resolve())
+        entry = self._hashes.get(name)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+
+        sha = content_sha256(path)
+        self._hashes[name] = {'sha256': sha, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        tmp = self.dir / (self.HASHES + f'.{os.getpid()}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._hashes, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.dir / self.HASHES)
+        return sha
+
+    def has(self, key):
+        return (self.dir / key / 'shape.json').exists()
+
+    def store(self, key, X, labels, classes):
+        # written under a temp name and renamed, so readers never see a partial entry
+        tmp = Path(f'{self.dir / key}.{os.getpid()}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        arrays = {'data': X.data, 'indices': X.indices, 'indptr': X.indptr, 'labels': np.asarray(labels)}
+        for name, arr in arrays.items():
+            np.save(tmp / f'{name}.npy', arr)
+        np.save(tmp / 'classes.npy', np.array(list(classes), dtype=str))
+        with open(tmp / 'shape.json', 'w', encoding='utf-8') as f:
+            json.dump(list(X.shape), f)
+        try:
+            os.replace(tmp, self.dir / key)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def load(self, key, mmap_mode='r'):
+        """(X csr, label codes, class names) backed by read-only memory maps."""
+        entry = self.dir / key
+        arrays = {name: np.load(entry / f'{name}.npy', mmap_mode=mmap_mode) for name in CACHE_ARRAYS}
+        with open(entry / 'shape.json', 'r', encoding='utf-8') as f:
+            shape = tuple(json.load(f))
+        X = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=shape, copy=False)
+        classes = np.load(entry / 'classes.npy').astype(object)
+        return X, arrays['labels'], classes
+
+    def prune(self, keep, n_keep=MATRIX_CACHE_KEEP):
+        """Delete all but the n_keep most recently used entries besides keep."""
+        entries = sorted(
+            (p for p in self.dir.iterdir() if p.is_dir() and p.name != keep and not p.name.endswith('.tmp')),
+            key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        for old in entries[n_keep:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+def _vectorize(master_csv, features_json, master_sha256, features_sha256):
+    """(X csr, label codes, class names) from master_dataset.npz when current, else from the CSV."""
+    path = matrix_path(master_csv)
+    if path.exists():
+        X, labels, classes, meta = load_matrix(path)
+        if (meta.get('format') == MATRIX_FORMAT
+                and meta.get('master_sha256') == master_sha256
+                and meta.get('features_sha256') == features_sha256):
+            return X, labels, classes
+        print('Matrix artifact is stale, vectorizing', master_csv)
+
+    with open(features_json, 'r', encoding='utf-8') as f:
+        features = json.load(f)
+    # disease names stay strings, as in the artifact (read_csv would turn "92" into 92)
+    df = pd.read_csv(master_csv, dtype={'disease': str})
+    X, y = VectorBuilder(features, sparse=True).dataset_to_matrix(df)
+    classes, labels = np.unique(np.asarray(y, dtype=object), return_inverse=True)
+    return X, labels, classes
+
+def dataset_fingerprint(master_csv, features_json, cache_dir=None):
+    """sha256 over the CSV and features.json contents; identifies the data a model was trained on."""
+    cache = MatrixCache(cache_dir or Path(master_csv).parent / MATRIX_CACHE_DIR)
+    digests = f'{cache.file_sha256(master_csv)}:{cache.file_sha256(features_json)}'
+    return hashlib.sha256(digests.encode()).hexdigest()
+
+def load_dataset(master_csv, features_json, cache_dir=None, use_cache=True):
+    """
+    Training set as (X csr, label codes, class names).
+    With use_cache the matrix is taken from (or added to) the matrix cache
+    (default: matrix_cache/ next to master_csv) and returned memory-mapped.
+    """
+    if not use_cache:
+        return _vectorize(master_csv, features_json,
+                          content_sha256(master_csv), content_sha256(features_json))
+
+    cache = MatrixCache(cache_dir or Path(master_csv).parent / MATRIX_CACHE_DIR)
+    master_sha256 = cache.file_sha256(master_csv)
+    features_sha256 = cache.file_sha256(features_json)
+    key = hashlib.sha256(f'{MATRIX_FORMAT}:{master_sha256}:{features_sha256}'.encode()).hexdigest()[:32]
+
+    if not cache.has(key):
+        cache.store(key, *_vectorize(master_csv, features_json, master_sha256, features_sha256))
+        cache.prune(keep=key)
+    else:
+        os.utime(cache.dir / key)
+    return cache.load(key)
@@ -1,25 +1,91 @@
+import ast
+from itertools import chain
 import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 
 class VectorBuilder:
-    def __init__(self, feature_index: dict):
+    """Maps symptom lists onto the feature index as binary vectors.
+
+    sparse=False returns dense uint8 arrays; sparse=True returns scipy CSR
+    matrices, which keep large training sets at a fraction of the memory.
+    synonyms (a SynonymIndex) lets raw user input such as "Pyrexia " match the
+    cleaned feature names; a matcher (ml.symptom_matcher.SymptomMatcher) also
+    maps misspelt or reworded input. Exact feature names are looked up first.
+    """
+    def __init__(self, feature_index: dict, sparse=False, synonyms=None, matcher=None):
         self.feature_index = feature_index
         self.n = len(feature_index)
+        self.sparse = sparse
+        self.synonyms = synonyms
+        self.matcher = matcher
+
+    def _lookup(self, symptom, default=None):
+        i = self.feature_index.get(symptom)
+        if i is None and isinstance(symptom, str):
+            if self.matcher is not None:
+                i = self.matcher.lookup(symptom)
+            elif self.synonyms is not None:
+                i = self.feature_index.get(self.synonyms.resolve(symptom))
+        return default if i is None else i
+
+    @staticmethod
+    def _as_list(symptoms):
+        # master_dataset.csv round-trips lists as "['fever', 'cough']"
+        if isinstance(symptoms, str):
+            if symptoms.startswith('['):
+                try:
+                    return ast.literal_eval(symptoms)
+                except (ValueError, SyntaxError):
+                    # malformed, e.g. "[fever, cough": split on commas instead
+                    parts = (p.strip().strip('\'"') for p in symptoms.strip('[]').split(','))
+                    return [p for p in parts if p]
+            return [symptoms]
+        if symptoms is None or (isinstance(symptoms, float) and np.isnan(symptoms)):
+            return []
+        return symptoms
+
+    def indices(self, symptoms_list):
+        """Sorted tuple of the feature indices matched by symptoms_list."""
+        get = self._lookup
+        matched = (get(s) for s in self._as_list(symptoms_list))
+        return tuple(sorted({i for i in matched if i is not None}))
 
     def build_vector(self, symptoms_list):
-        v = np.zeros(self.n, dtype=int)
-        for s in symptoms_list:
-            idx = self.feature_index.get(s)
-            if idx is not None:
-                v[idx] = 1
-        return v
+        """Single row: dense (n,) uint8, or a (1, n) CSR matrix in sparse mode."""
+        X = self.build_matrix([symptoms_list])
+        return X if self.sparse else X[0]
+
+    def build_matrix(self, symptom_lists):
+        """All rows in one pass: (len(symptom_lists), n) uint8 / CSR matrix."""
+        lists = [self._as_list(s) for s in symptom_lists]
+        n_rows = len(lists)
+        lengths = np.fromiter((len(l) for l in lists), dtype=np.int64, count=n_rows)
+
+        resolves = self.synonyms is not None or self.matcher is not None
+        get = self._lookup if resolves else self.feature_index.get
+        cols = np.fromiter((get(s, -1) for s in chain.from_iterable(lists)),
+                           dtype=np.int64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(n_rows), lengths)
+
+        known = cols >= 0
+        rows = rows[known]
+        cols = cols[known]
+
+        if self.sparse:
+            X = sp.csr_matrix(
+                (np.ones(len(rows), dtype=np.uint8), (rows, cols)),
+                shape=(n_rows, self.n)
+            )
+            X.sum_duplicates()
+            X.data[:] = 1
+            return X
+
+        X = np.zeros((n_rows, self.n), dtype=np.uint8)
+        X[rows, cols] = 1
+        return X
 
     def dataset_to_matrix(self, df: pd.DataFrame, label_col='disease'):
-        X = []
-        y = []
-        for _, r in df.iterrows():
-            v = self.build_vector(r['symptoms'])
-            X.append(v)
-            y.append(r[label_col])
-        X = np.vstack(X) if X else np.zeros((0, self.n), dtype=int)
+        X = self.build_matrix(df['symptoms'].tolist())
+        y = df[label_col].tolist()
         return X, y
@@ -0,0 +1,119 @@
+"""Cache of cleaned per-file partials, keyed by raw file content.
+
+Each partial is the DatasetMerger.clean() output of one raw file, stored as a
+stream of pickled DataFrame chunks under cache_dir/<content hash>.pkl.
+manifest.json maps raw file names to their content hash (plus size and mtime,
+so unchanged files are not re-hashed). Partials depend on the synonym map and
+the cleaning code too, so a change of either invalidates the whole cache.
+"""
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+# bump when cleaning output changes for the same raw input
+CACHE_FORMAT = 2
+MANIFEST = 'manifest.json'
+
+def content_sha256(path, chunk_size=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class PartialCache:
+    def __init__(self, cache_dir, synonyms):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.synonyms_sha256 = hashlib.sha256(
+            json.dumps(synonyms, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        self.files = {}
+        self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.dir / MANIFEST, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        if manifest.get('format') == CACHE_FORMAT and manifest.get('synonyms_sha256') == self.synonyms_sha256:
+            self.files = manifest.get('files', {})
+            return
+        # partials were cleaned with other synonyms/code (or are unaccounted for)
+        for partial in self.dir.glob('*.pkl'):
+            partial.unlink()
+
+    def save_manifest(self):
+        manifest = {
+            'format': CACHE_FORMAT,
+            'synonyms_sha256': self.synonyms_sha256,
+            'files': self.files
+        }
+        tmp = self.dir / (MANIFEST + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.dir / MANIFEST)
+
+    def content_hash(self, path):
+        """sha256 of the raw file; reuses the manifest's hash while size and mtime are unchanged."""
+        path = Path(path)
+        st = path.stat()
+        entry = self.files.get(path.name)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        return content_sha256(path)
+
+    def partial_path(self, sha256):
+        return self.dir / f'{sha256}.pkl'
+
+    def has(self, sha256):
+        return self.partial_path(sha256).exists()
+
+    def record(self, path, sha256):
+        st = Path(path).stat()
+        self.files[Path(path).name] = {
+            'sha256': sha256,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns
+        }
+
+    def prune(self, names):
+        """Forget raw files not in names and delete partials nothing refers to any more."""
+        self.files = {name: entry for name, entry in self.files.items() if name in names}
+        live = {entry['sha256'] for entry in self.files.values()}
+        for partial in self.dir.glob('*.pkl'):
+            if partial.stem not in live:
+                partial.unlink()
+
+    def writer(self, sha256):
+        return PartialWriter(self.partial_path(sha256))
+
+    def read(self, sha256):
+        """Yields the cleaned chunks of a cached partial."""
+        with open(self.partial_path(sha256), 'rb') as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+class PartialWriter:
+    """Appends cleaned chunks to a partial; it only appears under its final name on close()."""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.tmp = self.path.with_suffix('.pkl.tmp')
+        self._f = open(self.tmp, 'wb')
+
+    def write(self, cleaned):
+        pickle.dump(cleaned, self._f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        self._f.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        self.tmp.unlink(missing_ok=True)
@@ -1,13 +1,105 @@
 """Master preprocessing pipeline.
 Run as: python -m ml.preprocess.pipeline --raw_dir ml/data/raw --out_dir ml/data/processed
+
+Raw files are read chunksize rows at a time and each cleaned, deduplicated
+chunk is appended to the master dataset straight away, so no raw or cleaned
+frame larger than a chunk is held. What is kept grows with the deduplicated
+master rows: their signature hashes, the symptom vocabulary, and the
+MasterMatrixWriter's compact arrays for master_dataset.npz (4 bytes per
+symptom occurrence and 12 per row, until save()). chunksize=0 loads each file
+in one go.
+
+With workers > 1 the chunks are converted and cleaned in a process pool while
+this process keeps reading; results are consumed in file/chunk order, so the
+output is byte-identical whatever the number of workers.
+
+Cleaned rows of every raw file are cached by content hash (see
+partial_cache.py), so a run only loads and cleans new or changed files and
+rebuilds the master dataset from the cached partials.
+
+Next to master_dataset.csv the vectorized rows are saved as master_dataset.npz
+(see merger/master_matrix.py), which train/evaluate load instead of the CSV.
 """
 import argparse
 import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from preprocess.loaders.loader_auto import AutoLoader
-from preprocess.merger.dataset_merger import DatasetMerger
+import pandas as pd
+from .loaders.loader_auto import AutoLoader
+from .merger.dataset_merger import DatasetMerger, MASTER_COLUMNS
+from .merger.master_matrix import MasterMatrixWriter, matrix_path
+from .partial_cache import PartialCache, content_sha256
+
+CHUNK_ROWS = 100_000
+# cleaned per-file partials + manifest, under out_dir
+CACHE_DIR = 'cache'
+# chunks submitted ahead of the one being written, per worker
+PREFETCH_PER_WORKER = 2
+
+_merger = None
+
+def _init_worker(synonyms):
+    global _merger
+    _merger = DatasetMerger(synonyms=synonyms)
+
+def clean_chunk(loader_cls, raw_df):
+    """Raw CSV rows -> cleaned rows (disease, symptoms, sig). Runs in the worker processes."""
+    return _merger.clean(loader_cls().convert(raw_df))
+
+def _raw_chunks(path, chunksize):
+    if chunksize:
+        yield from pd.read_csv(path, chunksize=chunksize)
+    else:
+        yield pd.read_csv(path)
+
+def _clean_in_order(tasks, synonyms, workers):
+    """tasks: iterable of (source_name, loader_cls, raw_df); yields (source_name, cleaned) in order."""
+    if workers <= 1:
+        _init_worker(synonyms)
+        for source_name, loader_cls, raw_df in tasks:
+            yield source_name, clean_chunk(loader_cls, raw_df)
+        return
 
-def main(raw_dir: str, out_dir: str, synonyms_path: str):
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(synonyms,)) as pool:
+        pending = deque()
+        for source_name, loader_cls, raw_df in tasks:
+            pending.append((source_name, pool.submit(clean_chunk, loader_cls, raw_df)))
+            if len(pending) >= workers * PREFETCH_PER_WORKER:
+                source_name, future = pending.popleft()
+                yield source_name, future.result()
+        while pending:
+            source_name, future = pending.popleft()
+            yield source_name, future.result()
+
+def _build_partials(todo, cache, loader, synonyms, chunksize, workers):
+    """todo: {content sha256: raw csv}; cleans each file into its cached partial."""
+    writers = {}
+
+    def tasks():
+        for sha, csv in todo.items():
+            print('Loading', csv)
+            loader_cls = type(loader.detect(csv))
+            writers[sha] = cache.writer(sha)
+            for raw_df in _raw_chunks(csv, chunksize):
+                yield sha, loader_cls, raw_df
+
+    current = None
+    try:
+        for sha, cleaned in _clean_in_order(tasks(), synonyms, workers):
+            if sha != current and current is not None:
+                writers.pop(current).close()
+            current = sha
+            writers[sha].write(cleaned)
+        for sha in list(writers):
+            writers.pop(sha).close()
+    finally:
+        for writer in writers.values():
+            writer.abort()
+
+def main(raw_dir: str, out_dir: str, synonyms_path: str, chunksize: int = CHUNK_ROWS,
+         workers: int = 1, use_cache: bool = True):
     raw_dir = Path(raw_dir)
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -17,26 +109,58 @@ def main(raw_dir: str, out_dir: str, synonyms_path: str):
         synonyms = json.load(f)
 
     loader = AutoLoader(synonyms=synonyms)
-    staged = []
+    merger = DatasetMerger(synonyms=synonyms)
+    workers = workers or os.cpu_count() or 1
 
-    for csv in raw_dir.glob('*.csv'):
-        print('Loading', csv)
-        df = loader.load(csv)
-        staged.append((csv.name, df))
+    # 1. clean new or changed raw files into cached partials
+    files = sorted(raw_dir.glob('*.csv'))
+    cache = PartialCache(out_dir / CACHE_DIR, synonyms)
+    hashes = {csv.name: cache.content_hash(csv) for csv in files}
 
-    merger = DatasetMerger(synonyms=synonyms)
-    master_df, feature_index = merger.merge(staged)
+    todo = {}
+    for csv in files:
+        sha = hashes[csv.name]
+        if sha not in todo and not (use_cache and cache.has(sha)):
+            todo[sha] = csv
+    stale = sum(hashes[csv.name] in todo for csv in files)
+    print(f'{len(files) - stale} of {len(files)} raw files unchanged, using cached partials')
+
+    _build_partials(todo, cache, loader, synonyms, chunksize, workers)
+    for csv in files:
+        cache.record(csv, hashes[csv.name])
+    cache.prune(set(hashes))
+    cache.save_manifest()
 
-    # save master dataset and features
+    # 2. rebuild the master dataset from the partials, in file order
     master_csv = out_dir / 'master_dataset.csv'
     features_json = out_dir / 'features.json'
 
-    master_df.to_csv(master_csv, index=False)
+    # written to a temp file first so readers never see a half-written dataset
+    tmp_csv = out_dir / 'master_dataset.csv.tmp'
+    matrix = MasterMatrixWriter()
+    n_rows = 0
+    with open(tmp_csv, 'w', encoding='utf-8', newline='') as out:
+        out.write(','.join(MASTER_COLUMNS) + '\n')
+        for csv in files:
+            for cleaned in cache.read(hashes[csv.name]):
+                part = merger.add(csv.name, cleaned)
+                part.to_csv(out, index=False, header=False)
+                matrix.add(part)
+                n_rows += len(part)
+    os.replace(tmp_csv, master_csv)
+
+    feature_index = merger.feature_index()
     with open(features_json, 'w', encoding='utf-8') as f:
         json.dump(feature_index, f, ensure_ascii=False, indent=2)
 
-    print('Saved master dataset to', master_csv)
+    matrix.save(matrix_path(master_csv), feature_index,
+                content_sha256(master_csv), content_sha256(features_json))
+
+    for source, stats in merger.source_stats.items():
+        print(f'  {source}: {stats["rows"]} rows, {stats["kept"]} kept, {stats["duplicates"]} duplicates')
+    print(f'Saved master dataset ({n_rows} rows) to', master_csv)
     print('Saved features to', features_json)
+    print('Saved feature matrix to', matrix_path(master_csv))
 
 
 if __name__ == '__main__':
@@ -44,5 +168,11 @@ if __name__ == '__main__':
     p.add_argument('--raw_dir', default='ml/data/raw')
     p.add_argument('--out_dir', default='ml/data/processed')
     p.add_argument('--synonyms', default='ml/preprocess/cleaners/synonyms_map.json')
+    p.add_argument('--chunksize', type=int, default=CHUNK_ROWS,
+                   help='raw rows read per chunk (0 = whole files)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='processes converting/cleaning chunks (0 = one per CPU)')
+    p.add_argument('--no_cache', action='store_true',
+                   help='re-clean every raw file instead of reusing cached partials')
     args = p.parse_args()
-    main(args.raw_dir, args.out_dir, args.synonyms)
+    main(args.raw_dir, args.out_dir, args.synonyms, args.chunksize, args.workers, not args.no_cache)
@@ -4,12 +4,15 @@ Runs: auto-loading → cleaning → merging → feature mapping → master datas
 """
 
 import json
+import os
 from pathlib import Path
 from preprocess.pipeline import main as run_pipeline
 
 RAW_DIR = "ml/data/raw"
 OUT_DIR = "ml/data/processed"
 SYNONYMS = "ml/preprocess/cleaners/synonyms_map.json"
+# processes cleaning raw chunks in parallel (0 = one per CPU)
+WORKERS = int(os.environ.get("PREPROCESS_WORKERS", "1"))
 
 if __name__ == "__main__":
     print("\n=== AI Health Assistant — PREPROCESSING PIPELINE ===")
@@ -20,7 +23,8 @@ if __name__ == "__main__":
     run_pipeline(
         raw_dir=RAW_DIR,
         out_dir=OUT_DIR,
-        synonyms_path=SYNONYMS
+        synonyms_path=SYNONYMS,
+        workers=WORKERS
     )
 
     print("\nPreprocessing complete.")
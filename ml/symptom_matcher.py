@@ -0,0 +1,151 @@
+"""Approximate symptom matching for free-text user input.
+
+SymptomMatcher maps what a user typed ("High fever", "coughing",
+"abdominal pain") onto the feature index of the trained model, trying in order:
+    exact     the normalized term, or its space-free form, is a feature name
+    synonym   the synonym map resolves it to a feature name
+    fuzzy     the feature name or synonym sharing the most character trigrams
+              (Dice similarity), if it scores at least min_score and beats
+              the best term for any other feature by min_margin
+Inputs starting with a negation ("no fever") are only matched exactly: a
+near miss must not turn an absent symptom into a present one.
+Trigrams live in an inverted index (trigram -> term ids), so a lookup only
+scores the terms that share a trigram with the input. Results are memoized
+per input string.
+"""
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from ml.preprocess.cleaners.normalize_text import normalize_text
+
+# Dice similarity of trigram sets below which a fuzzy match is rejected
+# (0.5 let "tiredness" -> "throat redness" and "stomach ache" -> "stomachpain" through)
+MIN_SCORE = 0.8
+# lead a fuzzy match needs over the best-scoring term of another feature
+MIN_MARGIN = 0.1
+# first words that negate a symptom
+NEGATIONS = frozenset({'no', 'not', 'without'})
+# distinct inputs remembered per matcher
+MATCH_CACHE_SIZE = 1 << 14
+
+Match = namedtuple('Match', ['symptom', 'index', 'score', 'method'])
+
+
+def trigrams(term):
+    """Character trigrams of term, padded so word starts and ends count."""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymptomMatcher:
+    def __init__(self, feature_index: dict, synonyms=None, min_score=MIN_SCORE,
+                 fuzzy=True, cache_size=MATCH_CACHE_SIZE, min_margin=MIN_MARGIN):
+        """synonyms: a SynonymIndex (optional); fuzzy=False keeps exact and synonym matches only."""
+        self.feature_index = feature_index
+        self.synonyms = synonyms
+        self.min_score = float(min_score)
+        self.min_margin = float(min_margin)
+        self.fuzzy = fuzzy
+
+        # normalized / space-free form -> feature name (features.json keys are already clean)
+        exact = {}
+        for name in feature_index:
+            norm = normalize_text(name)
+            exact.setdefault(norm, name)
+            exact.setdefault(norm.replace(' ', ''), name)
+        self._exact = exact
+
+        # fuzzy vocabulary: every feature name plus the synonyms that resolve to one
+        vocab = {normalize_text(name): name for name in feature_index}
+        if synonyms is not None:
+            for syn, canonical in synonyms.items():
+                if canonical in exact:
+                    vocab.setdefault(syn, exact[canonical])
+        self._terms = list(vocab)
+        self._targets = [vocab[t] for t in self._terms]
+        self._target_ids = np.array([feature_index[name] for name in self._targets], dtype=np.int64)
+
+        postings = {}
+        sizes = np.empty(len(self._terms), dtype=np.int32)
+        for term_id, term in enumerate(self._terms):
+            grams = trigrams(term)
+            sizes[term_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(term_id)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._sizes = sizes
+
+        self._cached_match = lru_cache(maxsize=cache_size)(self._match)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def match(self, symptom):
+        """Best Match for one user symptom, or None."""
+        if not isinstance(symptom, str):
+            return None
+        return self._cached_match(symptom)
+
+    def lookup(self, symptom, default=None):
+        """Feature index of symptom (VectorBuilder hook)."""
+        m = self.match(symptom)
+        return default if m is None else m.index
+
+    def match_all(self, symptoms):
+        """(matched, unmatched) for a symptom list, as JSON-ready dicts / input strings."""
+        matched, unmatched = [], []
+        for s in symptoms:
+            m = self.match(s)
+            if m is None:
+                unmatched.append(s)
+            else:
+                matched.append({
+                    "input": s,
+                    "symptom": m.symptom,
+                    "score": round(m.score, 3),
+                    "method": m.method
+                })
+        return matched, unmatched
+
+    def _match(self, symptom):
+        index = self.feature_index.get(symptom)
+        if index is not None:
+            return Match(symptom, index, 1.0, 'exact')
+
+        term = normalize_text(symptom)
+        if not term:
+            return None
+        name = self._exact.get(term) or self._exact.get(term.replace(' ', ''))
+        if name is not None:
+            return Match(name, self.feature_index[name], 1.0, 'exact')
+        if term.split(' ', 1)[0] in NEGATIONS:
+            return None
+
+        if self.synonyms is not None:
+            name = self._exact.get(self.synonyms.resolve(term))
+            if name is not None:
+                return Match(name, self.feature_index[name], 1.0, 'synonym')
+
+        if self.fuzzy:
+            return self._fuzzy(term)
+        return None
+
+    def _fuzzy(self, term):
+        grams = trigrams(term)
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if not hits:
+            return None
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._terms))
+        scores = 2.0 * shared / (len(grams) + self._sizes)
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.min_score:
+            return None
+        # ambiguous: another feature scores (almost) as well ("pain" -> "pain in eye" / "penis pain")
+        others = scores[self._target_ids != self._target_ids[best]]
+        if len(others) and score - float(others.max()) < self.min_margin:
+            return None
+
+        name = self._targets[best]
+        return Match(name, self.feature_index[name], score, 'fuzzy')
@@ -1,39 +1,132 @@
-"""Train RandomForest with the processed master dataset."""
+"""Train RandomForest with the processed master dataset.
+
+Trees are fit on n_jobs cores (TRAIN_N_JOBS, default -1 = all of them).
+With warm_start an existing model at out_model keeps its trees and
+n_estimators new ones are fit on the current data, e.g. after new uploads;
+it falls back to a full fit when the classes or features have changed.
+"""
 import joblib
 import json
+import os
+import time
 import argparse
-import pandas as pd
+from datetime import datetime, timezone
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
-from preprocess.merger.vector_builder import VectorBuilder
-from preprocess.merger.feature_indexer import FeatureIndexer
-
-def train(master_csv, features_json, out_model):
-    df = pd.read_csv(master_csv)
-    features = FeatureIndexer.load(features_json)
-    vb = VectorBuilder(features)
-    X, y = vb.dataset_to_matrix(df)
+from preprocess.merger.master_matrix import load_dataset, dataset_fingerprint
+
+N_ESTIMATORS = 200
+MAX_DEPTH = 20
+MAX_SAMPLES = None
+N_JOBS = int(os.environ.get('TRAIN_N_JOBS', '-1'))
+
+def _load_previous(out_model, classes, n_features):
+    """The model at out_model if new trees can be added to it, else None."""
+    if not os.path.exists(out_model):
+        print('No model at', out_model, '- training from scratch')
+        return None
+    obj = joblib.load(out_model)
+    clf, le = obj['model'], obj['label_encoder']
+    if list(le.classes_) != list(classes) or clf.n_features_in_ != n_features:
+        print('Classes or features changed since the last model - training from scratch')
+        return None
+    return clf
+
+def train(master_csv, features_json, out_model, n_estimators=N_ESTIMATORS, max_depth=MAX_DEPTH,
+          max_samples=MAX_SAMPLES, n_jobs=N_JOBS, warm_start=False, dataset=None):
+    """Fits and saves the model; returns {'model', 'label_encoder'} as saved.
+    dataset: (X, label codes, class names) already loaded by the caller."""
+    started = time.perf_counter()
+    # master_dataset.npz when it is current, else the vectorized CSV
+    X, y_enc, classes = dataset if dataset is not None else load_dataset(master_csv, features_json)
     le = LabelEncoder()
-    y_enc = le.fit_transform(y)
+    le.classes_ = classes
+    load_seconds = time.perf_counter() - started
+
+    clf = _load_previous(out_model, classes, X.shape[1]) if warm_start else None
+    previous_trees = len(clf.estimators_) if clf is not None else 0
+    if clf is None:
+        clf = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth,
+                                     max_samples=max_samples, n_jobs=n_jobs, random_state=42)
+    else:
+        # keep the fitted trees, grow n_estimators more
+        clf.set_params(warm_start=True, n_estimators=previous_trees + n_estimators,
+                       max_depth=max_depth, max_samples=max_samples, n_jobs=n_jobs)
 
-    clf = RandomForestClassifier(n_estimators=200, max_depth=20, random_state=42)
+    started = time.perf_counter()
     clf.fit(X, y_enc)
+    fit_seconds = time.perf_counter() - started
+    # serving predicts small batches, where a per-call thread pool only adds overhead
+    clf.set_params(warm_start=False, n_jobs=None)
 
     # save model, label encoder & metadata
-    joblib.dump({'model': clf, 'label_encoder': le}, out_model)
+    started = time.perf_counter()
+    model_obj = {'model': clf, 'label_encoder': le}
+    # written aside and renamed: out_model may be a hard link into the model registry
+    tmp_model = f'{out_model}.{os.getpid()}.tmp'
+    joblib.dump(model_obj, tmp_model)
+    os.replace(tmp_model, out_model)
+    save_seconds = time.perf_counter() - started
+
     metadata = {
         'n_classes': int(len(le.classes_)),
-        'classes': list(le.classes_)
+        'classes': list(le.classes_),
+        'n_rows': int(X.shape[0]),
+        'n_features': int(X.shape[1]),
+        'data_fingerprint': dataset_fingerprint(master_csv, features_json),
+        'params': {
+            'n_estimators': len(clf.estimators_),
+            'max_depth': max_depth,
+            'max_samples': max_samples,
+            'n_jobs': n_jobs
+        },
+        'warm_start': previous_trees > 0,
+        'trees_added': len(clf.estimators_) - previous_trees,
+        'timing': {
+            'load_seconds': round(load_seconds, 3),
+            'fit_seconds': round(fit_seconds, 3),
+            'save_seconds': round(save_seconds, 3)
+        },
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds')
     }
     with open(out_model + '.meta.json', 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=2)
-    print('Saved model to', out_model)
+    print(f'Saved model to {out_model} ({metadata["trees_added"]} trees fit in {fit_seconds:.1f}s)')
+    return model_obj
+
+def _optional_int(value):
+    return None if value.lower() in ('', 'none', '0') else int(value)
+
+def _max_samples(value):
+    """Fraction of the rows (0 < x <= 1) or a row count per tree."""
+    if value.lower() in ('', 'none'):
+        return None
+    return float(value) if '.' in value else int(value)
+
+def add_train_args(p):
+    """Hyperparameter flags shared by train.py and run_train_eval.py."""
+    p.add_argument('--n_estimators', type=int, default=N_ESTIMATORS,
+                   help='trees to fit (trees to add with --warm_start)')
+    p.add_argument('--max_depth', type=_optional_int, default=MAX_DEPTH, help='0 / none = unlimited')
+    p.add_argument('--max_samples', type=_max_samples, default=MAX_SAMPLES,
+                   help='rows drawn per tree: a fraction (0.5) or a count (none = all)')
+    p.add_argument('--n_jobs', type=int, default=N_JOBS, help='cores used for fitting (-1 = all)')
+    p.add_argument('--warm_start', action='store_true', help='add trees to the existing model')
+
+def train_kwargs(args):
+    return {
+        'n_estimators': args.n_estimators,
+        'max_depth': args.max_depth,
+        'max_samples': args.max_samples,
+        'n_jobs': args.n_jobs,
+        'warm_start': args.warm_start
+    }
 
 if __name__ == '__main__':
     p = argparse.ArgumentParser()
     p.add_argument('--master_csv', default='ml/data/processed/master_dataset.csv')
     p.add_argument('--features_json', default='ml/data/processed/features.json')
     p.add_argument('--out', default='ml/model/rf_model.joblib')
+    add_train_args(p)
     args = p.parse_args()
-    train(args.master_csv, args.features_json, args.out)
-
+    train(args.master_csv, args.features_json, args.out, **train_kwargs(args))
@@ -0,0 +1,200 @@
+"""Cross-validated hyperparameter search for the RandomForest.
+
+Every candidate config is scored with stratified k-fold CV (top-1 / top-3
+accuracy on the held-out fold). All (config, fold) fits run in a process
+pool, one core each; the workers open the same memory-mapped feature matrix
+(see preprocess/merger/master_matrix.py), so the dataset is vectorized once
+and not copied per process. The best config is then trained on the whole
+dataset and written to the usual model path, with its CV scores added to
+the model metadata; the full report goes to <model>.tune.json.
+
+Per config the report has the wall time from its first fold starting to its
+last finishing, the fit time summed over folds, and the largest memory
+growth of one fold's fit (peak RSS during the fit minus RSS before it; a
+worker process runs many folds, so its lifetime peak says little). Memory
+is read from /proc and is null where there is none.
+
+Run as: python ml/tune.py --folds 5 --search random --n_iter 12 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, ParameterGrid, ParameterSampler
+from preprocess.merger.master_matrix import load_dataset
+from evaluate import top_k_accuracies
+from train import train, N_JOBS
+
+MASTER = 'ml/data/processed/master_dataset.csv'
+FEATURES = 'ml/data/processed/features.json'
+MODEL = 'ml/model/rf_model.joblib'
+
+# searched hyperparameters (the ones train.py takes)
+PARAM_GRID = {
+    'n_estimators': [100, 200, 400],
+    'max_depth': [None, 20, 40],
+    'max_samples': [None, 0.5],
+}
+METRICS = ('top1', 'top3')
+SEED = 42
+
+_X = _y = _folds = None
+
+def _init_worker(master_csv, features_json, n_folds, seed):
+    """Maps the cached feature matrix and computes the folds once per process."""
+    global _X, _y, _folds
+    _X, _y, _ = load_dataset(master_csv, features_json)
+    splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed)
+    _folds = list(splitter.split(np.zeros(len(_y)), _y))
+
+def _rss_kib():
+    """(current, peak since the last reset) resident set size of this process in KiB; None without /proc."""
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['VmRSS'].split()[0]), int(fields['VmHWM'].split()[0])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def _reset_peak_rss():
+    """Restarts the peak (VmHWM) at the current RSS (Linux 4.0+). Returns False if unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def fit_fold(config_id, params, fold):
+    """Fits params on every fold but one and scores the held-out fold. Runs in the workers."""
+    train_idx, test_idx = _folds[fold]
+    peak_reset = _reset_peak_rss()
+    rss_before = _rss_kib()
+    started = time.time()  # wall clock: compared across worker processes
+    clf = RandomForestClassifier(n_jobs=1, random_state=SEED, **params)
+    clf.fit(_X[train_idx], _y[train_idx])
+    finished = time.time()
+    rss_after = _rss_kib()
+    scores = top_k_accuracies(clf, _X[test_idx], _y[test_idx], ks=(1, 3))
+
+    fit_rss_mb = None
+    if rss_before is not None and rss_after is not None:
+        # without a peak reset only the RSS the fitted forest still holds is known
+        grown = (rss_after[1] if peak_reset else rss_after[0]) - rss_before[0]
+        fit_rss_mb = round(max(grown, 0) / 1024, 1)
+    return {
+        'config': config_id,
+        'fold': fold,
+        'top1': scores[1],
+        'top3': scores[3],
+        'started': started,
+        'finished': finished,
+        'fit_seconds': finished - started,
+        'fit_rss_mb': fit_rss_mb
+    }
+
+def candidates(search, n_iter, seed=SEED, grid=PARAM_GRID):
+    if search == 'grid':
+        return list(ParameterGrid(grid))
+    return list(ParameterSampler(grid, n_iter=min(n_iter, len(ParameterGrid(grid))), random_state=seed))
+
+def _run_folds(tasks, init_args, workers):
+    """tasks: (config_id, params, fold); yields fold results as they finish."""
+    if workers <= 1:
+        _init_worker(*init_args)
+        for task in tasks:
+            yield fit_fold(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        for result in pool.map(fit_fold, *zip(*tasks)):
+            yield result
+
+def summarize(configs, fold_results, metric):
+    """One row per config (mean/std of each metric over folds, wall / summed fit time, memory), best first."""
+    rows = []
+    for config_id, params in enumerate(configs):
+        folds = [r for r in fold_results if r['config'] == config_id]
+        row = {'config': config_id, 'params': params}
+        for m in METRICS:
+            values = np.array([r[m] for r in folds])
+            row[m] = round(float(values.mean()), 4)
+            row[m + '_std'] = round(float(values.std()), 4)
+        # folds of one config may run in parallel: wall time is not the sum
+        row['wall_seconds'] = round(max(r['finished'] for r in folds) - min(r['started'] for r in folds), 2)
+        row['fit_seconds'] = round(sum(r['fit_seconds'] for r in folds), 2)
+        grown = [r['fit_rss_mb'] for r in folds if r['fit_rss_mb'] is not None]
+        row['fit_rss_mb'] = max(grown) if grown else None
+        rows.append(row)
+    other = [m for m in METRICS if m != metric]
+    rows.sort(key=lambda r: [-r[metric]] + [-r[m] for m in other])
+    return rows
+
+def tune(master_csv=MASTER, features_json=FEATURES, out_model=MODEL, folds=5, search='random',
+         n_iter=8, workers=0, metric='top1', n_jobs=N_JOBS, seed=SEED, grid=PARAM_GRID):
+    started = time.perf_counter()
+    # built (or validated) once here; the workers only map the cached arrays
+    X, y, _ = load_dataset(master_csv, features_json)
+    workers = workers or os.cpu_count() or 1
+    configs = candidates(search, n_iter, seed, grid)
+    print(f'{len(configs)} configs x {folds} folds on {X.shape[0]} rows, {workers} workers')
+
+    tasks = [(config_id, params, fold) for config_id, params in enumerate(configs) for fold in range(folds)]
+    fold_results = []
+    for result in _run_folds(tasks, (master_csv, features_json, folds, seed), workers):
+        fold_results.append(result)
+        print(f'  config {result["config"]} fold {result["fold"]}: '
+              f'top1 {result["top1"]:.3f} top3 {result["top3"]:.3f} ({result["fit_seconds"]:.1f}s)')
+    search_seconds = time.perf_counter() - started
+
+    ranked = summarize(configs, fold_results, metric)
+    for row in ranked:
+        print(f'{row["params"]}: top1 {row["top1"]:.4f} top3 {row["top3"]:.4f} '
+              f'wall {row["wall_seconds"]}s fit {row["fit_seconds"]}s memory +{row["fit_rss_mb"]} MB')
+
+    best = ranked[0]
+    print('Best config:', best['params'])
+    train(master_csv, features_json, out_model, n_jobs=n_jobs, **best['params'])
+
+    report = {
+        'folds': folds,
+        'search': search,
+        'metric': metric,
+        'workers': workers,
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'search_seconds': round(search_seconds, 2),
+        'best': best,
+        'results': ranked
+    }
+    with open(out_model + '.tune.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    # the chosen model's CV scores live next to its training metadata
+    with open(out_model + '.meta.json', 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    metadata['cv'] = {'folds': folds, **{m: best[m] for m in METRICS}, **{m + '_std': best[m + '_std'] for m in METRICS}}
+    with open(out_model + '.meta.json', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    print('Saved tuning report to', out_model + '.tune.json')
+    return report
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser()
+    p.add_argument('--master_csv', default=MASTER)
+    p.add_argument('--features_json', default=FEATURES)
+    p.add_argument('--out', default=MODEL)
+    p.add_argument('--folds', type=int, default=5)
+    p.add_argument('--search', choices=('grid', 'random'), default='random')
+    p.add_argument('--n_iter', type=int, default=8, help='configs sampled by --search random')
+    p.add_argument('--grid', type=json.loads, default=PARAM_GRID,
+                   help='JSON {param: [values]} over n_estimators / max_depth / max_samples')
+    p.add_argument('--metric', choices=METRICS, default='top1', help='ranks the configs')
+    p.add_argument('--workers', type=int, default=0, help='processes fitting folds (0 = one per CPU)')
+    p.add_argument('--n_jobs', type=int, default=N_JOBS, help='cores for the final fit (-1 = all)')
+    p.add_argument('--seed', type=int, default=SEED)
+    args = p.parse_args()
+    tune(args.master_csv, args.features_json, args.out, args.folds, args.search, args.n_iter,
+         args.workers, args.metric, args.n_jobs, args.seed, args.grid)
@@ -1,5 +1,7 @@
 # small helpers
-from typing import List
+import hashlib
+from typing import List, Tuple
+import numpy as np
 
 def ensure_list(x) -> List[str]:
     if x is None:
@@ -9,3 +11,35 @@ def ensure_list(x) -> List[str]:
     if isinstance(x, str):
         return [s.strip() for s in x.replace(';', ',').split(',') if s.strip()]
     return list(x)
+
+def file_sha256(path, chunk_size=1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def top_k(proba, k=3) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k columns of each row of a (n_rows, n_classes) probability array.
+
+    Uses argpartition, so only the k winners per row are sorted. Returns
+    (indices, probabilities), both (n_rows, k) and ordered best first; a 1-D
+    input is treated as a single row. k must be at least 1; a k larger than
+    the number of classes returns every class.
+    """
+    if int(k) < 1:
+        raise ValueError(f'k must be at least 1, got {k}')
+    proba = np.asarray(proba)
+    if proba.ndim == 1:
+        proba = proba[np.newaxis, :]
+    n_rows, n_classes = proba.shape
+    k = min(int(k), n_classes)
+
+    if k == n_classes:
+        idx = np.broadcast_to(np.arange(n_classes), (n_rows, n_classes))
+    else:
+        idx = np.argpartition(proba, n_classes - k, axis=1)[:, n_classes - k:]
+
+    scores = np.take_along_axis(proba, idx, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(scores, order, axis=1)
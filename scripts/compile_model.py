@@ -0,0 +1,35 @@
+"""
+Compile the active RandomForest into flat NumPy arrays for serving.
+Reads ml/model/rf_model.joblib and writes ml/model/rf_model.forest/,
+which MLService memory-maps instead of unpickling the sklearn trees.
+"""
+import sys
+import os
+import joblib
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.flat_forest import compile_forest
+from ml.utils import file_sha256
+
+MODEL_SRC = os.path.join(PROJECT_ROOT, "ml/model/rf_model.joblib")
+COMPILED_DEST = os.path.join(PROJECT_ROOT, "ml/model/rf_model.forest")
+
+def compile_model(model_src=MODEL_SRC, compiled_dest=COMPILED_DEST):
+    if not os.path.exists(model_src):
+        raise FileNotFoundError(f"Model not found at: {model_src}")
+
+    print("Compiling model...")
+    meta = compile_forest(joblib.load(model_src), compiled_dest,
+                          source_sha256=file_sha256(model_src))
+
+    print("Compiled forest saved to", compiled_dest)
+    print(f"Trees: {meta['n_trees']}  Nodes: {meta['n_nodes']}  "
+          f"Max depth: {meta['max_depth']}  Binary splits: {meta['binary']}")
+    return meta
+
+
+if __name__ == "__main__":
+    compile_model()
@@ -1,47 +1,27 @@
 """
 Admin-triggered preprocessing script.
-Calls the real high-level pipeline at ml/run_preprocess.py
+Runs the preprocess stage of ml/pipeline_runner.py in this process.
 """
 
-import subprocess
-import sys
 import os
+import sys
 
-def run_preprocessing():
-    print("=== Running Preprocessing Pipeline (Admin Trigger) ===")
-
-    # Use server's Python interpreter
-    python = sys.executable
-
-    # Project root (two levels up from this file)
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-    # Absolute path to run_preprocess.py
-    script_path = os.path.join(BASE_DIR, "ml", "run_preprocess.py")
-
-    if not os.path.exists(script_path):
-        print(f"❌ ERROR: run_preprocess.py not found at: {script_path}")
-        return 1
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 
-    # Run script in project root to avoid import/path issues
-    result = subprocess.run(
-        [python, script_path],
-        cwd=BASE_DIR,
-        capture_output=True,
-        text=True
-    )
+from ml.pipeline_runner import main as run_pipeline
 
-    # Show console output to Flask log and Admin UI
-    print(result.stdout)
+def run_preprocessing():
+    print("=== Running Preprocessing Pipeline (Admin Trigger) ===")
 
-    if result.returncode != 0:
+    if run_pipeline(["--stages", "preprocess"]) != 0:
         print("❌ Preprocessing FAILED")
-        print(result.stderr)
-        return result.returncode
+        return 1
 
     print("✅ Preprocessing completed successfully")
     return 0
 
 
 if __name__ == "__main__":
-    run_preprocessing()
+    sys.exit(run_preprocessing())
@@ -1,54 +1,31 @@
 """
 Full ML retraining pipeline:
-1. Preprocess raw datasets
-2. Train + evaluate RandomForest model
-3. Export versioned model into saved_models
+1. Train RandomForest on the master dataset
+2. Evaluate it (top-1 / top-3 accuracy)
+3. Compile the forest into flat arrays for serving
+4. Export versioned model into saved_models
+
+All steps run in this process (see ml/pipeline_runner.py), sharing the
+loaded dataset and model. Extra arguments (--n_estimators, --max_depth,
+--max_samples, --n_jobs, --warm_start, --stages) are passed on to it.
 """
 
 import os
 import sys
-import subprocess
-import traceback
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-PYTHON = sys.executable  # automatically uses current venv/python
-
-def run_step(label, command):
-    """Run a step and fail cleanly with readable error output."""
-    print(f"\n=== {label} ===")
-    try:
-        subprocess.run([PYTHON] + command, check=True)
-        print(f"{label} completed.")
-    except subprocess.CalledProcessError:
-        print(f"❌ {label} FAILED!")
-        traceback.print_exc()
-        sys.exit(1)
-
-def retrain():
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from ml.pipeline_runner import main as run_pipeline, RETRAIN_STAGES
+
+def retrain(train_args=()):
     print("\n====================")
     print("  ML RETRAIN START")
     print("====================\n")
 
-    # --- Ensure scripts run from the correct directory ---
-    os.chdir(PROJECT_ROOT)
-
-    # # 1. PREPROCESS
-    # run_step(
-    #     "Preprocessing",
-    #     ["ml/run_preprocess.py"]
-    # )
-
-    # 2. TRAIN & EVALUATE
-    run_step(
-        "Training + Evaluation",
-        ["ml/run_train_eval.py"]
-    )
-
-    # 3. EXPORT LATEST MODEL
-    run_step(
-        "Exporting Versioned Model",
-        ["scripts/export_model.py"]
-    )
+    if run_pipeline(list(train_args), default_stages=RETRAIN_STAGES) != 0:
+        return False
 
     print("\n====================")
     print(" ML RETRAIN COMPLETE")
@@ -57,5 +34,5 @@ def retrain():
 
 
 if __name__ == "__main__":
-    success = retrain()
+    success = retrain(sys.argv[1:])
     sys.exit(0 if success else 1)
@@ -1,25 +1,29 @@
 import os
-import shutil
-import glob
+import sys
 
-MODEL_DIR = "ml/model/"
-SAVED_DIR = "ml/model/saved_models/"
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from compile_model import compile_model
+from ml.model_registry import ModelRegistry
 
 def revert():
-    saved = sorted(
-        glob.glob(os.path.join(SAVED_DIR, "*.joblib")),
-        key=os.path.getmtime
-    )
+    registry = ModelRegistry()
+    versions = registry.versions()   # newest first
+    active = registry.active_version()
 
-    if len(saved) < 2:
+    # the version registered before the active one (the newest, if the active model was never exported)
+    ids = [row["id"] for row in versions]
+    previous = versions[ids.index(active["id"]) + 1:] if active is not None else versions
+    if not previous:
         print("Not enough model versions to revert.")
         exit(1)
 
-    last_model = saved[-2]   # previous version
-    dest = os.path.join(MODEL_DIR, "rf_model.joblib")
+    registry.activate(previous[0])
+    print("Reverted to:", previous[0]["version"])
 
-    shutil.copy(last_model, dest)
-    print("Reverted to:", last_model)
+    compile_model(registry.active_path)
 
 if __name__ == "__main__":
     revert()
@@ -3,12 +3,16 @@ API Test Suite for AI Health Diagnostic Assistant Backend
 
 This script tests:
 - /api/predict
+- /api/predict/batch
 - /api/feedback
 - /api/admin/upload-dataset
 - /api/admin/datasets
 - /api/admin/models
-- /api/admin/logs
+- /api/admin/logs (+ /summary, /counts)
 - /api/admin/symptom-trends
+- /api/admin/cache-stats
+- /api/admin/model-status
+- /api/admin/jobs (+ /<id>, /<id>/cancel)
 
 Run using:
     python -m tests.test_api
@@ -16,8 +20,13 @@ Run using:
 
 import io
 import json
+import os
+import time
 import unittest
 from backend.app import create_app
+from backend.services.write_behind import log_writer
+from backend.services.jobs import job_runner, JobType
+from database.queries import get_feedback
 
 
 class APITestCase(unittest.TestCase):
@@ -44,6 +53,61 @@ class APITestCase(unittest.TestCase):
         self.assertGreater(len(data["predictions"]), 0)
         print("\n✓ /api/predict OK")
 
+    def test_predict_rejects_bad_symptoms(self):
+        for symptoms in (5, [1, "fever"], {"fever": 1}):
+            response = self.client.post("/api/predict", json={"symptoms": symptoms})
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.get_json()["success"])
+        print("✓ /api/predict validation OK")
+
+    def test_predict_reports_symptom_matches(self):
+        response = self.client.post(
+            "/api/predict",
+            json={"symptoms": ["Coughing", "vomitting", "qwxzv", "no fever"]}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        matched = {m["input"]: m for m in data["matched_symptoms"]}
+        self.assertEqual(matched["Coughing"]["symptom"], "cough")
+        self.assertEqual(matched["vomitting"]["method"], "fuzzy")
+        self.assertEqual(data["unmatched_symptoms"], ["qwxzv", "no fever"])
+        print("✓ /api/predict reports matched and unmatched symptoms")
+
+    # ---------------------------------------
+    # BATCH PREDICT
+    # ---------------------------------------
+    def test_predict_batch(self):
+        batch = [["fever", "cough"], "headache, nausea", []]
+        response = self.client.post("/api/predict/batch", json={"batch": batch})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data["count"], 3)
+        single = self.client.post("/api/predict", json={"symptoms": ["fever", "cough"]}).get_json()
+        self.assertEqual(data["results"][0]["predictions"], single["predictions"])
+        print("✓ /api/predict/batch OK")
+
+    def test_predict_batch_stream(self):
+        batch = [["fever"], ["cough"], ["headache"]]
+        response = self.client.post("/api/predict/batch?stream=1", json={"batch": batch})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(l) for l in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([l["index"] for l in lines], [0, 1, 2])
+        print("✓ /api/predict/batch?stream=1 OK")
+
+    def test_predict_batch_rejects_bad_body(self):
+        response = self.client.post("/api/predict/batch", json={"batch": "fever"})
+        self.assertEqual(response.status_code, 400)
+
+        for batch, index in (([1, ["fever"]], 0), ([["fever"], [{"a": 1}]], 1), ([["fever"], None], 1)):
+            response = self.client.post("/api/predict/batch", json={"batch": batch})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()["index"], index)
+        print("✓ /api/predict/batch validation OK")
+
     # ---------------------------------------
     # FEEDBACK
     # ---------------------------------------
@@ -58,6 +122,15 @@ class APITestCase(unittest.TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+        log_writer.flush(timeout=5)
+        self.assertEqual(json.loads(get_feedback(limit=1)[0][0]), ["fever", "cough"])
+
+        for feedback in ("great", "", None):
+            response = self.client.post(
+                "/api/feedback",
+                json={"symptoms": ["fever"], "predicted": "flu", "feedback": feedback}
+            )
+            self.assertEqual(response.status_code, 400)
         print("✓ /api/feedback OK")
 
     # ---------------------------------------
@@ -101,14 +174,176 @@ class APITestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         print("✓ /api/admin/logs OK")
 
+    def test_logs_pagination_and_aggregates(self):
+        for _ in range(3):
+            self.client.post("/api/predict", json={"symptoms": ["fever", "cough"]})
+        log_writer.flush(timeout=5)
+
+        page = self.client.get("/api/admin/logs?limit=2")
+        self.assertEqual(page.status_code, 200)
+        self.assertEqual(len(page.json), 2)
+        self.assertIsInstance(page.json[0]["predictions"], list)
+
+        cursor = page.headers["X-Next-Cursor"]
+        next_page = self.client.get(f"/api/admin/logs?limit=2&before={cursor}")
+        self.assertTrue(all(entry["id"] < int(cursor) for entry in next_page.json))
+        for limit in (-1, 0):
+            self.assertEqual(len(self.client.get(f"/api/admin/logs?limit={limit}").json), 1)
+        self.assertLessEqual(len(self.client.get("/api/admin/jobs?limit=-1").json), 1)
+
+        summary = self.client.get("/api/admin/logs/summary").json
+        self.assertGreaterEqual(summary["successful"], 3)
+
+        counts = self.client.get("/api/admin/logs/counts?bucket=hour")
+        self.assertEqual(counts.status_code, 200)
+        self.assertGreaterEqual(sum(row["count"] for row in counts.json), 3)
+        self.assertEqual(self.client.get("/api/admin/logs/counts?bucket=week").status_code, 400)
+        print("✓ /api/admin/logs pagination, summary and counts OK")
+
     # ---------------------------------------
     # ADMIN: SYMPTOM TRENDS
     # ---------------------------------------
     def test_symptom_trends(self):
         response = self.client.get("/api/admin/symptom-trends")
         self.assertEqual(response.status_code, 200)
+
+        self.client.post("/api/predict", json={"symptoms": ["fever", "cough"]})
+        for limit in (-1, 0):
+            self.assertEqual(len(self.client.get(f"/api/admin/symptom-trends?limit={limit}").json), 1)
         print("✓ /api/admin/symptom-trends OK")
 
+    def test_symptom_trends_reflect_live_predictions(self):
+        symptom = "trend-api-test-symptom"
+        self.client.post("/api/predict", json={"symptoms": [symptom]})
+
+        trends = dict(self.client.get("/api/admin/symptom-trends?limit=100000").json)
+        self.assertGreaterEqual(trends[symptom], 1)
+
+        buckets = self.client.get(f"/api/admin/symptom-trends/buckets?bucket=day&symptom={symptom}")
+        self.assertEqual(buckets.status_code, 200)
+        self.assertGreaterEqual(buckets.json[0]["count"], 1)
+        self.assertEqual(self.client.get("/api/admin/symptom-trends/buckets?bucket=week").status_code, 400)
+        print("✓ /api/admin/symptom-trends reflects live traffic")
+
+    # ---------------------------------------
+    # ADMIN: PREDICTION CACHE STATS
+    # ---------------------------------------
+    def test_cache_stats(self):
+        self.client.post("/api/predict", json={"symptoms": ["fever"]})
+        self.client.post("/api/predict", json={"symptoms": ["fever"]})
+
+        response = self.client.get("/api/admin/cache-stats")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertGreaterEqual(data["hits"], 1)
+        self.assertIn("model_version", data)
+        print("✓ /api/admin/cache-stats OK")
+
+    # ---------------------------------------
+    # ADMIN: ACTIVE MODEL STATUS
+    # ---------------------------------------
+    def test_model_status(self):
+        self.client.post("/api/predict", json={"symptoms": ["fever"]})
+
+        response = self.client.get("/api/admin/model-status")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()["loaded"])
+        print("✓ /api/admin/model-status OK")
+
+    # ---------------------------------------
+    # ADMIN: RETRAIN PARAMETERS
+    # ---------------------------------------
+    def test_retrain_rejects_bad_parameters(self):
+        for body in ({"n_estimators": 0}, {"max_samples": 1.5}, {"warm_start": "yes"}, {"trees": 10}, [1]):
+            response = self.client.post("/api/admin/retrain", json=body)
+            self.assertEqual(response.status_code, 400, body)
+
+        from backend.routes.admin import retrain_args
+        self.assertEqual(
+            retrain_args({"n_estimators": 50, "max_depth": None, "max_samples": 0.5, "warm_start": True}),
+            ["--n_estimators", "50", "--max_depth", "none", "--max_samples", "0.5", "--warm_start"]
+        )
+        print("✓ /api/admin/retrain validates its parameters")
+
+    # ---------------------------------------
+    # ADMIN: BACKGROUND JOBS
+    # ---------------------------------------
+    def _wait_for_job(self, job_id, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.client.get(f"/api/admin/jobs/{job_id}").get_json()
+            if job["status"] not in ("queued", "running"):
+                return job
+            time.sleep(0.1)
+        self.fail(f"job {job_id} did not finish")
+
+    def _fake_job(self, code):
+        # stands in for preprocess_raw.py, which would rewrite the processed dataset
+        original = job_runner.job_types["preprocess"]
+        job_runner.job_types["preprocess"] = JobType(["-c", code], ("=== A ===", "=== B ==="), False)
+        self.addCleanup(job_runner.job_types.__setitem__, "preprocess", original)
+
+    def test_job_runs_in_background(self):
+        self._fake_job("print('=== A ==='); print('=== B ==='); print('done')")
+
+        response = self.client.post("/api/admin/preprocess")
+        self.assertEqual(response.status_code, 202)
+        data = response.get_json()
+        self.assertTrue(data["status_url"].endswith(f"/api/admin/jobs/{data['job_id']}"))
+
+        job = self._wait_for_job(data["job_id"])
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["progress"], 1.0)
+        self.assertEqual(job["log_tail"][-1], "done")
+        self.assertIsNotNone(job["finished_at"])
+
+        log = self.client.get(f"/api/admin/jobs/{data['job_id']}/log")
+        self.assertIn("=== B ===", log.get_data(as_text=True))
+        listed = self.client.get("/api/admin/jobs?type=preprocess&limit=1").get_json()
+        self.assertEqual(listed[0]["id"], data["job_id"])
+        print("✓ /api/admin/preprocess runs as a background job")
+
+    def test_job_lock_and_cancel(self):
+        self._fake_job("import time; print('=== A ==='); print('=== B ==='); time.sleep(30)")
+
+        job_id = self.client.post("/api/admin/preprocess").get_json()["job_id"]
+        duplicate = self.client.post("/api/admin/preprocess")
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate.get_json()["job_id"], job_id)
+
+        deadline = time.monotonic() + 10
+        job = self.client.get(f"/api/admin/jobs/{job_id}").get_json()
+        while job["message"] != "B" and time.monotonic() < deadline:
+            time.sleep(0.1)
+            job = self.client.get(f"/api/admin/jobs/{job_id}").get_json()
+        self.assertEqual(job["status"], "running")
+        self.assertEqual(job["progress"], 0.5)
+        self.assertEqual(job["log_tail"], ["=== A ===", "=== B ==="])
+
+        response = self.client.post(f"/api/admin/jobs/{job_id}/cancel")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self._wait_for_job(job_id, timeout=10)["status"], "cancelled")
+        self.assertEqual(self.client.post(f"/api/admin/jobs/{job_id}/cancel").status_code, 409)
+        self.assertEqual(self.client.get("/api/admin/jobs/999999999").status_code, 404)
+        print("✓ /api/admin/jobs allows one job per type and cancels it")
+
+    @unittest.skipUnless(os.path.isdir("/proc"), "process start times come from /proc")
+    def test_jobs_of_a_previous_server_with_the_same_pid_are_failed(self):
+        from database.queries import create_job, update_job, fail_interrupted_jobs
+        from backend.services.jobs import owner_token, _owner_alive
+
+        # e.g. a restarted container whose server is pid 1 again
+        pid = os.getpid()
+        stale = create_job("stale-owner-test", pid=pid, owner=f"{pid}:0")
+        live = create_job("live-owner-test", pid=pid, owner=owner_token())
+
+        interrupted = fail_interrupted_jobs(_owner_alive)
+        self.assertIn(stale, interrupted)
+        self.assertNotIn(live, interrupted)
+        self.assertEqual(self.client.get(f"/api/admin/jobs/{stale}").get_json()["status"], "failed")
+        update_job(live, status="cancelled")
+        print("✓ Jobs are owned by pid + start time, not a reusable pid")
+
 
 if __name__ == "__main__":
     unittest.main()
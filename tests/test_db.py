@@ -8,14 +8,22 @@ This script tests:
 - Select queries
 - Update queries
 - All functions in database/queries.py
+- Connection pooling
+- Write-behind logging
 
 Run using:
     python -m tests.test_db
 """
 
+import os
+import tempfile
+import threading
 import unittest
 import sqlite3
-from database.db import get_connection
+from database.db import get_connection, ConnectionPool
+from database.migrations import migrate, SCHEMA_VERSION
+from backend.services.write_behind import WriteBehindWriter
+from backend.services.symptom_trends import SymptomTrendAggregator
 from database.queries import (
     save_model_metadata,
     save_feedback,
@@ -24,9 +32,12 @@ from database.queries import (
     get_models,
     get_feedback,
     get_prediction_logs,
+    get_prediction_counts,
+    get_prediction_summary,
     get_admin_datasets,
     increment_symptom_counts,
-    get_symptom_trends
+    get_symptom_trends,
+    get_symptom_trend_buckets
 )
 
 
@@ -94,6 +105,28 @@ class DatabaseTestCase(unittest.TestCase):
         self.assertGreater(len(logs), 0)
         print("✓ log_prediction + get_prediction_logs OK")
 
+    def test_prediction_log_pagination_and_counts(self):
+        tag = "pagination-test-condition"
+        for i in range(5):
+            log_prediction(["fever", "cough"], [{"condition": tag, "confidence": 50.0 + i}], tag)
+
+        first = get_prediction_logs(limit=3, condition=tag)
+        second = get_prediction_logs(limit=3, before_id=first[-1][0], condition=tag)
+        ids = [row[0] for row in first + second]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertGreaterEqual(len(ids), 5)
+        self.assertEqual(first[0][5], 2)                      # symptom_count
+        self.assertEqual(first[0][4], 54.0)                   # top_confidence
+
+        in_top_k = get_prediction_logs(limit=1, condition=tag, in_top_k=True)
+        self.assertEqual(in_top_k[0][0], first[0][0])
+
+        counts = get_prediction_counts(bucket="hour", condition=tag)
+        self.assertGreaterEqual(sum(row[2] for row in counts), 5)
+        self.assertGreater(get_prediction_summary()["total"], 0)
+        print("✓ Keyset pagination, filters and SQL aggregation OK")
+
     # ---------------------------
     # ADMIN DATASET REGISTRATION
     # ---------------------------
@@ -112,6 +145,304 @@ class DatabaseTestCase(unittest.TestCase):
         self.assertGreater(len(rows), 0)
         print("✓ increment_symptom_counts + get_symptom_trends OK")
 
+    def test_new_symptoms_are_upserted_into_buckets(self):
+        symptom = f"upsert-test-{os.getpid()}-{id(self)}"
+        increment_symptom_counts([symptom, symptom])
+        increment_symptom_counts([symptom])
+
+        totals = dict(get_symptom_trends(limit=100000))
+        self.assertEqual(totals[symptom], 3)
+        for bucket in ("hour", "day"):
+            rows = get_symptom_trend_buckets(bucket=bucket, symptom=symptom)
+            self.assertEqual([row[2] for row in rows], [3])
+        print("✓ New symptoms upserted into all-time, hourly and daily trends")
+
+    def test_failed_trend_flush_updates_nothing(self):
+        from unittest import mock
+        from database import queries
+
+        symptom = f"atomic-test-{os.getpid()}-{id(self)}"
+        # the daily upsert fails after the all-time and hourly ones ran
+        with mock.patch.dict(queries.TREND_TABLES, {"day": "missing_trend_table"}):
+            with self.assertRaises(sqlite3.OperationalError):
+                increment_symptom_counts([symptom])
+        increment_symptom_counts([symptom])
+
+        self.assertEqual(dict(get_symptom_trends(limit=100000))[symptom], 1)
+        rows = get_symptom_trend_buckets(bucket="hour", symptom=symptom)
+        self.assertEqual([row[2] for row in rows], [1])
+        print("✓ Trend flush is one transaction (a retry does not double count)")
+
+
+class MigrationTestCase(unittest.TestCase):
+
+    def test_legacy_prediction_logs_are_migrated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "legacy.sqlite"), isolation_level=None)
+            conn.execute("""
+                CREATE TABLE prediction_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symptoms TEXT NOT NULL,
+                    predictions TEXT NOT NULL,
+                    top_prediction TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute(
+                "INSERT INTO prediction_logs (symptoms, predictions, top_prediction) VALUES (?, ?, ?)",
+                ("['fever', 'cough']", "[{'condition': 'flu', 'confidence': 80.0}]", "flu")
+            )
+
+            self.assertEqual(migrate(conn), SCHEMA_VERSION)
+            self.assertEqual(migrate(conn), SCHEMA_VERSION)   # idempotent
+
+            row = conn.execute("""
+                SELECT symptom_count, top_confidence, json_extract(predictions, '$[0].condition')
+                FROM prediction_logs
+            """).fetchone()
+            self.assertEqual(row, (2, 80.0, "flu"))
+
+            indexes = {r[1] for r in conn.execute("PRAGMA index_list(prediction_logs)")}
+            self.assertIn("idx_prediction_logs_created_at", indexes)
+            conn.close()
+        print("✓ Legacy prediction logs migrated to JSON columns with indexes")
+
+    def test_schema_then_migrate_on_legacy_database(self):
+        # the order database/init_db.py applies them in
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, "legacy.sqlite"), isolation_level=None)
+            conn.execute("""
+                CREATE TABLE models (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    version TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    accuracy REAL,
+                    top3_accuracy REAL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("INSERT INTO models (version, path) VALUES ('v1', 'ml/model/v1.joblib')")
+            conn.execute("""
+                CREATE TABLE symptom_trends (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    symptom TEXT NOT NULL,
+                    count INTEGER DEFAULT 0
+                )
+            """)
+            conn.executemany("INSERT INTO symptom_trends (symptom, count) VALUES (?, ?)",
+                             [("fever", 2), ("fever", 3), ("cough", 1)])
+
+            with open("database/schema.sql", "r", encoding="utf-8") as f:
+                conn.executescript(f.read())
+            self.assertEqual(migrate(conn), SCHEMA_VERSION)
+
+            self.assertIn("sha256", {r[1] for r in conn.execute("PRAGMA table_info(models)")})
+            self.assertIn("idx_models_sha256", {r[1] for r in conn.execute("PRAGMA index_list(models)")})
+            self.assertEqual(conn.execute("SELECT symptom, count FROM symptom_trends ORDER BY symptom").fetchall(),
+                             [("cough", 1), ("fever", 5)])
+            self.assertIn("idx_symptom_trends_symptom",
+                          {r[1] for r in conn.execute("PRAGMA index_list(symptom_trends)")})
+            conn.close()
+        print("✓ schema.sql applies to a legacy database before its migrations")
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pool.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # ---------------------------
+    # REUSE + PRAGMAS
+    # ---------------------------
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.db_path, max_size=2)
+
+        conn = pool.acquire()
+        self.assertIs(pool.acquire(), conn)      # nested use shares the connection
+        pool.release(conn)
+        pool.release(conn)
+
+        again = pool.acquire()
+        self.assertIs(again, conn)
+        self.assertEqual(again.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(again.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        pool.release(again)
+
+        self.assertEqual(pool.stats()["open"], 1)
+        pool.close_all()
+        print("\n✓ Pooled connections are reused with pragmas applied")
+
+    # ---------------------------
+    # BOUNDED SIZE
+    # ---------------------------
+    def test_pool_is_bounded(self):
+        pool = ConnectionPool(self.db_path, max_size=1, timeout=0.05)
+        conn = pool.acquire()
+        errors = []
+
+        def other_thread():
+            try:
+                pool.acquire()
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+        t = threading.Thread(target=other_thread)
+        t.start()
+        t.join()
+
+        self.assertEqual(len(errors), 1)
+        pool.release(conn)
+        pool.close_all()
+        print("✓ Pool never opens more than max_size connections")
+
+    # ---------------------------
+    # HEALTH CHECK
+    # ---------------------------
+    def test_broken_connection_is_replaced(self):
+        pool = ConnectionPool(self.db_path, max_size=1, healthcheck_seconds=0)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.close()
+
+        fresh = pool.acquire()
+        self.assertIsNot(fresh, conn)
+        self.assertEqual(fresh.execute("SELECT 1").fetchone()[0], 1)
+        pool.release(fresh)
+        pool.close_all()
+        print("✓ Unhealthy idle connections are replaced")
+
+
+class WriteBehindTestCase(unittest.TestCase):
+
+    # ---------------------------
+    # BATCHED BACKGROUND WRITES
+    # ---------------------------
+    def test_writes_are_batched_and_flushed(self):
+        written = []
+        writer = WriteBehindWriter(max_queue=100, batch_size=50,
+                                   writers={"row": lambda items: written.append(list(items))})
+        for i in range(20):
+            writer.submit("row", i)
+
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(sorted(i for batch in written for i in batch), list(range(20)))
+        self.assertEqual(writer.stats()["written"], 20)
+        writer.stop()
+        print("✓ Write-behind flushes queued rows in batches")
+
+    # ---------------------------
+    # BAD ROWS ARE ISOLATED
+    # ---------------------------
+    def test_failing_row_does_not_drop_batch(self):
+        written = []
+
+        def write(items):
+            if "bad" in items:
+                raise sqlite3.IntegrityError("bad row")
+            written.extend(items)
+
+        writer = WriteBehindWriter(max_queue=100, writers={"row": write})
+        for item in ("a", "bad", "b"):
+            writer.submit("row", item)
+        writer.flush(timeout=5)
+
+        self.assertEqual(sorted(written), ["a", "b"])
+        self.assertEqual(writer.stats()["failed"], 1)
+        writer.stop()
+        print("✓ Write-behind retries a failed batch row by row")
+
+    # ---------------------------
+    # BACKPRESSURE
+    # ---------------------------
+    def test_full_queue_policies(self):
+        gate = threading.Event()
+        written = []
+
+        def slow_write(items):
+            if threading.current_thread().name == "write-behind":
+                gate.wait(5)                # only the background worker stalls
+            written.extend(items)
+
+        for policy, expected_inline, expected_dropped in (("sync", 1, 0), ("drop", 0, 1)):
+            gate.clear()
+            written.clear()
+            writer = WriteBehindWriter(max_queue=1, batch_size=1, policy=policy,
+                                       writers={"row": slow_write})
+            writer.submit("row", 1)         # picked up by the worker, which blocks
+            while writer._queue.qsize():
+                pass
+            writer.submit("row", 2)         # fills the queue
+            writer.submit("row", 3)         # queue full -> policy applies
+            gate.set()
+
+            writer.flush(timeout=5)
+            stats = writer.stats()
+            self.assertEqual((stats["inline"], stats["dropped"]), (expected_inline, expected_dropped))
+            writer.stop()
+        print("✓ Write-behind applies its backpressure policy when full")
+
+    # ---------------------------
+    # REAL TABLES
+    # ---------------------------
+    def test_prediction_log_written_behind(self):
+        writer = WriteBehindWriter(max_queue=10)
+        writer.submit("prediction", ("['write-behind']", "[]", "write-behind-test"))
+        writer.submit("feedback", ("['write-behind']", "write-behind-test", None, "accurate"))
+        writer.stop()
+
+        logs = get_prediction_logs()
+        self.assertIn("write-behind-test", [row[3] for row in logs])
+        print("✓ Write-behind persists prediction logs and feedback")
+
+
+class SymptomTrendAggregatorTestCase(unittest.TestCase):
+
+    def test_deltas_are_merged_until_flush(self):
+        flushed = []
+        aggregator = SymptomTrendAggregator(flush_seconds=60, writer=flushed.append)
+        aggregator.record([["Fever", "cough"], ["fever "], []])
+        aggregator.record([["fever"]])
+
+        self.assertEqual(flushed, [])
+        self.assertEqual(aggregator.flush(), 2)
+        totals = {symptom: n for (_, symptom), n in flushed[0].items()}
+        self.assertEqual(totals, {"fever": 3, "cough": 1})
+        self.assertEqual(aggregator.flush(), 0)
+        aggregator.stop()
+        print("✓ Symptom counts aggregate in memory and flush as one batch")
+
+    def test_failed_flush_is_retried(self):
+        calls = []
+
+        def flaky(deltas):
+            calls.append(dict(deltas))
+            if len(calls) == 1:
+                raise sqlite3.OperationalError("database is locked")
+
+        aggregator = SymptomTrendAggregator(flush_seconds=60, writer=flaky)
+        aggregator.record([["fever"]])
+        aggregator.flush()
+        aggregator.record([["fever"]])
+        aggregator.flush()
+
+        self.assertEqual(list(calls[-1].values()), [2])
+        self.assertEqual(aggregator.stats()["failed_flushes"], 1)
+        aggregator.stop()
+        print("✓ Failed trend flushes are kept and retried")
+
+    def test_full_buffer_wakes_the_flusher(self):
+        flushed = threading.Event()
+        aggregator = SymptomTrendAggregator(flush_seconds=60, max_pending=2,
+                                            writer=lambda deltas: flushed.set())
+        aggregator.record([["fever", "cough", "headache"]])
+        self.assertTrue(flushed.wait(timeout=5))
+        aggregator.stop()
+        print("✓ Trend aggregator flushes early when its buffer fills")
+
 
 if __name__ == "__main__":
     unittest.main()
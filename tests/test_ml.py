@@ -11,6 +11,11 @@ Run:
 """
 
 import json
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
 import joblib
 import numpy as np
 import pandas as pd
@@ -19,6 +24,17 @@ from pathlib import Path
 # Import components from your ML pipeline
 from ml.preprocess.merger.feature_indexer import FeatureIndexer
 from ml.preprocess.merger.vector_builder import VectorBuilder
+from ml import flat_forest
+from ml.flat_forest import compile_forest, FlatForest
+from ml.utils import top_k, file_sha256
+from ml.benchmarks import loaders_benchmark as bench
+from ml.preprocess import pipeline
+from ml.preprocess.merger.dataset_merger import DatasetMerger, signature_hash
+from ml.benchmarks import merger_benchmark
+from ml.preprocess.cleaners.symptom_cleaner import SynonymIndex, clean_symptom
+from ml.benchmarks.synonyms_benchmark import legacy_clean_symptom
+from ml.symptom_matcher import SymptomMatcher
+from ml.preprocess.merger.master_matrix import load_dataset, load_matrix, matrix_path
 
 
 MASTER = "ml/data/processed/master_dataset.csv"
@@ -30,13 +46,9 @@ MODEL = "ml/model/rf_model.joblib"
 # Utility evaluation
 # ---------------------
 def top_k_accuracy(clf, X, y_true, k=3):
-    proba = clf.predict_proba(X)
-    topk = np.argsort(proba, axis=1)[:, ::-1][:, :k]
-    correct = 0
-    for i, row in enumerate(topk):
-        if y_true[i] in row:
-            correct += 1
-    return correct / len(y_true)
+    idx, _ = top_k(clf.predict_proba(X), k)
+    topk = np.asarray(clf.classes_)[idx]
+    return float((topk == np.asarray(y_true)[:, np.newaxis]).any(axis=1).mean())
 
 
 # ---------------------
@@ -115,8 +127,555 @@ def test_ml_system():
 
 
 
+# ---------------------
+# Vectorization
+# ---------------------
+def test_vector_builder_sparse_matches_dense():
+    features = {"cough": 0, "fever": 1, "headache": 2, "nausea": 3}
+    rows = [["fever", "cough"], "['headache', 'fever']", [], ["unknown", "fever", "fever"]]
+
+    dense = VectorBuilder(features).build_matrix(rows)
+    sparse = VectorBuilder(features, sparse=True).build_matrix(rows)
+
+    assert dense.dtype == np.uint8
+    assert sparse.format == "csr"
+    np.testing.assert_array_equal(sparse.toarray(), dense)
+    np.testing.assert_array_equal(dense, [[1, 1, 0, 0], [0, 1, 1, 0], [0, 0, 0, 0], [0, 1, 0, 0]])
+    np.testing.assert_array_equal(VectorBuilder(features).build_vector(["nausea"]), [0, 0, 0, 1])
+
+    df = pd.DataFrame({"disease": ["flu", "migraine"], "symptoms": rows[:2]})
+    X, y = VectorBuilder(features, sparse=True).dataset_to_matrix(df)
+    assert X.shape == (2, 4) and y == ["flu", "migraine"]
+
+    # a malformed list string falls back to splitting on commas
+    np.testing.assert_array_equal(VectorBuilder(features).build_matrix(["[fever, 'cough'", "[nausea"]),
+                                  [[1, 1, 0, 0], [0, 0, 0, 1]])
+
+    print("✓ Sparse and dense vectorization agree")
+
+
+# ---------------------
+# Synonym index
+# ---------------------
+def test_synonym_index_matches_linear_scan():
+    synonyms = {
+        "fever": ["pyrexia", "high temperature"],
+        "headache": ["cephalalgia", "fever"],
+        "nausea": ["pyrexia", "queasiness"],
+        "cough": "tussis"
+    }
+    index = SynonymIndex(synonyms)
+    symptoms = ["Pyrexia ", "HIGH  temperature", "fever", "cephalalgia", "queasiness",
+                "nausea", "tussis", "unknown", "", None]
+
+    for s in symptoms:
+        assert index.resolve(s) == clean_symptom(s, synonyms)
+    # first canonical entry wins, like the linear scan
+    for s in symptoms[:-3]:
+        assert index.resolve(s) == legacy_clean_symptom(s, synonyms)
+    assert index.resolve("pyrexia") == "fever" and index.resolve("fever") == "fever"
+
+    features = {"cough": 0, "fever": 1, "headache": 2}
+    builder = VectorBuilder(features, synonyms=index)
+    np.testing.assert_array_equal(builder.build_vector(["Pyrexia ", "cephalalgia", "tussis"]), [1, 1, 1])
+    np.testing.assert_array_equal(builder.build_matrix([["high temperature"], ["queasiness"]]), [[0, 1, 0], [0, 0, 0]])
+
+    print("✓ Synonym index resolves like the linear scan")
+
+
+def test_symptom_matcher_maps_free_text():
+    features = {"abdominalpain": 0, "cough": 1, "fever": 2, "headache": 3, "joint pain": 4}
+    synonyms = SynonymIndex({"fever": ["pyrexia", "high temperature"], "cough": ["coughing"]})
+    matcher = SymptomMatcher(features, synonyms)
+
+    assert matcher.match("cough").method == "exact"
+    assert matcher.match("Abdominal  Pain").symptom == "abdominalpain"
+    assert matcher.match("Pyrexia").method == "synonym"
+    assert matcher.match("headaches")[:2] == ("headache", 3)
+    assert matcher.match("high temprature").symptom == "fever"
+    assert matcher.match("joint pains").method == "fuzzy"
+    assert matcher.match("qwxzv") is None and matcher.match("") is None and matcher.match(None) is None
+
+    strict = SymptomMatcher(features, synonyms, fuzzy=False)
+    assert strict.match("headaches") is None and strict.lookup("pyrexia") == 2
+
+    matched, unmatched = matcher.match_all(["coughing", "qwxzv"])
+    assert [m["symptom"] for m in matched] == ["cough"] and unmatched == ["qwxzv"]
+
+    builder = VectorBuilder(features, matcher=matcher)
+    np.testing.assert_array_equal(builder.build_vector(["headaches", "Coughing", "qwxzv"]), [0, 1, 0, 1, 0])
+    assert builder.indices(["headaches", "headache"]) == (3,)
+
+    print("✓ Symptom matcher maps free-text input onto features")
+
+
+def test_symptom_matcher_rejects_risky_fuzzy_matches():
+    with open("ml/data/processed/features.json", "r", encoding="utf-8") as f:
+        features = json.load(f)
+    with open("ml/preprocess/cleaners/synonyms_map.json", "r", encoding="utf-8") as f:
+        synonyms = SynonymIndex(json.load(f))
+    matcher = SymptomMatcher(features, synonyms)
+
+    # each was a fuzzy hit at the old 0.5 threshold
+    for symptom in ("no fever", "not coughing", "without headache",   # negated
+                    "tiredness",                                      # -> throat redness
+                    "pain",                                           # -> pain in eye / penis pain
+                    "stomach ache"):                                  # -> stomachpain
+        assert matcher.match(symptom) is None, symptom
+
+    assert matcher.match("vomitting")[::3] == ("vomiting", "fuzzy")
+    assert matcher.match("joint pains").symptom == "joint pain"
+    assert matcher.match("fever").method == "exact"
+
+    print("✓ Symptom matcher rejects negated, weak and ambiguous fuzzy matches")
+
+
+# ---------------------
+# Vectorized loaders
+# ---------------------
+def test_vectorized_loaders_match_iterrows():
+    cases = {
+        "binary_matrix": (
+            "Disease,fever,cough,rash,fatigue\n"
+            " Flu ,1,0,0.0,True\n"
+            "Cold,0,1,,false\n"
+            "Measles,0,0,1.5,False\n"
+            ",1,1,-0.0,True\n"
+        ),
+        "symptom_list": (
+            "Disease,Symptoms\n"
+            "Flu,\"fever, cough;headache\"\n"
+            "Cold,runny nose / sneezing\n"
+            "Rash,\n"
+            "Mystery,\" , ; \"\n"
+        ),
+        "textual_description": (
+            "Diagnosis,Description\n"
+            "Flu,\"High   FEVER. Dry cough; aches!!\"\n"
+            "Cold,\n"
+            "Migraine,Throbbing headache...Nausea\n"
+        ),
+    }
+    loaders = {name: (legacy, loader_cls) for name, _, legacy, loader_cls in bench.CASES}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, content in cases.items():
+            path = Path(tmp) / f"{name}.csv"
+            path.write_text(content)
+            legacy, loader_cls = loaders[name]
+            pd.testing.assert_frame_equal(loader_cls().load(path), legacy(path))
+
+        # synthetic files, including the empty-file case
+        for name, write, legacy, loader_cls in bench.CASES:
+            for n_rows in (0, 500):
+                path = Path(tmp) / f"{name}_{n_rows}.csv"
+                write(path, n_rows)
+                pd.testing.assert_frame_equal(loader_cls().load(path), legacy(path))
+
+    print("✓ Vectorized loaders match the iterrows implementations")
+
+
+def test_numeric_disease_codes_are_read_as_ints():
+    # iterrows() turned code 3 into '3.0' whenever another column was float
+    files = {
+        "binary_matrix": "Disease,fever,cough\n3,1,0.0\n4,0,1\n3,1,\n",
+        "symptom_list": "Disease,Symptoms\n3,\n4,\n3,fever\n",
+    }
+    loaders = {name: loader_cls for name, _, _, loader_cls in bench.CASES}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, content in files.items():
+            path = Path(tmp) / f"{name}.csv"
+            path.write_text(content)
+            loader = loaders[name]()
+            assert loader.load(path)["disease"].tolist() == ["3", "4", "3"]
+            # the same labels when a chunk has no float column
+            chunks = pd.concat(list(loader.iter_chunks(path, 2)), ignore_index=True)
+            pd.testing.assert_frame_equal(chunks, loader.load(path))
+
+    print("✓ Numeric disease codes read the same in every file and chunk")
+
+
+# ---------------------
+# Streaming preprocessing
+# ---------------------
+def write_raw_datasets(raw_dir):
+    raw_dir.mkdir()
+    bench.write_symptom_list(raw_dir / "b_lists.csv", 300, seed=1)
+    bench.write_binary_matrix(raw_dir / "a_matrix.csv", 300, n_symptoms=8, seed=2)
+    # exact duplicates of the list file must be dropped across files too
+    (raw_dir / "c_copy.csv").write_text((raw_dir / "b_lists.csv").read_text())
+
+
+# paths of a raw_workspace(); out/ holds the preprocessed master dataset when requested
+Workspace = namedtuple("Workspace", ["root", "raw", "synonyms", "out", "master", "features"])
+
+
+@contextmanager
+def raw_workspace(synonyms=None, preprocess=False):
+    """Temporary directory with the raw datasets and a synonym map (optionally preprocessed into out/)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_raw_datasets(tmp / "raw")
+        (tmp / "synonyms.json").write_text(json.dumps(synonyms or {}))
+        ws = Workspace(tmp, tmp / "raw", tmp / "synonyms.json", tmp / "out",
+                       tmp / "out" / "master_dataset.csv", tmp / "out" / "features.json")
+        if preprocess:
+            pipeline.main(ws.raw, ws.out, ws.synonyms)
+        yield ws
+
+
+def test_streaming_and_parallel_pipeline_match_whole_file_merge():
+    with raw_workspace({"symptom1": ["symptom2"]}) as ws:
+        tmp, synonyms = ws.root, ws.synonyms
+        pipeline.main(tmp / "raw", tmp / "whole", synonyms, chunksize=0)
+        pipeline.main(tmp / "raw", tmp / "chunked", synonyms, chunksize=7)
+        pipeline.main(tmp / "raw", tmp / "parallel", synonyms, chunksize=7, workers=2)
+
+        for name in ("master_dataset.csv", "features.json"):
+            assert (tmp / "whole" / name).read_bytes() == (tmp / "chunked" / name).read_bytes()
+            assert (tmp / "whole" / name).read_bytes() == (tmp / "parallel" / name).read_bytes()
+
+        master = pd.read_csv(tmp / "chunked" / "master_dataset.csv")
+        assert "c_copy.csv" not in set(master["source"])
+        assert "symptom2" not in json.loads((tmp / "chunked" / "features.json").read_text())
+
+        # merge() over whole frames gives the same rows as the streamed file
+        staged = [(p.name, bench.SymptomListLoader().load(p)) for p in sorted((tmp / "raw").glob("*_lists.csv"))]
+        merged, _ = DatasetMerger({"symptom1": ["symptom2"]}).merge(staged)
+        assert len(merged) == (master["source"] == "b_lists.csv").sum()
+
+    print("✓ Chunked and parallel preprocessing write the same master dataset")
+
+
+def test_vectorized_merge_matches_row_by_row_merge():
+    staged = merger_benchmark.staged_frames(3000)
+    staged.append(("messy.csv", pd.DataFrame({
+        "disease": ["Flu Disease", None, "flu", "flu"],
+        "symptoms": ["Fever, cough,, ", [], ["cough", "FEVER", "fever"], ["syn 4", "  "]]
+    })))
+    merger = DatasetMerger(merger_benchmark.SYNONYMS)
+    master, features = merger.merge(staged)
+    legacy, legacy_features = merger_benchmark.legacy_merge(staged, merger_benchmark.SYNONYMS)
+
+    assert merger_benchmark.canonical(master) == merger_benchmark.canonical(legacy)
+    assert features == legacy_features
+    assert master[master["source"] == "messy.csv"]["symptoms"].tolist() == [["fever", "cough"], [], ["symptom 4"]]
+
+    stats = merger.source_stats
+    assert sum(s["kept"] for s in stats.values()) == len(master)
+    assert all(s["rows"] == s["kept"] + s["duplicates"] for s in stats.values())
+    assert stats["messy.csv"] == {"rows": 4, "kept": 3, "duplicates": 1}
+
+    cleaned = merger.clean(staged[-1][1])
+    assert cleaned["sig"].tolist() == [signature_hash(d, s) for d, s in zip(cleaned["disease"], cleaned["symptoms"])]
+    assert signature_hash("flu", ["a", "b"]) == signature_hash("flu", ["b", "a"]) != signature_hash("flu", ["a"])
+
+    print("✓ Vectorized merge keeps the same rows as the row-by-row merge")
+
+
+def test_incremental_preprocessing_reuses_cached_partials():
+    with raw_workspace(preprocess=True) as ws:
+        tmp, synonyms, out = ws.root, ws.synonyms, ws.out
+        first = (out / "master_dataset.csv").read_bytes()
+
+        # unchanged inputs: nothing is cleaned again, output identical
+        cleaned = []
+        original = pipeline.clean_chunk
+        pipeline.clean_chunk = lambda loader_cls, raw_df: cleaned.append(1) or original(loader_cls, raw_df)
+        try:
+            pipeline.main(tmp / "raw", out, synonyms)
+            assert cleaned == []
+            assert (out / "master_dataset.csv").read_bytes() == first
+
+            # one new upload: only that file is cleaned
+            bench.write_textual_description(tmp / "raw" / "d_notes.csv", 50)
+            pipeline.main(tmp / "raw", out, synonyms, chunksize=0)
+            assert len(cleaned) == 1
+        finally:
+            pipeline.clean_chunk = original
+
+        pipeline.main(tmp / "raw", tmp / "fresh", synonyms, use_cache=False)
+        assert (out / "master_dataset.csv").read_bytes() == (tmp / "fresh" / "master_dataset.csv").read_bytes()
+
+        # removed uploads drop out of the manifest and their partials are deleted
+        (tmp / "raw" / "d_notes.csv").unlink()
+        pipeline.main(tmp / "raw", out, synonyms)
+        manifest = json.loads((out / "cache" / "manifest.json").read_text())
+        assert sorted(manifest["files"]) == ["a_matrix.csv", "b_lists.csv", "c_copy.csv"]
+        assert len(list((out / "cache").glob("*.pkl"))) == 2      # b_lists and c_copy share content
+        assert (out / "master_dataset.csv").read_bytes() == first
+
+        # a different synonym map invalidates every partial
+        synonyms.write_text(json.dumps({"symptom1": ["symptom2"]}))
+        pipeline.main(tmp / "raw", out, synonyms)
+        assert (out / "master_dataset.csv").read_bytes() != first
+
+    print("✓ Incremental preprocessing only cleans new or changed files")
+
+
+def test_matrix_artifact_matches_csv_vectorization():
+    with raw_workspace() as ws:
+        out, master, features = ws.out, ws.master, ws.features
+        pipeline.main(ws.raw, out, ws.synonyms, chunksize=7)
+
+        X, labels, classes = load_dataset(master, features)
+        assert load_matrix(matrix_path(master))[0].nnz == X.nnz
+
+        # same matrix and labels as vectorizing the CSV
+        df = pd.read_csv(master, dtype={"disease": str})
+        X_csv, y = VectorBuilder(FeatureIndexer.load(features), sparse=True).dataset_to_matrix(df)
+        assert (X != X_csv).nnz == 0
+        assert list(classes[labels]) == y
+        assert list(classes) == sorted(set(y))
+
+        # built once, then memory-mapped from the matrix cache
+        cache = out / "matrix_cache"
+        entries = [p for p in cache.iterdir() if p.is_dir()]
+        assert len(entries) == 1 and isinstance(labels, np.memmap)
+        X2, labels2, classes2 = load_dataset(master, features)
+        assert (X2 != X).nnz == 0 and list(classes2[labels2]) == y
+        assert not X2.indices.flags.owndata and not X2.data.flags.owndata
+        assert load_dataset(master, features, use_cache=False)[0].nnz == X.nnz
+
+        # a hand-edited CSV makes the artifact stale; the CSV wins under a new cache key
+        df.iloc[:3].to_csv(master, index=False)
+        X, labels, classes = load_dataset(master, features)
+        assert X.shape[0] == 3 and list(classes[labels]) == df["disease"].iloc[:3].tolist()
+        assert len([p for p in cache.iterdir() if p.is_dir()]) == 2
+
+    print("✓ Matrix artifact and cache match CSV vectorization")
+
+
+def test_train_parameters_and_warm_start():
+    with raw_workspace(preprocess=True) as ws:
+        model = ws.root / "model.joblib"
+        cmd = [sys.executable, "ml/train.py",
+               "--master_csv", str(ws.master), "--features_json", str(ws.features),
+               "--out", str(model), "--n_estimators", "5", "--max_depth", "8",
+               "--max_samples", "0.5", "--n_jobs", "2"]
+        subprocess.run(cmd, check=True, capture_output=True)
+        meta = json.loads(Path(str(model) + ".meta.json").read_text())
+        assert meta["params"] == {"n_estimators": 5, "max_depth": 8, "max_samples": 0.5, "n_jobs": 2}
+        assert meta["trees_added"] == 5 and not meta["warm_start"]
+        assert set(meta["timing"]) == {"load_seconds", "fit_seconds", "save_seconds"}
+        first_tree = joblib.load(model)["model"].estimators_[0]
+
+        subprocess.run(cmd + ["--n_estimators", "3", "--warm_start"], check=True, capture_output=True)
+        meta = json.loads(Path(str(model) + ".meta.json").read_text())
+        clf = joblib.load(model)["model"]
+        assert meta["warm_start"] and meta["trees_added"] == 3 and len(clf.estimators_) == 8
+        assert clf.n_jobs is None
+        np.testing.assert_array_equal(clf.estimators_[0].tree_.threshold, first_tree.tree_.threshold)
+
+    print("✓ Training takes hyperparameters and warm-starts extra trees")
+
+
+def test_tune_cross_validates_and_writes_the_winner():
+    with raw_workspace(preprocess=True) as ws:
+        model = ws.root / "model.joblib"
+        subprocess.run([
+            sys.executable, "ml/tune.py",
+            "--master_csv", str(ws.master), "--features_json", str(ws.features),
+            "--out", str(model), "--folds", "2", "--search", "grid",
+            "--grid", json.dumps({"n_estimators": [3, 6], "max_depth": [4]}),
+            "--workers", "2", "--n_jobs", "1"
+        ], check=True, capture_output=True)
+
+        report = json.loads(Path(str(model) + ".tune.json").read_text())
+        assert len(report["results"]) == 2 and report["folds"] == 2
+        assert report["best"] == report["results"][0]
+        assert report["results"][0]["top1"] >= report["results"][1]["top1"]
+        for row in report["results"]:
+            assert 0 <= row["top1"] <= row["top3"] <= 1 and row["fit_seconds"] >= 0
+            assert row["wall_seconds"] >= 0
+            assert row["fit_rss_mb"] is None or row["fit_rss_mb"] >= 0
+
+        meta = json.loads(Path(str(model) + ".meta.json").read_text())
+        assert meta["params"]["n_estimators"] == report["best"]["params"]["n_estimators"]
+        assert meta["cv"]["top1"] == report["best"]["top1"]
+        assert len(joblib.load(model)["model"].estimators_) == report["best"]["params"]["n_estimators"]
+
+    print("✓ Tuning cross-validates configs and trains the best one")
+
+
+def test_pipeline_runner_runs_stages_in_process():
+    with raw_workspace() as ws:
+        model = ws.root / "model.joblib"
+        result = subprocess.run([
+            sys.executable, "ml/pipeline_runner.py",
+            "--stages", "preprocess,train,evaluate,compile",
+            "--raw_dir", str(ws.raw), "--synonyms", str(ws.synonyms),
+            "--master_csv", str(ws.master), "--features_json", str(ws.features),
+            "--model", str(model), "--n_estimators", "4", "--n_jobs", "1"
+        ], check=True, capture_output=True, text=True)
+
+        markers = [line for line in result.stdout.splitlines() if line.startswith("=== ")]
+        assert markers == ["=== Preprocessing ===", "=== Training ===",
+                           "=== Evaluation ===", "=== Compiling Serving Model ==="]
+        assert "Stage timings:" in result.stdout
+
+        meta = json.loads(Path(str(model) + ".meta.json").read_text())
+        assert meta["params"]["n_estimators"] == 4
+        scores = json.loads(Path(str(model) + ".eval.json").read_text())
+        assert 0 <= scores["accuracy"] <= scores["top3_accuracy"] <= 1
+        compiled = FlatForest.load(str(ws.root / "model.forest"))
+        assert compiled.meta["source_sha256"] == file_sha256(model)
+
+        bad = subprocess.run([sys.executable, "ml/pipeline_runner.py", "--stages", "deploy"],
+                             capture_output=True, text=True)
+        assert bad.returncode != 0
+
+    print("✓ Pipeline runner chains preprocess, train, evaluate and compile in one process")
+
+
+def test_model_registry_deduplicates_and_collects_garbage():
+    from ml.model_registry import ModelRegistry
+    from database.queries import delete_models, get_model_by_sha256
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        active = tmp / "rf_model.joblib"
+        registry = ModelRegistry(root=str(tmp / "saved_models"), active_path=str(active), base_dir=str(tmp))
+        objects = lambda: sorted((tmp / "saved_models" / "objects").glob("*/*.joblib"))
+
+        def save_model(n):
+            # like train.py: written aside and renamed over the (linked) active model
+            joblib.dump({"model": list(range(n))}, str(active) + ".tmp")
+            Path(str(active) + ".tmp").replace(active)
+
+        save_model(1)
+        Path(str(active) + ".eval.json").write_text(json.dumps({"accuracy": 0.5, "top3_accuracy": 0.75}))
+        Path(str(active) + ".meta.json").write_text(json.dumps({"data_fingerprint": "abc", "cv": {"top1": 0.4}}))
+        first = registry.register()
+        ids = [first["id"]]
+        try:
+            assert first["sha256"] == file_sha256(active) and first["size_bytes"] == active.stat().st_size
+            assert first["metrics"] == {"accuracy": 0.5, "top3_accuracy": 0.75, "cv": {"top1": 0.4}}
+            assert first["accuracy"] == 0.5 and first["data_fingerprint"] == "abc"
+            latest = tmp / "saved_models" / "latest_model.joblib"
+            assert active.samefile(first["path"]) and latest.samefile(first["path"])
+            # stored relative to base_dir, so the checkout can move
+            stored = get_model_by_sha256(first["sha256"])["path"]
+            assert stored == f"saved_models/objects/{first['sha256'][:2]}/{first['sha256']}.joblib"
+
+            # same bytes again: no new version, no new object
+            assert registry.register()["id"] == first["id"] and len(objects()) == 1
+
+            save_model(2)
+            second = registry.register(metrics={"accuracy": 0.6})
+            ids.append(second["id"])
+            assert second["sha256"] != first["sha256"] and len(objects()) == 2
+            assert file_sha256(first["path"]) == first["sha256"]
+
+            registry.activate(first)
+            assert registry.active_version()["id"] == first["id"]
+            # both are pinned: the active one and the latest export
+            assert registry.gc(keep=1)[0] == [] and len(objects()) == 2
+
+            save_model(3)
+            third = registry.register()
+            ids.append(third["id"])
+            removed, _ = registry.gc(keep=1)
+            assert removed == [second["version"], first["version"]]
+            assert objects() == [Path(third["path"])]
+            assert [row["id"] for row in registry.versions() if row["id"] in ids] == [third["id"]]
+        finally:
+            delete_models(ids)
+
+    print("✓ Model registry stores models once by hash and applies the retention policy")
+
+
+# ---------------------
+# Top-k selection
+# ---------------------
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    proba = rng.random((200, 50))
+
+    for k in (1, 3, 50, 80):
+        idx, scores = top_k(proba, k)
+        expected = np.argsort(-proba, axis=1)[:, :min(k, 50)]
+        np.testing.assert_array_equal(idx, expected)
+        np.testing.assert_array_equal(scores, np.take_along_axis(proba, expected, axis=1))
+
+    idx, scores = top_k(np.array([0.1, 0.6, 0.3]), 2)
+    assert idx.tolist() == [[1, 2]] and scores.shape == (1, 2)
+
+    for k in (0, -1):
+        try:
+            top_k(proba, k)
+            assert False, f"top_k accepted k={k}"
+        except ValueError:
+            pass
+
+    print("✓ argpartition top-k matches a full sort")
+
+
+# ---------------------
+# Compiled forest
+# ---------------------
+def test_flat_forest_matches_sklearn():
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+
+    rng = np.random.default_rng(0)
+    X = (rng.random((400, 40)) < 0.2).astype(int)
+    y = np.array([f"disease_{i}" for i in (X[:, :5].argmax(axis=1) + X[:, 5])])
+
+    le = LabelEncoder()
+    clf = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0)
+    clf.fit(X, le.fit_transform(y))
+
+    X_test = (rng.random((50, 40)) < 0.2).astype(int)
+    default_threshold = flat_forest.DENSE_LEAF_THRESHOLD
+
+    # threshold 1.0 forces the sparse leaf layout, 0.0 the dense one
+    for threshold, layout in ((1.0, "sparse"), (0.0, "dense")):
+        flat_forest.DENSE_LEAF_THRESHOLD = threshold
+        try:
+            with tempfile.TemporaryDirectory() as out_dir:
+                meta = compile_forest({"model": clf, "label_encoder": le}, out_dir)
+                forest = FlatForest.load(out_dir)
+
+                assert meta["binary"]
+                assert meta["leaf_layout"] == layout
+                np.testing.assert_allclose(forest.predict_proba(X_test), clf.predict_proba(X_test), atol=1e-12)
+                assert forest.predict_proba(X_test[0]).shape == (1, len(le.classes_))
+                assert list(forest.classes_) == list(le.classes_)
+        finally:
+            flat_forest.DENSE_LEAF_THRESHOLD = default_threshold
+
+    # continuous features in [0, 1] are split inside (0, 1) too, but not only at 0.5
+    X_cont = rng.random((400, 10))
+    y_cont = (X_cont[:, 0] + X_cont[:, 1] > 0.8).astype(int) + (X_cont[:, 2] > 0.3)
+    clf.fit(X_cont, y_cont)
+    le.fit(y_cont)
+    with tempfile.TemporaryDirectory() as out_dir:
+        meta = compile_forest({"model": clf, "label_encoder": le}, out_dir)
+        assert not meta["binary"]
+        X_cont_test = rng.random((50, 10))
+        np.testing.assert_allclose(FlatForest.load(out_dir).predict_proba(X_cont_test),
+                                   clf.predict_proba(X_cont_test), atol=1e-12)
+
+    print("✓ Compiled flat forest matches sklearn predict_proba")
+
+
 if __name__ == "__main__":
     test_ml_system()
+    test_synonym_index_matches_linear_scan()
+    test_symptom_matcher_maps_free_text()
+    test_symptom_matcher_rejects_risky_fuzzy_matches()
+    test_vectorized_loaders_match_iterrows()
+    test_numeric_disease_codes_are_read_as_ints()
+    test_streaming_and_parallel_pipeline_match_whole_file_merge()
+    test_vectorized_merge_matches_row_by_row_merge()
+    test_incremental_preprocessing_reuses_cached_partials()
+    test_matrix_artifact_matches_csv_vectorization()
+    test_train_parameters_and_warm_start()
+    test_tune_cross_validates_and_writes_the_winner()
+    test_top_k_matches_full_sort()
+    test_flat_forest_matches_sklearn()
 
 
 ## Run this file using git bash with this command """python -m tests.test_ml"""
@@ -10,6 +10,7 @@ Ensures:
 import unittest
 import sqlite3
 from backend.app import create_app
+from backend.services.write_behind import log_writer
 from database.db import get_connection
 
 
@@ -50,7 +51,8 @@ class MLApiIntegrationTest(unittest.TestCase):
         top_pred = data["predictions"][0]["condition"]
         print(f"\n✓ ML model predicted: {top_pred}")
 
-        # 2. Check if prediction was logged in DB
+        # 2. Check if prediction was logged in DB (logs are written behind the request)
+        self.assertTrue(log_writer.flush(timeout=5))
         conn = sqlite3.connect(DB_PATH)
         c = conn.cursor()
         c.execute("SELECT * FROM prediction_logs;")
@@ -0,0 +1,259 @@
+"""
+MLService Test Suite for AI Health Diagnostic Assistant Backend
+
+This script tests:
+- Micro-batching of concurrent predictions
+- Batched vs single-row prediction consistency
+- Serving from the compiled flat forest
+- Prediction result caching
+- Lazy loading and model hot swap
+
+Run using:
+    python -m tests.test_ml_service
+"""
+
+import copy
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import joblib
+from backend.config import MODEL_PATH
+from backend.services.ml_service import MicroBatcher, MLService, ml_service
+from backend.services.prediction_cache import PredictionCache
+from ml.flat_forest import compile_forest, FlatForest
+from ml.utils import file_sha256
+
+
+class MicroBatcherTestCase(unittest.TestCase):
+
+    # ---------------------------------------
+    # CONCURRENT CALLS ARE COALESCED
+    # ---------------------------------------
+    def test_concurrent_calls_share_a_batch(self):
+        seen = []
+
+        def handler(items):
+            seen.append(len(items))
+            return [i * 2 for i in items]
+
+        batcher = MicroBatcher(handler, max_batch_size=8, max_wait_ms=50)
+        results = {}
+
+        def call(i):
+            results[i] = batcher.submit(i)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results, {i: i * 2 for i in range(8)})
+        self.assertLess(len(seen), 8)
+        self.assertTrue(all(n <= 8 for n in seen))
+        print("\n✓ MicroBatcher coalesces concurrent calls")
+
+    # ---------------------------------------
+    # ERRORS REACH EVERY CALLER
+    # ---------------------------------------
+    def test_handler_error_propagates(self):
+        def handler(items):
+            raise ValueError("boom")
+
+        batcher = MicroBatcher(handler, max_batch_size=4, max_wait_ms=1)
+        with self.assertRaises(ValueError):
+            batcher.submit("x")
+        print("✓ MicroBatcher propagates handler errors")
+
+    # ---------------------------------------
+    # BATCHING DISABLED
+    # ---------------------------------------
+    def test_disabled_runs_inline(self):
+        batcher = MicroBatcher(lambda items: [threading.current_thread().name for _ in items],
+                               max_batch_size=1)
+        self.assertFalse(batcher.enabled)
+        self.assertEqual(batcher.submit("x"), threading.current_thread().name)
+        print("✓ MicroBatcher runs inline when disabled")
+
+
+class PredictionCacheTestCase(unittest.TestCase):
+
+    # ---------------------------------------
+    # LRU EVICTION
+    # ---------------------------------------
+    def test_lru_eviction(self):
+        cache = PredictionCache(max_size=2, ttl_seconds=0)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)   # "b" is now least recently used
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1))
+        print("\n✓ PredictionCache evicts least recently used entries")
+
+    # ---------------------------------------
+    # TTL EXPIRY
+    # ---------------------------------------
+    def test_ttl_expiry(self):
+        cache = PredictionCache(max_size=4, ttl_seconds=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        print("✓ PredictionCache expires stale entries")
+
+
+class MLServiceTestCase(unittest.TestCase):
+
+    # ---------------------------------------
+    # BATCH == SINGLE
+    # ---------------------------------------
+    def test_batch_matches_single(self):
+        batch = [["fever", "cough"], ["headache"], []]
+        batched = ml_service.predict_batch(batch)
+        single = [ml_service.predict(s) for s in batch]
+
+        self.assertEqual(len(batched), len(batch))
+        for b, s in zip(batched, single):
+            self.assertEqual([p["condition"] for p in b], [p["condition"] for p in s])
+            for pb, ps in zip(b, s):
+                self.assertAlmostEqual(pb["probability"], ps["probability"])
+        print("✓ predict_batch matches predict")
+
+    def test_top_k_is_configurable(self):
+        service = MLService(use_compiled=False, batch_max_size=1, cache_size=0, top_k=5)
+        predictions = service.predict_batch([["fever", "cough"]])[0]
+
+        probabilities = [p["probability"] for p in predictions]
+        self.assertEqual(len(predictions), min(5, len(service.classes)))
+        self.assertEqual(probabilities, sorted(probabilities, reverse=True))
+        self.assertTrue(all(isinstance(p["condition"], str) for p in predictions))
+        with self.assertRaises(ValueError):
+            MLService(use_compiled=False, top_k=0)
+        print("✓ Number of returned conditions follows top_k")
+
+    # ---------------------------------------
+    # CACHING
+    # ---------------------------------------
+    def test_equivalent_inputs_hit_the_cache(self):
+        service = MLService(use_compiled=False, batch_max_size=1)
+        calls = []
+        original = service.batcher.handler
+        service.batcher.handler = lambda batch: calls.append(batch) or original(batch)
+
+        first = service.predict(["fever", "cough"])
+        second = service.predict(["cough", "fever", "fever", "not-a-symptom"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(service.cache_stats()["hits"], 1)
+
+        service.invalidate_cache()
+        service.predict(["fever", "cough"])
+        self.assertEqual(len(calls), 2)
+        print("✓ Equivalent symptom sets share a cache entry until invalidated")
+
+    # ---------------------------------------
+    # LAZY LOAD + HOT SWAP
+    # ---------------------------------------
+    def test_lazy_load_and_hot_swap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "rf_model.joblib")
+            shutil.copy(MODEL_PATH, model_path)
+
+            service = MLService(model_path=model_path, use_compiled=False, batch_max_size=1)
+            self.assertFalse(service.is_loaded)
+
+            service.predict(["fever"])
+            old_version = service.model_version
+            self.assertEqual(service.cache_stats()["size"], 1)
+
+            # a different artifact on disk, then swap it in
+            model_obj = joblib.load(model_path)
+            model_obj["retrained"] = True
+            joblib.dump(model_obj, model_path)
+            service.reload(wait=True)
+
+            self.assertNotEqual(service.model_version, old_version)
+            self.assertEqual(service.cache_stats()["size"], 0)
+            self.assertIsNone(service.status()["last_reload_error"])
+            self.assertGreater(len(service.predict(["fever"])), 0)
+        print("✓ Model loads lazily and hot-swaps on reload")
+
+    def test_in_flight_prediction_keeps_its_model(self):
+        service = MLService(use_compiled=False, batch_max_size=1)
+        old = service._ensure_loaded()
+        new = copy.copy(old)
+        new.version = "swapped-in"
+        new.class_names = old.class_names[::-1].copy()
+
+        original = service.batcher.handler
+
+        def reload_then_run(items):
+            # reload() lands while the request waits for its batch
+            service._loaded = new
+            return original(items)
+
+        service.batcher.handler = reload_then_run
+        symptoms = ["fever", "cough"]
+        result = service.predict(symptoms)
+
+        expected = service.predict_batch([symptoms], old)[0]
+        self.assertNotEqual(expected, service.predict_batch([symptoms])[0])
+        self.assertEqual(result, expected)
+        self.assertEqual(service.cache.get((old.version, old.vector_builder.indices(symptoms))), expected)
+        print("✓ In-flight predictions finish (and are cached) on the model they started with")
+
+    def test_failed_reload_keeps_current_model(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, "rf_model.joblib")
+            shutil.copy(MODEL_PATH, model_path)
+
+            service = MLService(model_path=model_path, use_compiled=False, batch_max_size=1)
+            version = service.model_version
+
+            with open(model_path, "wb") as f:
+                f.write(b"not a model")
+            service.reload(wait=True)
+
+            self.assertEqual(service.model_version, version)
+            self.assertIsNotNone(service.status()["last_reload_error"])
+            self.assertGreater(len(service.predict(["fever"])), 0)
+        print("✓ Failed reload keeps serving the previous model")
+
+    # ---------------------------------------
+    # COMPILED FOREST
+    # ---------------------------------------
+    def test_compiled_model_matches_joblib(self):
+        batch = [["fever", "cough"], ["headache"]]
+        with tempfile.TemporaryDirectory() as compiled:
+            compile_forest(joblib.load(MODEL_PATH), compiled, source_sha256=file_sha256(MODEL_PATH))
+            service = MLService(compiled_path=compiled, batch_max_size=1)
+            self.assertIsInstance(service.model, FlatForest)
+
+            expected = MLService(use_compiled=False, batch_max_size=1).predict_batch(batch)
+            for got, exp in zip(service.predict_batch(batch), expected):
+                for pg, pe in zip(got, exp):
+                    self.assertAlmostEqual(pg["probability"], pe["probability"])
+        print("✓ Compiled model serves the same predictions")
+
+    def test_stale_compiled_model_is_ignored(self):
+        with tempfile.TemporaryDirectory() as compiled:
+            compile_forest(joblib.load(MODEL_PATH), compiled, source_sha256="stale")
+            service = MLService(compiled_path=compiled, batch_max_size=1)
+            self.assertNotIsInstance(service.model, FlatForest)
+        print("✓ Stale compiled model falls back to joblib")
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+## Run this file using git bash with this command """python -m tests.test_ml_service"""
+## You've got to run it this way with this specific command above or it probably might not run